@@ -1,7 +1,34 @@
-from solareclipseworkbench.notifications import voice_prompt
-from solareclipseworkbench.camera import take_picture
-from solareclipseworkbench.camera import take_burst
-from solareclipseworkbench.camera import take_bracket
-from solareclipseworkbench.gui import sync_cameras
+""" Solar Eclipse Workbench.
+
+The commands that can be used in the scripts are imported on first use, so importing this package (e.g. by the command
+line) does not import the UI.
+"""
 
 __all__ = ["voice_prompt", "take_picture", "sync_cameras", "take_burst", "take_bracket"]
+
+# Command -> module in which it is defined
+
+__COMMAND_MODULES = {
+    "voice_prompt": "solareclipseworkbench.notifications",
+    "take_picture": "solareclipseworkbench.camera",
+    "take_burst": "solareclipseworkbench.camera",
+    "take_bracket": "solareclipseworkbench.camera",
+    "sync_cameras": "solareclipseworkbench.utils",
+}
+
+
+def __getattr__(name: str):
+    """ Import the given command on first use.
+
+    Args:
+        - name: Name of the command
+
+    Returns: Function that executes the command.
+    """
+
+    if name in __COMMAND_MODULES:
+        import importlib
+
+        return getattr(importlib.import_module(__COMMAND_MODULES[name]), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,204 @@
+""" Announcements that are assembled from the existing sound clips.
+
+The name of each sound file describes what is said in it (e.g. "c2_in_20_seconds.wav" or "5.wav"), so the sound files
+form a vocabulary of words and phrases.  An announcement (e.g. "C2 in 20 seconds, 5") is rendered by covering its words
+with the longest phrases in that vocabulary, and concatenating these clips (without their leading and trailing silence)
+with a short pause in between.  Numbers that are not in the vocabulary are split in tens and units (e.g. 37 = 30 + 7).
+
+Rendering happens when the script is scheduled: the rendered sounds are cached (keyed by the text of the announcement)
+and added to the audio engine, so nothing has to be assembled or read from disk when the announcement is played.
+Which announcements can be rendered depends on the clips in the sound directory: adding a clip for a word (e.g.
+"seconds.wav" or "7.wav") extends the vocabulary.
+"""
+import logging
+import re
+import threading
+
+import numpy as np
+
+from solareclipseworkbench.audio import AudioEngine, Sound, SILENCE_WINDOW, SILENCE_THRESHOLD, get_audio_engine
+
+# Pause between the clips of an announcement [s]
+
+ANNOUNCEMENT_GAP = 0.08
+
+# Silence before the first clip of an announcement [s]
+
+ANNOUNCEMENT_LEAD_IN = 0.02
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench")
+
+
+def get_words(text: str) -> tuple:
+    """ Split the given text (or notification / file name) into lower-case words.
+
+    Args:
+        - text: Text, e.g. "C3 in 37 seconds", "C3_IN_37_SECONDS", or "c3_in_37_seconds.wav"
+
+    Returns: Tuple with the words, e.g. ("c3", "in", "37", "seconds").
+    """
+
+    text = re.sub(r"\.wav$", "", text.strip().lower())
+
+    return tuple(word for word in re.split(r"[\s_,]+", text) if word)
+
+
+def get_announcement_name(text: str) -> str:
+    """ Returns the name under which the rendered announcement for the given text is cached.
+
+    Args:
+        - text: Text of the announcement
+
+    Returns: Name of the rendered announcement, e.g. "c3 in 37 seconds".
+    """
+
+    return " ".join(get_words(text))
+
+
+def trim_silence(sound: Sound) -> np.ndarray:
+    """ Returns the samples of the given sound, without the silence at the start and the end.
+
+    Args:
+        - sound: Sound to trim
+
+    Returns: Samples without leading and trailing silence.
+    """
+
+    window_size = max(1, int(SILENCE_WINDOW * sound.sample_rate))
+    num_windows = len(sound.samples) // window_size
+    if num_windows == 0:
+        return sound.samples
+
+    windows = sound.samples[: num_windows * window_size].reshape(num_windows, window_size)
+    loud = np.flatnonzero(np.sqrt((windows ** 2).mean(axis=1)) > 10 ** (SILENCE_THRESHOLD / 20))
+    if len(loud) == 0:
+        return sound.samples[:0]
+
+    return sound.samples[loud[0] * window_size: (loud[-1] + 1) * window_size]
+
+
+class AnnouncementSynthesizer:
+
+    def __init__(self, engine: AudioEngine):
+        """ Build the vocabulary from the sound files in the given audio engine.
+
+        Args:
+            - engine: Audio engine with the sound files in memory
+        """
+
+        self.engine = engine
+        self.sample_rate = engine.sample_rate
+
+        # Words in the sound file -> samples without silence
+
+        self.vocabulary: dict = {get_words(name): trim_silence(sound) for name, sound in engine.sounds.items()}
+        self.max_phrase_length = max((len(words) for words in self.vocabulary), default=0)
+
+        self.cache: dict = {}
+        self.lock = threading.Lock()
+
+    def get_units(self, words: tuple) -> list:
+        """ Cover the given words with the longest phrases from the vocabulary.
+
+        Args:
+            - words: Words of the announcement
+
+        Returns: List with the phrases (tuples of words) that cover the announcement.
+        """
+
+        units = []
+        words = list(words)
+        position = 0
+
+        while position < len(words):
+            for length in range(min(self.max_phrase_length, len(words) - position), 0, -1):
+                phrase = tuple(words[position: position + length])
+                if phrase in self.vocabulary:
+                    units.append(phrase)
+                    position += length
+                    break
+            else:
+                word = words[position]
+
+                if word.isdigit() and int(word) > 20 and int(word) % 10 != 0:
+                    # Split e.g. 37 in 30 and 7
+
+                    words[position: position + 1] = [str(int(word) - int(word) % 10), str(int(word) % 10)]
+                    continue
+
+                raise ValueError(f"No sound clip for \"{word}\"")
+
+        return units
+
+    def render(self, text: str) -> Sound:
+        """ Render the announcement for the given text, and add it to the audio engine.
+
+        The rendered announcement is cached, so it is only rendered once.
+
+        Args:
+            - text: Text of the announcement, e.g. "C3 in 37 seconds"
+
+        Returns: Rendered announcement, with the name that is returned by get_announcement_name.
+        """
+
+        name = get_announcement_name(text)
+
+        with self.lock:
+            if name in self.cache:
+                return self.cache[name]
+
+        units = self.get_units(get_words(text))
+
+        gap = np.zeros(int(ANNOUNCEMENT_GAP * self.sample_rate), dtype=np.float32)
+        parts = [np.zeros(int(ANNOUNCEMENT_LEAD_IN * self.sample_rate), dtype=np.float32)]
+        for unit in units:
+            parts += [self.vocabulary[unit], gap]
+
+        sound = Sound(name, np.concatenate(parts), self.sample_rate)
+        self.engine.add_sound(sound)
+
+        with self.lock:
+            self.cache[name] = sound
+
+        LOGGER.debug(f"Rendered announcement \"{name}\" from {len(units)} clip(s) ({sound.get_duration():.2f}s)")
+
+        return sound
+
+    def render_all(self, texts: list) -> list:
+        """ Render the announcements for the given texts.
+
+        Args:
+            - texts: Texts of the announcements
+
+        Returns: List with the texts that could not be rendered.
+        """
+
+        missing = []
+
+        for text in texts:
+            try:
+                self.render(text)
+            except ValueError as exc:
+                LOGGER.warning(f"Announcement \"{text}\" cannot be rendered: {exc}")
+                missing.append(text)
+
+        return missing
+
+
+__SYNTHESIZER = None
+__SYNTHESIZER_LOCK = threading.Lock()
+
+
+def get_synthesizer() -> AnnouncementSynthesizer:
+    """ Returns the synthesizer for the announcements (for the audio engine), which is created on first use.
+
+    Returns: Synthesizer for the announcements.
+    """
+
+    global __SYNTHESIZER
+
+    with __SYNTHESIZER_LOCK:
+        if __SYNTHESIZER is None:
+            __SYNTHESIZER = AnnouncementSynthesizer(get_audio_engine())
+
+        return __SYNTHESIZER
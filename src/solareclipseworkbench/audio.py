@@ -0,0 +1,619 @@
+""" Low-latency audio engine for the voice prompts.
+
+All sound files are decoded into memory when the engine is created, and they are played on a single output stream.  The
+samples of all sounds that are playing are mixed in the callback of that stream (the mixer thread), so starting a sound
+only consists of adding it to the list of active voices.  A sound can be given the time at which it has to start, in
+which case the mixer starts it at the exact frame that corresponds to that time.
+
+The output stream requires the (optional) sounddevice package.  When it is not installed, the engine falls back to
+playsound, which opens and decodes the sound file for each prompt.
+
+Most sound files start with a bit of silence (the lead-in), which is measured when they are decoded.  A sound with a
+requested start time is started early by its lead-in, so the speech itself (rather than the silence) starts at the
+requested time.
+
+What happens when a prompt would start while another one is still playing, is determined by the overlap policy:
+
+    - interrupt: The prompt that is playing is stopped;
+    - drop: The new prompt is not played;
+    - queue: The new prompt is started when the one that is playing has finished.
+
+The clock of the sound card drifts w.r.t. the system clock (typically by tens of ppm), so the offset between them is
+measured again in every callback of the output stream (and smoothed), rather than only when the stream is opened.
+
+For each prompt, the start latency (the time between the requested start and the moment the first sample reaches the
+sound card) is logged and kept.
+
+The callback of the output stream runs in the realtime thread of the sound card, so it does not log, lock, or build
+lists: it only marks the voices it has started and counts the problems of the output.  A monitor thread logs these, and
+removes the voices that have finished.
+"""
+import logging
+import struct
+import tempfile
+import threading
+import time
+import wave
+from enum import Enum
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from solareclipseworkbench.tracing import span, add_span
+
+SOUND_PATH = Path(__file__).parent.resolve() / ".." / ".." / "sound"
+
+DEFAULT_SAMPLE_RATE = 22050
+
+# Level above which a sound is no longer considered silent [dBFS], and window over which this level is determined [s]
+
+SILENCE_THRESHOLD = -40.0
+SILENCE_WINDOW = 0.005
+
+# Weight of a new measurement of the offset between the system clock and the stream clock (measured in every callback)
+
+OFFSET_SMOOTHING = 0.01
+
+# Interval at which the started prompts and the problems of the output stream are logged by the monitor thread [s]
+
+MONITOR_INTERVAL = 0.5
+
+# Formats in the fmt chunk of a WAV file
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench")
+
+
+class OverlapPolicy(str, Enum):
+    """ Enumeration of what to do with a voice prompt that would overlap with the one that is playing. """
+
+    INTERRUPT = "interrupt"
+    DROP = "drop"
+    QUEUE = "queue"
+
+
+class Sound:
+
+    def __init__(self, name: str, samples: np.ndarray, sample_rate: int, path: Path = None):
+        """ Sound that has been decoded into memory.
+
+        Args:
+            - name: Name of the sound file
+            - samples: Mono samples, as 32-bit floats in [-1, 1]
+            - sample_rate: Sample rate [Hz]
+            - path: Location of the sound file (None if the sound was not read from a file)
+        """
+
+        self.name = name
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.path = path
+        self.lead_in = measure_lead_in(samples, sample_rate)
+
+    def get_duration(self) -> float:
+        """ Returns the duration of the sound.
+
+        Returns: Duration of the sound [s].
+        """
+
+        return len(self.samples) / self.sample_rate
+
+
+class Voice:
+
+    def __init__(self, sound: Sound, start: float, requested_time: float):
+        """ Sound that is playing, or waiting to start, in the mixer.
+
+        Args:
+            - sound: Sound to play
+            - start: Time at which the first sample has to reach the sound card [stream time]
+            - requested_time: Time at which the sound was requested to start [s since epoch]
+        """
+
+        self.sound = sound
+        self.start = start
+        self.stop: Union[float, None] = None    # Time at which the sound is interrupted [stream time]
+        self.requested_time = requested_time
+        self.position = 0
+
+        # Set by the mixer when the sound is started: the time at which the first sample reaches the sound card, and the
+        # start and end of the callback that started it [s since epoch]
+
+        self.start_time: Union[float, None] = None
+        self.mix_start: Union[float, None] = None
+        self.mix_end: Union[float, None] = None
+        self.is_reported = False    # Whether the start latency has been recorded
+
+    def get_end(self) -> float:
+        """ Returns the time at which the sound will have finished.
+
+        Returns: Time at which the sound will have finished [stream time].
+        """
+
+        end = self.start + self.sound.get_duration()
+
+        return end if self.stop is None else min(end, self.stop)
+
+
+class PromptLatency:
+
+    def __init__(self, name: str, requested_time: float, start_time: float):
+        """ Start latency of a voice prompt.
+
+        Args:
+            - name: Name of the sound file
+            - requested_time: Time at which the sound should have started [s since epoch]
+            - start_time: Time at which the first sample reached the sound card [s since epoch]
+        """
+
+        self.name = name
+        self.requested_time = requested_time
+        self.start_time = start_time
+        self.latency = start_time - requested_time
+
+    def __str__(self):
+        return f"{self.name} started {self.latency * 1000:.1f}ms after the requested time"
+
+
+def read_wav(filename: Union[str, Path]) -> Sound:
+    """ Decode the given WAV file into memory.
+
+    PCM files (8, 16, 24, or 32 bits) and IEEE float files (32 or 64 bits) are supported.  Multi-channel files are
+    mixed down to mono.
+
+    Args:
+        - filename: Name of the WAV file
+
+    Returns: Decoded sound.
+    """
+
+    data = Path(filename).read_bytes()
+
+    if data[0:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError(f"{filename} is not a WAV file")
+
+    wave_format = num_channels = sample_rate = bits_per_sample = None
+    samples = None
+
+    position = 12
+    while position + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack("<4sI", data[position: position + 8])
+        chunk = data[position + 8: position + 8 + chunk_size]
+
+        if chunk_id == b"fmt ":
+            wave_format, num_channels, sample_rate, _, _, bits_per_sample = struct.unpack("<HHIIHH", chunk[:16])
+            if wave_format == WAVE_FORMAT_EXTENSIBLE:
+                wave_format = struct.unpack("<H", chunk[24:26])[0]
+        elif chunk_id == b"data":
+            samples = __decode_samples(chunk, wave_format, bits_per_sample)
+
+        position += 8 + chunk_size + (chunk_size & 1)
+
+    if samples is None:
+        raise ValueError(f"{filename} does not contain any samples")
+
+    samples = samples[: len(samples) - len(samples) % num_channels].reshape(-1, num_channels).mean(axis=1)
+
+    return Sound(Path(filename).name, samples.astype(np.float32), sample_rate, Path(filename))
+
+
+def write_wav(filename: Union[str, Path], sound: Sound):
+    """ Write the given sound to a (16-bit PCM) WAV file.
+
+    Args:
+        - filename: Name of the WAV file
+        - sound: Sound to write
+    """
+
+    with wave.open(str(filename), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sound.sample_rate)
+        wav_file.writeframes((np.clip(sound.samples, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def __decode_samples(chunk: bytes, wave_format: int, bits_per_sample: int) -> np.ndarray:
+    """ Decode the samples in the given data chunk of a WAV file.
+
+    Args:
+        - chunk: Content of the data chunk
+        - wave_format: Format of the samples (PCM or IEEE float)
+        - bits_per_sample: Number of bits per sample
+
+    Returns: Samples as floats in [-1, 1] (interleaved, if there are multiple channels).
+    """
+
+    if wave_format == WAVE_FORMAT_IEEE_FLOAT:
+        return np.frombuffer(chunk, dtype=np.float32 if bits_per_sample == 32 else np.float64)
+
+    if wave_format != WAVE_FORMAT_PCM:
+        raise ValueError(f"Unsupported WAV format: {wave_format}")
+
+    if bits_per_sample == 8:
+        return (np.frombuffer(chunk, dtype=np.uint8).astype(np.float32) - 128) / 128
+    if bits_per_sample == 24:
+        raw = np.frombuffer(chunk[: len(chunk) - len(chunk) % 3], dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        return np.where(samples >= 1 << 23, samples - (1 << 24), samples) / float(1 << 23)
+
+    dtype = {16: np.int16, 32: np.int32}[bits_per_sample]
+    return np.frombuffer(chunk, dtype=dtype) / float(np.iinfo(dtype).max + 1)
+
+
+def measure_lead_in(samples: np.ndarray, sample_rate: int, threshold: float = SILENCE_THRESHOLD,
+                    window: float = SILENCE_WINDOW) -> float:
+    """ Measure the duration of the silence at the start of the given sound.
+
+    Args:
+        - samples: Mono samples, as floats in [-1, 1]
+        - sample_rate: Sample rate [Hz]
+        - threshold: Level above which the sound is no longer considered silent [dBFS]
+        - window: Window over which the level is determined [s]
+
+    Returns: Duration of the silence at the start of the sound [s].
+    """
+
+    window_size = max(1, int(window * sample_rate))
+    num_windows = len(samples) // window_size
+    if num_windows == 0:
+        return 0.0
+
+    rms = np.sqrt((samples[: num_windows * window_size].reshape(num_windows, window_size) ** 2).mean(axis=1))
+    loud = np.flatnonzero(rms > 10 ** (threshold / 20))
+
+    return loud[0] * window_size / sample_rate if len(loud) else 0.0
+
+
+def resample(sound: Sound, sample_rate: int) -> Sound:
+    """ Resample the given sound to the given sample rate (by linear interpolation).
+
+    Args:
+        - sound: Sound to resample
+        - sample_rate: New sample rate [Hz]
+
+    Returns: Resampled sound.
+    """
+
+    if sound.sample_rate == sample_rate:
+        return sound
+
+    num_samples = int(round(len(sound.samples) * sample_rate / sound.sample_rate))
+    positions = np.arange(num_samples) * sound.sample_rate / sample_rate
+    samples = np.interp(positions, np.arange(len(sound.samples)), sound.samples).astype(np.float32)
+
+    return Sound(sound.name, samples, sample_rate, sound.path)
+
+
+class AudioEngine:
+
+    def __init__(self, sound_path: Union[str, Path] = SOUND_PATH, sample_rate: int = None,
+                 policy: OverlapPolicy = OverlapPolicy.QUEUE):
+        """ Decode all sound files in the given directory into memory, and open the output stream.
+
+        Args:
+            - sound_path: Directory with the sound files (WAV)
+            - sample_rate: Sample rate of the output stream [Hz] (None for the sample rate of the sound files)
+            - policy: What to do with a prompt that would start while another one is still playing
+        """
+
+        self.sound_path = Path(sound_path)
+        self.policy = policy
+
+        sounds = [read_wav(filename) for filename in sorted(self.sound_path.glob("*.wav"))]
+        if sample_rate is None:
+            sample_rate = max((sound.sample_rate for sound in sounds), default=DEFAULT_SAMPLE_RATE)
+
+        self.sample_rate = sample_rate
+        self.sounds: dict = {sound.name: resample(sound, sample_rate) for sound in sounds}
+
+        # Voices that are playing or waiting to start.  The list is replaced rather than changed, so the mixer can use
+        # it without taking the lock
+
+        self.voices: list = []
+        self.latencies: list = []
+        self.lock = threading.Lock()
+
+        # Number of callbacks of the output stream with a problem (e.g. buffer underflow), the latest problem, and the
+        # number that has been logged
+
+        self.num_output_problems = 0
+        self.output_status = None
+        self.num_reported_problems = 0
+        self.stopped = threading.Event()
+
+        # Only used when there is no output stream
+
+        self.playsound_lock = threading.Lock()
+
+        self.stream = None
+        self.stream_offset = 0.0    # Time since epoch - stream time [s]
+
+        try:
+            import sounddevice
+            self.stream = sounddevice.OutputStream(samplerate=sample_rate, channels=1, dtype="float32",
+                                                   latency="low", callback=self.__mix)
+            self.stream.start()
+            self.stream_offset = time.time() - self.stream.time
+            LOGGER.info(f"Audio engine started ({len(self.sounds)} sounds, {sample_rate}Hz, output latency "
+                        f"{self.stream.latency * 1000:.1f}ms)")
+            threading.Thread(target=self.__monitor, name="Audio monitor", daemon=True).start()
+        except (ImportError, OSError) as exc:
+            # OSError: PortAudio library not found
+            self.stream = None
+            LOGGER.warning(f"Audio engine not available ({exc}): falling back to playsound")
+
+    def get_lead_in(self, name: str) -> float:
+        """ Returns the duration of the silence at the start of the sound with the given name.
+
+        Args:
+            - name: Name of the sound file
+
+        Returns: Lead-in of the sound [s].
+        """
+
+        return self.sounds[name].lead_in
+
+    def add_sound(self, sound: Sound):
+        """ Add the given sound (e.g. a rendered announcement) to the sounds in memory.
+
+        When there is no output stream, the sound is written to a temporary file, so playsound can play it.
+
+        Args:
+            - sound: Sound to add
+        """
+
+        sound = resample(sound, self.sample_rate)
+
+        if self.stream is None and sound.path is None:
+            sound.path = Path(tempfile.mkdtemp(prefix="solareclipseworkbench")) / f"{sound.name}.wav"
+            write_wav(sound.path, sound)
+
+        with self.lock:
+            self.sounds[sound.name] = sound
+
+    def play(self, name: str, start_time: float = None, policy: OverlapPolicy = None) -> bool:
+        """ Play the sound with the given name.
+
+        When a start time is given, the sound is started early by its lead-in, so that the speech starts at that time.
+
+        Args:
+            - name: Name of the sound (file), e.g. "c2.wav"
+            - start_time: Time at which the speech has to start [s since epoch] (None to start as soon as possible)
+            - policy: What to do when another prompt is still playing at that time (None for the policy of the engine)
+
+        Returns: True if the sound will be played, False if it was dropped.
+        """
+
+        with span("play", "audio", sound=name):
+            return self.__play(name, start_time, policy)
+
+    def __play(self, name: str, start_time: Union[float, None], policy: Union[OverlapPolicy, None]) -> bool:
+        """ Play the sound with the given name (see play).
+
+        Args:
+            - name: Name of the sound (file)
+            - start_time: Time at which the speech has to start [s since epoch] (None to start as soon as possible)
+            - policy: What to do when another prompt is still playing at that time (None for the policy of the engine)
+
+        Returns: True if the sound will be played, False if it was dropped.
+        """
+
+        policy = self.policy if policy is None else policy
+        sound = self.sounds[name]
+        requested_time = time.time() if start_time is None else start_time - sound.lead_in
+
+        if self.stream is None:
+            return self.__play_with_playsound(sound, requested_time, policy)
+
+        start = requested_time - self.stream_offset
+
+        with self.lock:
+            busy = [voice for voice in self.voices if voice.get_end() > start]
+
+            if busy and policy == OverlapPolicy.DROP:
+                LOGGER.warning(f"Voice prompt {name} dropped: {busy[-1].sound.name} is still playing")
+                return False
+
+            if busy and policy == OverlapPolicy.INTERRUPT:
+                for voice in busy:
+                    voice.stop = start
+                LOGGER.info(f"Voice prompt {name} interrupts {', '.join(voice.sound.name for voice in busy)}")
+
+            elif busy:
+                end = max(voice.get_end() for voice in busy)
+                LOGGER.info(f"Voice prompt {name} queued for {(end - start) * 1000:.0f}ms after "
+                            f"{busy[-1].sound.name}")
+                start = end
+
+            self.voices = self.voices + [Voice(sound, start, requested_time)]
+
+        return True
+
+    def __play_with_playsound(self, sound: Sound, requested_time: float, policy: OverlapPolicy) -> bool:
+        """ Play the given sound with playsound (when no output stream is available).
+
+        The sound file is played in the calling thread.  As a prompt that is playing cannot be interrupted, the
+        interrupt policy is handled as the queue policy.
+
+        Args:
+            - sound: Sound to play
+            - requested_time: Time at which the sound should start [s since epoch]
+            - policy: What to do when another prompt is still playing
+
+        Returns: True if the sound was played, False if it was dropped.
+        """
+
+        from playsound import playsound
+
+        if not self.playsound_lock.acquire(blocking=policy != OverlapPolicy.DROP):
+            LOGGER.warning(f"Voice prompt {sound.name} dropped: another prompt is still playing")
+            return False
+
+        try:
+            delay = requested_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            self.__record_latency(sound.name, requested_time, time.time())
+            with span("playsound", "audio", sound=sound.name):
+                playsound(str(sound.path))
+        finally:
+            self.playsound_lock.release()
+
+        return True
+
+    def __mix(self, outdata: np.ndarray, frames: int, time_info, status):
+        """ Mix the active voices into the given output buffer (callback of the output stream).
+
+        This is the realtime thread of the sound card: nothing is logged here (see __monitor).
+
+        Args:
+            - outdata: Output buffer (frames x 1)
+            - frames: Number of frames in the output buffer
+            - time_info: Stream time of the callback, and at which the first frame of the buffer will reach the sound
+                         card
+            - status: Status flags (e.g. buffer underflow)
+        """
+
+        mix_start = time.time()
+
+        # The callback is not always called at the same point in time, so the measurements of the offset are smoothed
+
+        self.stream_offset += OFFSET_SMOOTHING * (mix_start - time_info.currentTime - self.stream_offset)
+
+        outdata.fill(0)
+        buffer_time = time_info.outputBufferDacTime
+        num_started = 0
+        voices = self.voices
+
+        for voice in voices:
+            samples = voice.sound.samples
+            if voice.position >= len(samples):
+                continue
+
+            if voice.stop is not None:
+                # Interrupted: only play until the stop time
+
+                num_samples = int(round((voice.stop - voice.start) * self.sample_rate))
+                samples = samples[: max(0, num_samples)]
+
+            if voice.position == 0:
+                first_frame = max(0, int(round((voice.start - buffer_time) * self.sample_rate)))
+                if first_frame >= frames:
+                    continue
+
+                voice.start_time = buffer_time + first_frame / self.sample_rate + self.stream_offset
+                voice.mix_start = mix_start
+                num_started += 1
+            else:
+                first_frame = 0
+
+            chunk = samples[voice.position: voice.position + frames - first_frame]
+            outdata[first_frame: first_frame + len(chunk), 0] += chunk
+            voice.position += len(chunk)
+
+            if voice.position >= len(samples):
+                voice.position = len(voice.sound.samples)
+
+        np.clip(outdata, -1.0, 1.0, out=outdata)
+
+        if status:
+            self.output_status = status
+            self.num_output_problems += 1
+
+        if num_started:
+            mix_end = time.time()
+            for voice in voices:
+                if voice.mix_start == mix_start:
+                    voice.mix_end = mix_end
+
+    def __monitor(self):
+        """ Log the prompts that have been started and the problems of the output stream (in a separate thread). """
+
+        while not self.stopped.wait(MONITOR_INTERVAL):
+            self.__collect()
+
+    def __collect(self):
+        """ Record the start latency of the prompts that have been started by the mixer, log the problems of the output
+        stream, and remove the voices that have finished. """
+
+        with self.lock:
+            started = [voice for voice in self.voices if voice.start_time is not None and not voice.is_reported]
+            for voice in started:
+                voice.is_reported = True
+            self.voices = [voice for voice in self.voices if voice.position < len(voice.sound.samples)]
+
+            num_problems = self.num_output_problems - self.num_reported_problems
+            self.num_reported_problems += num_problems
+
+        if num_problems:
+            LOGGER.warning(f"Audio output: {num_problems} problem(s) (latest: {self.output_status})")
+
+        for voice in started:
+            self.__record_latency(voice.sound.name, voice.requested_time, voice.start_time)
+
+            # Only the callbacks that start a prompt are traced (the others would fill the trace)
+
+            if voice.mix_end is not None:
+                add_span("mix", "audio", voice.mix_start, voice.mix_end, started=voice.sound.name)
+
+    def __record_latency(self, name: str, requested_time: float, start_time: float):
+        """ Keep and log the start latency of a voice prompt.
+
+        Args:
+            - name: Name of the sound file
+            - requested_time: Time at which the sound should have started [s since epoch]
+            - start_time: Time at which the first sample reached the sound card [s since epoch]
+        """
+
+        latency = PromptLatency(name, requested_time, start_time)
+        self.latencies.append(latency)
+        add_span(f"Latency: {name}", "audio", min(requested_time, start_time), max(requested_time, start_time),
+                 "Voice prompts", latency_ms=round(latency.latency * 1000, 3))
+        LOGGER.debug(f"Voice prompt {latency}")
+
+    def report_latencies(self):
+        """ Log a summary of the start latencies of the voice prompts. """
+
+        if self.stream is not None:
+            self.__collect()
+
+        if not self.latencies:
+            return
+
+        latencies = np.array([latency.latency for latency in self.latencies]) * 1000
+        LOGGER.info(f"Start latency of {len(latencies)} voice prompt(s): mean {latencies.mean():.1f}ms, "
+                    f"max {latencies.max():.1f}ms")
+
+    def stop(self):
+        """ Stop and close the output stream. """
+
+        if self.stream is not None:
+            self.stopped.set()
+            self.stream.stop()
+            self.stream.close()
+            self.__collect()
+            self.stream = None
+
+
+__AUDIO_ENGINE: Union[AudioEngine, None] = None
+__AUDIO_ENGINE_LOCK = threading.Lock()
+
+
+def get_audio_engine() -> AudioEngine:
+    """ Returns the audio engine, which is created (and the sound files decoded) on first use.
+
+    Returns: Audio engine.
+    """
+
+    global __AUDIO_ENGINE
+
+    with __AUDIO_ENGINE_LOCK:
+        if __AUDIO_ENGINE is None:
+            __AUDIO_ENGINE = AudioEngine()
+
+        return __AUDIO_ENGINE
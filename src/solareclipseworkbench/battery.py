@@ -0,0 +1,384 @@
+""" Tracking and prediction of the battery drain of the cameras.
+
+The battery level of the cameras is read regularly (in the lane of each camera, in between its capture commands, and
+not inside a quiet window, see Dispatcher.sample_camera_status), and kept as a time series per camera.  From this
+series, the drain rate of each battery is fitted as:
+
+    - An idle drain [%/h], for the time the camera is switched on;
+    - A drain per image [%/image], for the images that should have been taken according to the script.
+
+With these rates and the images that are still to be taken, the battery level is predicted until C4.  When a battery is
+predicted to run out before C4, an alert is logged (and published on the event bus), with the time until which the
+battery can be swapped before totality.
+
+The battery level is read as a coarse string (e.g. "75%" or "Full"), so the drain rates are only fitted when the series
+spans enough time (30 minutes).  Until then, the default rates are used for the prediction, but no alert is given.
+When the battery level goes up, the battery is assumed to have been swapped, and the series of that camera starts
+again.
+"""
+import bisect
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Union
+
+import numpy as np
+import pytz
+
+from solareclipseworkbench.events import get_event_bus, CameraStatusSampled, BatteryAlert
+from solareclipseworkbench.forecast import CameraProfile, count_images
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench")
+
+# Time between two readings of the battery level of a camera (skipped when the camera has been read in the meantime,
+# e.g. by the camera overview of the UI or by the daemon) [s]
+
+BATTERY_POLL_INTERVAL = 60.0
+
+# Default drain of a battery: idle [%/h] and per image [%/image]
+
+DEFAULT_IDLE_DRAIN = 10.0
+DEFAULT_IMAGE_DRAIN = 0.05
+
+# Minimum number of readings, and minimum time they span, before the drain rates are fitted [s]
+
+MIN_READINGS = 3
+MIN_FIT_TIME = 1800.0
+
+# Battery level below which the camera is considered to be out of power [%]
+
+MIN_BATTERY_LEVEL = 5.0
+
+# Increase of the battery level that indicates that the battery has been swapped [%]
+
+SWAP_LEVEL_INCREASE = 20.0
+
+# Time before C2 (or before the maximum of a partial eclipse) until which a battery can be swapped
+
+SWAP_MARGIN = timedelta(minutes=5)
+
+# Battery levels that are reported as text instead of as a percentage
+
+BATTERY_LEVELS = {"full": 100.0, "high": 75.0, "medium": 50.0, "half": 50.0, "low": 10.0, "empty": 0.0}
+
+
+def parse_battery_level(battery_level: Union[str, None]) -> Union[float, None]:
+    """ Convert the given battery level, as reported by the camera, to a percentage.
+
+    Args:
+        - battery_level: Battery level of the camera (e.g. "75%", "100", or "Full")
+
+    Returns: Battery level [%], None if it cannot be interpreted.
+    """
+
+    if battery_level is None:
+        return None
+
+    match = re.search(r"\d+(\.\d+)?", str(battery_level))
+    if match:
+        return min(100.0, float(match.group()))
+
+    return BATTERY_LEVELS.get(str(battery_level).strip().lower())
+
+
+class DrainRate:
+
+    def __init__(self, idle_drain: float = DEFAULT_IDLE_DRAIN, image_drain: float = DEFAULT_IMAGE_DRAIN,
+                 fitted: bool = False):
+        """ Drain rate of the battery of a camera.
+
+        Args:
+            - idle_drain: Drain of the battery while the camera is switched on [%/h]
+            - image_drain: Drain of the battery per image that is taken [%/image]
+            - fitted: Whether the rates have been fitted to the readings (False for the default rates)
+        """
+
+        self.idle_drain = idle_drain
+        self.image_drain = image_drain
+        self.fitted = fitted
+
+    def __str__(self):
+        return f"{self.idle_drain:.1f}%/h + {self.image_drain:.3f}%/image" + ("" if self.fitted else " (default)")
+
+
+def fit_drain_rate(times: list, levels: list, images: list) -> DrainRate:
+    """ Fit the drain rate of a battery to the given readings.
+
+    The battery level is modelled as level = initial level - idle drain * time - image drain * images.  When no images
+    have been taken between the readings, only the idle drain is fitted.
+
+    Args:
+        - times: Time of the readings [s], in increasing order
+        - levels: Battery level at the time of the readings [%]
+        - images: Number of images that have been taken at the time of the readings
+
+    Returns: Fitted drain rate (the default rate if there are not enough readings).
+    """
+
+    if len(times) < MIN_READINGS or times[-1] - times[0] < MIN_FIT_TIME:
+        return DrainRate()
+
+    hours = (np.array(times) - times[0]) / 3600.0
+    levels = np.array(levels, dtype=float)
+    images = np.array(images, dtype=float)
+
+    if np.ptp(images) > 0:
+        design = np.column_stack((np.ones_like(hours), -hours, -images))
+        (_, idle_drain, image_drain), *_ = np.linalg.lstsq(design, levels, rcond=None)
+
+        if image_drain >= 0:
+            return DrainRate(max(0.0, idle_drain), image_drain, True)
+
+    # Only the idle drain (with the default drain per image)
+
+    design = np.column_stack((np.ones_like(hours), -hours))
+    (_, idle_drain), *_ = np.linalg.lstsq(design, levels + DEFAULT_IMAGE_DRAIN * images, rcond=None)
+
+    return DrainRate(max(0.0, idle_drain), DEFAULT_IMAGE_DRAIN, True)
+
+
+def get_depletion_time(time: datetime, level: float, rate: DrainRate) -> datetime:
+    """ Returns the time at which a battery runs out when the camera is idle.
+
+    Args:
+        - time: Start time
+        - level: Battery level at the start time [%]
+        - rate: Drain rate of the battery
+
+    Returns: Time at which the battery level drops below the minimum battery level.
+    """
+
+    if rate.idle_drain <= 0 or level <= MIN_BATTERY_LEVEL:
+        return time
+
+    return time + timedelta(hours=(level - MIN_BATTERY_LEVEL) / rate.idle_drain)
+
+
+class BatteryMonitor:
+
+    def __init__(self, estimates: list, cameras: dict, scheduler, samples: list = (), storage_profiles: dict = None,
+                 interval: float = BATTERY_POLL_INTERVAL):
+        """ Initialisation of a monitor that reads the battery level of the cameras regularly, and predicts whether the
+            batteries last until C4.
+
+        The monitor also uses the readings of the status of the cameras that are taken elsewhere (e.g. by the camera
+        overview of the UI, or by the daemon).  A battery that is predicted to run out before C4 is reported (logged,
+        and published on the event bus) once, until the battery has been swapped.
+
+        Args:
+            - estimates: List of CommandEstimate objects, sorted by execution time (see transitions.estimate_plan)
+            - cameras: Dictionary of camera names and camera objects
+            - scheduler: Scheduler that executes the script (Dispatcher), with the reference moments and the time shift
+                         (when simulating), which reads the status of the cameras in their lanes
+            - samples: Readings of the status of the cameras, as CameraStatusSampled events
+            - storage_profiles: Dictionary with the camera names as keys and CameraProfile objects as values, to count
+                                the images of a burst (None for the default profiles)
+            - interval: Time between two readings of the battery level of a camera [s]
+        """
+
+        self.cameras = cameras
+        self.scheduler = scheduler
+        self.interval = interval
+
+        reference_moments = scheduler.reference_moments
+        self.time_shift = scheduler.time_shift
+        self.end_time = reference_moments["C4"].time_utc if "C4" in reference_moments else None
+        critical_moment = reference_moments.get("C2") or reference_moments.get("MAX")
+        self.swap_deadline = critical_moment.time_utc - SWAP_MARGIN if critical_moment else None
+
+        # Camera name -> times of the images [UTC, timeline of the reference moments], and cumulative number of images
+
+        self.image_times: dict = {}
+        self.image_counts: dict = {}
+
+        storage_profiles = storage_profiles or {}
+        for estimate in estimates:
+            camera_name = estimate.command.get_camera_name()
+            num_images = count_images(estimate.command, storage_profiles.get(camera_name) or CameraProfile())
+            counts = self.image_counts.setdefault(camera_name, [])
+            self.image_times.setdefault(camera_name, []).append(estimate.execution_time)
+            counts.append((counts[-1] if counts else 0) + num_images)
+
+        # Camera name -> list of readings (time [UTC, timeline of the reference moments], battery level [%]), and the
+        # time of the latest reading of the status [UTC]
+
+        self.readings: dict = {}
+        self.last_sample_times: dict = {}
+        self.alerted: set = set()
+        self.lock = threading.RLock()
+
+        for sample in samples:
+            self.update(sample)
+
+        self.subscription = get_event_bus().subscribe(CameraStatusSampled, self.update)
+
+        self.stopped = threading.Event()
+        threading.Thread(target=self.__poll_cameras, name="Battery monitor", daemon=True).start()
+
+    def update(self, sample: CameraStatusSampled):
+        """ Add the battery level of the given reading to the series of the camera, and update the prediction.
+
+        Args:
+            - sample: Reading of the status of a camera
+        """
+
+        camera_name = sample.camera_name
+        level = parse_battery_level(sample.battery_level)
+
+        with self.lock:
+            self.last_sample_times[camera_name] = sample.time
+            if level is None:
+                return
+
+            readings = self.readings.setdefault(camera_name, [])
+            if readings and level >= readings[-1][1] + SWAP_LEVEL_INCREASE:
+                LOGGER.info(f"The battery of {camera_name} has been swapped ({readings[-1][1]:.0f}% -> {level:.0f}%)")
+                readings.clear()
+                self.alerted.discard(camera_name)
+
+            readings.append((sample.time + self.time_shift, level))
+            self.__check(camera_name)
+
+    def get_drain_rate(self, camera_name: str) -> DrainRate:
+        """ Returns the drain rate of the battery of the given camera, fitted to its readings.
+
+        Args:
+            - camera_name: Name of the camera
+
+        Returns: Drain rate of the battery.
+        """
+
+        with self.lock:
+            readings = list(self.readings.get(camera_name, []))
+
+        if not readings:
+            return DrainRate()
+
+        start = readings[0][0]
+        return fit_drain_rate([(time - start).total_seconds() for time, _ in readings],
+                              [level for _, level in readings],
+                              [self.__count_images(camera_name, time) for time, _ in readings])
+
+    def predict(self, camera_name: str) -> tuple:
+        """ Predict the battery level of the given camera at C4 (or after the last image, if C4 does not occur).
+
+        Args:
+            - camera_name: Name of the camera
+
+        Returns: Tuple with the predicted battery level at the end [%], and the time at which the battery is predicted
+                 to run out [UTC, timeline of the reference moments] (None if it lasts until the end).  None if there
+                 are no readings for the camera.
+        """
+
+        with self.lock:
+            readings = self.readings.get(camera_name)
+            if not readings:
+                return None
+            now, level = readings[-1]
+
+        rate = self.get_drain_rate(camera_name)
+
+        image_times = self.image_times.get(camera_name, [])
+        image_counts = self.image_counts.get(camera_name, [])
+        end_time = self.end_time or (image_times[-1] if image_times else now)
+
+        # Step through the images that are still to be taken
+
+        time = now
+        taken = self.__count_images(camera_name, now)
+        depletion_time = None
+
+        for index in range(bisect.bisect_right(image_times, now), len(image_times)):
+            if image_times[index] > end_time:
+                break
+
+            idle_level = level - rate.idle_drain * (image_times[index] - time).total_seconds() / 3600.0
+            if idle_level < MIN_BATTERY_LEVEL and depletion_time is None:
+                depletion_time = get_depletion_time(time, level, rate)
+
+            level = idle_level - rate.image_drain * (image_counts[index] - taken)
+            if level < MIN_BATTERY_LEVEL and depletion_time is None:
+                depletion_time = image_times[index]
+
+            time = image_times[index]
+            taken = image_counts[index]
+
+        if end_time > time:
+            idle_level = level - rate.idle_drain * (end_time - time).total_seconds() / 3600.0
+            if idle_level < MIN_BATTERY_LEVEL and depletion_time is None:
+                depletion_time = get_depletion_time(time, level, rate)
+            level = idle_level
+
+        return max(0.0, level), depletion_time
+
+    def stop(self):
+        """ Stop reading the battery levels. """
+
+        self.stopped.set()
+        get_event_bus().unsubscribe(self.subscription)
+
+    def __count_images(self, camera_name: str, time: datetime) -> int:
+        """ Returns the number of images that should have been taken by the given camera at the given time.
+
+        Args:
+            - camera_name: Name of the camera
+            - time: Time [UTC, timeline of the reference moments]
+
+        Returns: Number of images.
+        """
+
+        index = bisect.bisect_right(self.image_times.get(camera_name, []), time)
+        return self.image_counts[camera_name][index - 1] if index else 0
+
+    def __check(self, camera_name: str):
+        """ Alert when the battery of the given camera is predicted to run out before C4 (and has not been alerted yet).
+
+        Args:
+            - camera_name: Name of the camera
+        """
+
+        prediction = self.predict(camera_name)
+        if prediction is None:
+            return
+
+        end_level, depletion_time = prediction
+        now, level = self.readings[camera_name][-1]
+        rate = self.get_drain_rate(camera_name)
+
+        LOGGER.info(f"Battery of {camera_name}: {level:.0f}%, draining {rate}, {end_level:.0f}% left at the end of the "
+                    f"script")
+
+        # The default drain rate is only a rough guess, so no alert is given before the drain rate has been fitted
+
+        if depletion_time is None or not rate.fitted or camera_name in self.alerted:
+            return
+
+        self.alerted.add(camera_name)
+
+        if self.swap_deadline and self.swap_deadline > now:
+            deadline = min(self.swap_deadline, depletion_time)
+            advice = f"swap it before {(deadline - self.time_shift).strftime('%H:%M:%S')}"
+        else:
+            deadline = None
+            advice = "swap it as soon as possible"
+
+        message = f"The battery of {camera_name} ({level:.0f}%) is predicted to run out at " \
+                  f"{(depletion_time - self.time_shift).strftime('%H:%M:%S')}, before the end of the script: {advice}"
+
+        LOGGER.warning(message)
+        get_event_bus().publish(BatteryAlert(camera_name, level, depletion_time - self.time_shift,
+                                             deadline - self.time_shift if deadline else None, message))
+
+    def __poll_cameras(self):
+        """ Read the status of the cameras regularly (in the lane of each camera), unless it has been read in the
+            meantime. """
+
+        while not self.stopped.wait(self.interval):
+            now = datetime.now(pytz.utc)
+            cameras = {camera_name: camera for camera_name, camera in self.cameras.items()
+                       if camera_name not in self.last_sample_times
+                       or (now - self.last_sample_times[camera_name]).total_seconds() >= self.interval}
+
+            if cameras:
+                self.scheduler.sample_camera_status(cameras)
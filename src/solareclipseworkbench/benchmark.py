@@ -0,0 +1,492 @@
+""" Benchmarks for the scheduling and computation hot paths.
+
+The benchmarks run offline (the ephemeris is taken from the skyfield-data package when it is not in the working
+directory), on the scripts in the scripts directory, and with simulated cameras:
+
+    - reference_moments_cold: First calculation of the reference moments in a new process (loading the ephemeris and
+      the timezone data included);
+    - reference_moments_warm: Next calculations of the reference moments;
+    - convert_script[...]: Conversion of a script (expansion of the loops and of the relative times);
+    - load_plan[...]: Loading of the compiled plan of a script from the cache on disk (as in a new session);
+    - schedule_commands[...]: Scheduling of all commands of a script with a running scheduler;
+    - jobs_table_build: Construction of the jobs table for the 2024-04-08 script (about 2400 jobs);
+    - countdown_tick: One update of the countdown in the jobs table (as done every second);
+    - dispatcher_jitter: Delay between the execution time and the actual start of jobs on the camera and voice lanes,
+      with simulated cameras [ms].
+
+The results are saved as JSON, and can be compared with the results of a previous run (e.g. of the previous release),
+in which case the benchmarks that became slower than the given tolerance are reported as regressions.
+
+Usage:
+
+    python src/solareclipseworkbench/benchmark.py -o results.json
+    python src/solareclipseworkbench/benchmark.py -o results.json --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+import numpy as np
+import pytz
+
+SCRIPTS_PATH = Path(__file__).resolve().parent.parent.parent / "scripts"
+BENCHMARK_SCRIPTS = ["20240408.txt", "testEOS1000D.txt", "testEOS80D.txt", "testEOSR.txt"]
+
+# Total solar eclipse of 2024-04-08, seen from Durango (Mexico)
+
+LONGITUDE = -104.63525
+LATITUDE = 24.01491
+ALTITUDE = 1877.3
+ECLIPSE_DATE = "2024-04-08"
+
+# Number of rows of the jobs table that are visible (of which the countdown is updated every second)
+
+VISIBLE_ROWS = 30
+
+# Simulated cameras: time it takes to take a picture [s]
+
+SIMULATED_CAPTURE_TIME = 0.02
+
+# Jobs for the jitter benchmark: number of jobs per lane, and the interval between the jobs of a lane [s]
+
+JITTER_JOBS_PER_LANE = 50
+JITTER_INTERVAL = 0.1
+
+COLD_REFERENCE_MOMENTS_CODE = """
+import time
+from astropy.time import Time
+from solareclipseworkbench.reference_moments import calculate_reference_moments
+start = time.perf_counter()
+calculate_reference_moments({longitude}, {latitude}, {altitude}, Time("{date}"))
+print(time.perf_counter() - start)
+"""
+
+
+class SimulatedCamera:
+
+    def __init__(self, camera_name: str):
+        """ Initialisation of a simulated camera, which takes pictures without hardware.
+
+        Args:
+            - camera_name: Name of the camera
+        """
+
+        self.camera_name = camera_name
+        self.num_pictures = 0
+
+    def exit(self):
+        pass
+
+
+class SimulatedCameras(dict):
+    """ Dictionary of camera names and simulated cameras, in which a camera is created for every name looked up. """
+
+    def __missing__(self, camera_name: str) -> SimulatedCamera:
+        self[camera_name] = SimulatedCamera(camera_name)
+        return self[camera_name]
+
+
+def time_function(func: Callable, repeat: int, setup: Callable = None) -> dict:
+    """ Time the given function.
+
+    The garbage collector is run before each repetition, and the setup (if any) is not included in the timing.
+
+    Args:
+        - func: Function to time.  It receives the result of the setup (if any)
+        - repeat: Number of repetitions
+        - setup: Function that is executed before each repetition
+
+    Returns: Dictionary with the number of samples, and the minimum, median, mean, and maximum duration [s].
+    """
+
+    durations = []
+
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        gc.collect()
+
+        start = time.perf_counter()
+        func(*args)
+        durations.append(time.perf_counter() - start)
+
+    return summarise(durations, "s")
+
+
+def summarise(samples: list, unit: str) -> dict:
+    """ Returns the statistics of the given samples.
+
+    The median is used as the value to compare between runs, as it is least sensitive to outliers.
+
+    Args:
+        - samples: Measured values
+        - unit: Unit of the measured values
+
+    Returns: Dictionary with the unit, the number of samples, the minimum, median, mean, and maximum value.
+    """
+
+    return {
+        "unit": unit,
+        "samples": len(samples),
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "max": max(samples),
+        "value": statistics.median(samples),
+    }
+
+
+def get_reference_moments() -> dict:
+    """ Returns the reference moments of the benchmark eclipse.
+
+    Returns: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects.
+    """
+
+    from astropy.time import Time
+    from solareclipseworkbench.reference_moments import calculate_reference_moments
+
+    reference_moments, _, _ = calculate_reference_moments(LONGITUDE, LATITUDE, ALTITUDE, Time(ECLIPSE_DATE))
+
+    return reference_moments
+
+
+def schedule_script(script: Path, reference_moments: dict, start: bool = True):
+    """ Schedule the commands of the given script, as a simulation that starts one day from now at C1.
+
+    Args:
+        - script: Script to schedule
+        - reference_moments: Reference moments of the eclipse
+        - start: Whether to start the scheduler before the commands are scheduled
+
+    Returns: Scheduler with the scheduled commands.
+    """
+
+    from solareclipseworkbench.dispatcher import Dispatcher
+    from solareclipseworkbench.utils import schedule_commands
+
+    scheduler = Dispatcher(quiet_windows=[])
+    if start:
+        scheduler.start(paused=True)
+
+    simulated_start = datetime.now(pytz.utc) + timedelta(days=1)
+    scheduler.set_reference_moments(reference_moments, reference_moments["C1"].time_utc - simulated_start)
+    schedule_commands(str(script), scheduler, reference_moments, SimulatedCameras(), None, "C1", simulated_start)
+
+    return scheduler
+
+
+def benchmark_reference_moments(repeat: int) -> dict:
+    """ Benchmark the calculation of the reference moments, in a new process (cold) and in this process (warm).
+
+    Args:
+        - repeat: Number of repetitions
+
+    Returns: Dictionary with the results of the benchmarks.
+    """
+
+    code = COLD_REFERENCE_MOMENTS_CODE.format(longitude=LONGITUDE, latitude=LATITUDE, altitude=ALTITUDE,
+                                              date=ECLIPSE_DATE)
+    source_path = str(Path(__file__).resolve().parent.parent)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [source_path, os.environ.get("PYTHONPATH")])))
+
+    cold = []
+    for _ in range(max(1, repeat // 3)):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+        cold.append(float(output.stdout.strip().splitlines()[-1]))
+
+    # The first calculation in this process is not timed
+
+    get_reference_moments()
+
+    return {
+        "reference_moments_cold": summarise(cold, "s"),
+        "reference_moments_warm": time_function(get_reference_moments, repeat),
+    }
+
+
+def benchmark_scripts(reference_moments: dict, repeat: int) -> dict:
+    """ Benchmark the conversion and the scheduling of the benchmark scripts.
+
+    Args:
+        - reference_moments: Reference moments of the eclipse
+        - repeat: Number of repetitions
+
+    Returns: Dictionary with the results of the benchmarks.
+    """
+
+    from solareclipseworkbench.audio import get_audio_engine
+    from solareclipseworkbench.merge import get_plan_cache, PlanCache, ScriptSource
+    from solareclipseworkbench.scripts import convert_script
+
+    # Decode the sound files beforehand, as is done before the commands are scheduled
+    get_audio_engine()
+
+    # The scheduling does not use the plans that have been cached on disk (e.g. by previous runs)
+    get_plan_cache().path = None
+    plans_path = Path(tempfile.mkdtemp(prefix="sew-benchmark-plans-"))
+
+    results = {}
+
+    for script_name in BENCHMARK_SCRIPTS:
+        script = SCRIPTS_PATH / script_name
+
+        results[f"convert_script[{script_name}]"] = time_function(
+            lambda: convert_script(str(script), reference_moments), repeat)
+
+        PlanCache(plans_path).compile(ScriptSource(script), reference_moments)
+        results[f"load_plan[{script_name}]"] = time_function(
+            lambda: PlanCache(plans_path).compile(ScriptSource(script), reference_moments), repeat)
+
+        schedulers = []
+        results[f"schedule_commands[{script_name}]"] = time_function(
+            lambda: schedulers.append(schedule_script(script, reference_moments)), repeat)
+
+        results[f"schedule_commands[{script_name}]"]["jobs"] = len(schedulers[-1].schedule)
+        for scheduler in schedulers:
+            scheduler.shutdown(wait=False)
+
+    return results
+
+
+def benchmark_jobs_table(reference_moments: dict, repeat: int) -> dict:
+    """ Benchmark the construction of the jobs table and the update of its countdown, for the 2024-04-08 script.
+
+    Args:
+        - reference_moments: Reference moments of the eclipse
+        - repeat: Number of repetitions
+
+    Returns: Dictionary with the results of the benchmarks.
+    """
+
+    from PyQt6.QtCore import QCoreApplication, Qt
+    from solareclipseworkbench.gui import JobsTableModel, TIME_FORMATS
+
+    # Keep a reference to the application while the models are used
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+
+    scheduler = schedule_script(SCRIPTS_PATH / "20240408.txt", reference_moments, start=False)
+    num_jobs = len(scheduler.schedule)
+
+    # The jobs table only needs the time format of the view and the location of the model
+
+    controller = SimpleNamespace(view=SimpleNamespace(time_format=list(TIME_FORMATS.keys())[0]),
+                                 model=SimpleNamespace(longitude=LONGITUDE, latitude=LATITUDE))
+
+    build = time_function(lambda: JobsTableModel(scheduler, controller), repeat)
+    build["jobs"] = num_jobs
+
+    jobs_model = JobsTableModel(scheduler, controller)
+    countdown_column = 0
+
+    def tick():
+        jobs_model.update_countdown(0, VISIBLE_ROWS - 1)
+        for row in range(VISIBLE_ROWS):
+            jobs_model.data(jobs_model.index(row, countdown_column), Qt.ItemDataRole.DisplayRole)
+
+    countdown = time_function(tick, repeat * 10)
+    countdown["jobs"] = num_jobs
+
+    return {"jobs_table_build": build, "countdown_tick": countdown}
+
+
+def benchmark_dispatcher_jitter() -> dict:
+    """ Benchmark the delay between the execution time and the actual start of jobs, with simulated cameras.
+
+    Jobs are scheduled on two camera lanes and on the voice lane at the same times, so the lanes compete for the
+    scheduler.
+
+    Returns: Dictionary with the results of the benchmark.
+    """
+
+    from solareclipseworkbench.camera import CameraSettings
+    from solareclipseworkbench.dispatcher import Dispatcher, JobPriority, get_camera_lane, VOICE_LANE
+
+    delays = []
+    lock = threading.Lock()
+
+    def take_picture(camera: SimulatedCamera, camera_settings: CameraSettings, execution_time: float):
+        delay = time.time() - execution_time
+        with lock:
+            delays.append(delay * 1000)
+        camera.num_pictures += 1
+        time.sleep(SIMULATED_CAPTURE_TIME)
+
+    def voice_prompt(sound_name: str, start_time: float):
+        delay = time.time() - start_time
+        with lock:
+            delays.append(delay * 1000)
+
+    scheduler = Dispatcher(quiet_windows=[])
+    scheduler.start()
+
+    cameras = [SimulatedCamera("Simulated camera 1"), SimulatedCamera("Simulated camera 2")]
+    first_time = datetime.now(pytz.utc) + timedelta(seconds=1)
+
+    for index in range(JITTER_JOBS_PER_LANE):
+        execution_time = first_time + timedelta(seconds=index * JITTER_INTERVAL)
+
+        for camera in cameras:
+            camera_settings = CameraSettings(camera.camera_name, "1/1000", "8", 100)
+            scheduler.add_command(take_picture, execution_time, [camera, camera_settings, execution_time.timestamp()],
+                                  f"Picture {index + 1}", JobPriority.CAPTURE, get_camera_lane(camera.camera_name))
+        scheduler.add_command(voice_prompt, execution_time, ["C2_IN_10_SECONDS"], f"Voice prompt {index + 1}",
+                              JobPriority.VOICE, VOICE_LANE, {"start_time": execution_time.timestamp()})
+
+    scheduler.wait_until_completed(JITTER_JOBS_PER_LANE * JITTER_INTERVAL + 30)
+    scheduler.shutdown()
+
+    result = summarise(delays, "ms")
+    result.update({"p95": float(np.percentile(delays, 95)), "p99": float(np.percentile(delays, 99))})
+    result["value"] = result["p99"]
+
+    return {"dispatcher_jitter": result}
+
+
+def run_benchmarks(repeat: int) -> dict:
+    """ Run all benchmarks.
+
+    Args:
+        - repeat: Number of repetitions of the timed benchmarks
+
+    Returns: Dictionary with the results of the benchmarks, and the environment in which they were run.
+    """
+
+    results = benchmark_reference_moments(repeat)
+
+    reference_moments = get_reference_moments()
+    results.update(benchmark_scripts(reference_moments, repeat))
+    results.update(benchmark_jobs_table(reference_moments, repeat))
+    results.update(benchmark_dispatcher_jitter())
+
+    return {
+        "time": datetime.now(pytz.utc).isoformat(),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def get_commit() -> str:
+    """ Returns the git commit of the benchmarked code (if available).
+
+    Returns: Hash of the current git commit, or an empty string when it cannot be determined.
+    """
+
+    try:
+        output = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent)
+        return output.stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """ Compare the given results with the given baseline.
+
+    Args:
+        - results: Results of this run
+        - baseline: Results of a previous run
+        - tolerance: Relative increase of a value that is tolerated (e.g. 0.2 for 20%)
+
+    Returns: List with a description of each regression.
+    """
+
+    regressions = []
+
+    for name, result in results["results"].items():
+        previous = baseline["results"].get(name)
+        if not previous:
+            continue
+
+        if result["value"] > previous["value"] * (1 + tolerance):
+            regressions.append(f"{name}: {previous['value']:.6g}{previous['unit']} -> "
+                               f"{result['value']:.6g}{result['unit']} "
+                               f"(+{(result['value'] / previous['value'] - 1) * 100:.0f}%)")
+
+    return regressions
+
+
+def use_packaged_ephemeris():
+    """ Work in a temporary directory with the ephemeris of the skyfield-data package, when the ephemeris is not in the
+    working directory (so it is not downloaded). """
+
+    if Path("de421.bsp").exists():
+        return
+
+    from skyfield_data import get_skyfield_data_path
+
+    working_directory = tempfile.mkdtemp(prefix="sew-benchmark-")
+    shutil.copy(Path(get_skyfield_data_path()) / "de421.bsp", working_directory)
+    os.chdir(working_directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of Solar Eclipse Workbench")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="file in which to save the results (JSON)",
+        default="benchmark.json"
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        help="number of repetitions of the timed benchmarks (default: 10)",
+        default=10,
+        type=int
+    )
+    parser.add_argument(
+        "-c",
+        "--compare",
+        help="results of a previous run (JSON) to compare with",
+        default=None
+    )
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        help="relative slowdown w.r.t. the previous run that is reported as regression (default: 0.2)",
+        default=0.2,
+        type=float
+    )
+
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve()
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+
+    use_packaged_ephemeris()
+    results = run_benchmarks(args.repeat)
+
+    output.write_text(json.dumps(results, indent=4))
+
+    for name, result in results["results"].items():
+        print(f"{name:<45} {result['value']:>12.6f} {result['unit']}")
+    print(f"Results saved in {output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 import locale
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Union, TYPE_CHECKING
 
 import gphoto2
 import gphoto2 as gp
@@ -8,6 +11,17 @@ from datetime import datetime
 
 from gphoto2 import Camera
 
+from solareclipseworkbench.events import get_event_bus, CameraStatusSampled
+from solareclipseworkbench.tracing import span
+
+if TYPE_CHECKING:
+    # The camera workers import this module
+    from solareclipseworkbench.camera_workers import CameraWorkerPool
+
+# Pause after a change of the ISO, aperture, or shutter speed, to let the camera settle [s]
+
+SETTLE_TIME = 0.1
+
 
 class CameraError(Exception):
     pass
@@ -38,50 +52,86 @@ def take_picture(camera: Camera, camera_settings: CameraSettings) -> None:
         - camera_settings: Settings of the camera (exposure, f, iso)
     """
 
-    context, config = __adapt_camera_settings(camera, camera_settings)
+    camera_name = camera_settings.camera_name
 
-    # Take picture
-    camera.capture(gp.GP_CAPTURE_IMAGE, context)
+    with span("take_picture", "camera", camera=camera_name):
+        context, config = __adapt_camera_settings(camera, camera_settings)
+
+        # Take picture
+        with span("capture", "camera", camera=camera_name):
+            camera.capture(gp.GP_CAPTURE_IMAGE, context)
 
 
 def __adapt_camera_settings(camera, camera_settings):
+    """ Apply the given camera settings (ISO, aperture, shutter speed) to the given camera.
+
+    Only the settings that differ from the current configuration of the camera are sent to the camera, as every change
+    costs a round trip to the camera (and a pause to let it settle).
+
+    Args:
+        - camera: Camera object
+        - camera_settings: Settings of the camera (exposure, f, iso)
+
+    Returns: Context and configuration of the camera.
+    """
+
+    camera_name = camera_settings.camera_name
+
     context = gp.gp_context_new()
-    config = gp.check_result(gp.gp_camera_get_config(camera, context))
+    with span("get_config", "camera", camera=camera_name):
+        config = gp.check_result(gp.gp_camera_get_config(camera, context))
     # Set ISO
     if "Nikon" in camera_settings.camera_name:
-        gp.gp_widget_set_value(gp.check_result(gp.gp_widget_get_child_by_name(config, 'autoiso')), str("Off"))
-        # set config
-        gp.gp_camera_set_config(camera, config, context)
+        __set_widget(camera, config, context, camera_name, 'autoiso', "Off", settle=False)
 
-    gp.gp_widget_set_value(gp.check_result(gp.gp_widget_get_child_by_name(config, 'iso')), str(camera_settings.iso))
-    # set config
-    gp.gp_camera_set_config(camera, config, context)
-    time.sleep(0.1)
+    __set_widget(camera, config, context, camera_name, 'iso', str(camera_settings.iso))
 
     # Set aperture
     try:
         if "Canon" in camera_settings.camera_name:
-            gp.gp_widget_set_value(gp.check_result(gp.gp_widget_get_child_by_name(config, 'aperture')),
-                                   str(camera_settings.aperture))
+            __set_widget(camera, config, context, camera_name, 'aperture', str(camera_settings.aperture))
         elif "Nikon" in camera_settings.camera_name:
-            gp.gp_widget_set_value(gp.check_result(gp.gp_widget_get_child_by_name(config, 'f-number')),
-                                   str(camera_settings.aperture))
-        # set config
-        gp.gp_camera_set_config(camera, config, context)
-        time.sleep(0.1)
+            __set_widget(camera, config, context, camera_name, 'f-number', str(camera_settings.aperture))
     except gphoto2.GPhoto2Error:
         pass
 
     # Set shutter speed
-    gp.gp_widget_set_value(gp.check_result(gp.gp_widget_get_child_by_name(config, 'shutterspeed')),
-                           str(camera_settings.shutter_speed))
-    # set config
-    gp.gp_camera_set_config(camera, config, context)
-    time.sleep(0.1)
+    __set_widget(camera, config, context, camera_name, 'shutterspeed', str(camera_settings.shutter_speed))
 
     return context, config
 
 
+def __set_widget(camera, config, context, camera_name: str, name: str, value: str, settle: bool = True) -> bool:
+    """ Set the given widget of the camera configuration to the given value, unless it already has that value.
+
+    Args:
+        - camera: Camera object
+        - config: Configuration of the camera
+        - context: gphoto2 context
+        - camera_name: Name of the camera
+        - name: Name of the widget, e.g. "iso"
+        - value: Value of the widget, e.g. "200"
+        - settle: Whether to pause after the change, to let the camera settle
+
+    Returns: True if the value was changed, False if the widget already had that value.
+    """
+
+    widget = gp.check_result(gp.gp_widget_get_child_by_name(config, name))
+    if gp.check_result(gp.gp_widget_get_value(widget)) == value:
+        return False
+
+    gp.gp_widget_set_value(widget, value)
+    # set config
+    with span("set_config", "camera", camera=camera_name, setting=name, value=value):
+        gp.gp_camera_set_config(camera, config, context)
+
+    if settle:
+        with span("settle", "camera", camera=camera_name):
+            time.sleep(SETTLE_TIME)
+
+    return True
+
+
 def take_burst(camera: Camera, camera_settings: CameraSettings, duration: float) -> None:
     """ Take a burst with the selected camera.  For Canon, the duration is the duration in seconds, for Nikon, the
         duration is the number of pictures to take.
@@ -91,6 +141,13 @@ def take_burst(camera: Camera, camera_settings: CameraSettings, duration: float)
         - camera_settings: Settings of the camera (exposure, f, iso)
         - duration: Duration of the burst in seconds (Canon) or number of pictures (Nikon)
     """
+    with span("take_burst", "camera", camera=camera_settings.camera_name, duration=duration):
+        __take_burst(camera, camera_settings, duration)
+
+
+def __take_burst(camera: Camera, camera_settings: CameraSettings, duration: float) -> None:
+    camera_name = camera_settings.camera_name
+
     context, config = __adapt_camera_settings(camera, camera_settings)
 
     # Take picture
@@ -99,27 +156,33 @@ def take_burst(camera: Camera, camera_settings: CameraSettings, duration: float)
         remote_release = gp.check_result(gp.gp_widget_get_child_by_name(config, 'eosremoterelease'))
         gp.gp_widget_set_value(remote_release, "Press Full")
         # set config
-        gp.gp_camera_set_config(camera, config, context)
-        time.sleep(duration)
+        with span("set_config", "camera", camera=camera_name, setting="eosremoterelease", value="Press Full"):
+            gp.gp_camera_set_config(camera, config, context)
+        with span("burst", "camera", camera=camera_name):
+            time.sleep(duration)
 
         # Release the button
         remote_release = gp.check_result(gp.gp_widget_get_child_by_name(config, 'eosremoterelease'))
         gp.gp_widget_set_value(remote_release, "Release Full")
         # set config
-        gp.gp_camera_set_config(camera, config, context)
+        with span("set_config", "camera", camera=camera_name, setting="eosremoterelease", value="Release Full"):
+            gp.gp_camera_set_config(camera, config, context)
     elif "Nikon" in camera_settings.camera_name:
         # Push the button
         capture_mode = gp.check_result(gp.gp_widget_get_child_by_name(config, 'capturemode'))
         gp.gp_widget_set_value(capture_mode, "Burst")
         # set config
-        gp.gp_camera_set_config(camera, config, context)
+        with span("set_config", "camera", camera=camera_name, setting="capturemode", value="Burst"):
+            gp.gp_camera_set_config(camera, config, context)
 
         burst_number = gp.check_result(gp.gp_widget_get_child_by_name(config, 'burstnumber'))
         gp.gp_widget_set_value(burst_number, round(duration))
         # set config
-        gp.gp_camera_set_config(camera, config, context)
+        with span("set_config", "camera", camera=camera_name, setting="burstnumber", value=round(duration)):
+            gp.gp_camera_set_config(camera, config, context)
 
-        camera.capture(gp.GP_CAPTURE_IMAGE, context)
+        with span("capture", "camera", camera=camera_name):
+            camera.capture(gp.GP_CAPTURE_IMAGE, context)
 
 
 def take_bracket(camera: Camera, camera_settings: CameraSettings, steps: str) -> None:
@@ -130,6 +193,13 @@ def take_bracket(camera: Camera, camera_settings: CameraSettings, steps: str) ->
         - camera_settings: Settings of the camera (exposure, f, iso)
         - steps: Steps for each bracketing step (e.g. +/- 1 2/3)
     """
+    with span("take_bracket", "camera", camera=camera_settings.camera_name, steps=steps):
+        __take_bracket(camera, camera_settings, steps)
+
+
+def __take_bracket(camera: Camera, camera_settings: CameraSettings, steps: str) -> None:
+    camera_name = camera_settings.camera_name
+
     context, config = __adapt_camera_settings(camera, camera_settings)
 
     if "Canon" in camera_settings.camera_name:
@@ -137,19 +207,19 @@ def take_bracket(camera: Camera, camera_settings: CameraSettings, steps: str) ->
         aeb = gp.check_result(gp.gp_widget_get_child_by_name(config, 'aeb'))
         gp.gp_widget_set_value(aeb, steps)
         # set config
-        gp.gp_camera_set_config(camera, config, context)
+        with span("set_config", "camera", camera=camera_name, setting="aeb", value=steps):
+            gp.gp_camera_set_config(camera, config, context)
 
-        camera.capture(gp.GP_CAPTURE_IMAGE, context)
-        camera.capture(gp.GP_CAPTURE_IMAGE, context)
-        camera.capture(gp.GP_CAPTURE_IMAGE, context)
-        camera.capture(gp.GP_CAPTURE_IMAGE, context)
-        camera.capture(gp.GP_CAPTURE_IMAGE, context)
+        for exposure in range(5):
+            with span("capture", "camera", camera=camera_name, exposure=exposure + 1):
+                camera.capture(gp.GP_CAPTURE_IMAGE, context)
 
         # Set aeb
         aeb = gp.check_result(gp.gp_widget_get_child_by_name(config, 'aeb'))
         gp.gp_widget_set_value(aeb, "off")
         # set config
-        gp.gp_camera_set_config(camera, config, context)
+        with span("set_config", "camera", camera=camera_name, setting="aeb", value="off"):
+            gp.gp_camera_set_config(camera, config, context)
 
 
 def mirror_lock(camera: Camera, camera_settings: CameraSettings) -> None:
@@ -415,6 +485,242 @@ def __set_datetime(config) -> bool:
     return False
 
 
+class ClockSyncResult:
+
+    def __init__(self, camera_name: str, offset_before: float, offset_after: float, uncertainty: float,
+                 round_trip: float, drift: Union[float, None]):
+        """ Keep the outcome of a clock synchronisation of a single camera.
+
+        All offsets are expressed as camera clock minus computer clock, so a positive offset means that the camera
+        clock is ahead.
+
+        Args:
+            - camera_name: Name of the camera
+            - offset_before: Measured clock offset before the camera time was set [s]
+            - offset_after: Measured clock offset after the camera time was set (verification) [s]
+            - uncertainty: Half-width of the interval in which the verified offset is known to lie [s]
+            - round_trip: Shortest round-trip time of reading the camera configuration [s]
+            - drift: Estimated clock drift since the previous synchronisation [s/day], None if not known yet
+        """
+
+        self.camera_name = camera_name
+        self.offset_before = offset_before
+        self.offset_after = offset_after
+        self.uncertainty = uncertainty
+        self.round_trip = round_trip
+        self.drift = drift
+
+    def is_synchronised(self, tolerance: float = 0.5) -> bool:
+        """ Check whether the camera clock matches the computer clock within the given tolerance.
+
+        Args:
+            - tolerance: Maximum allowed absolute offset after the synchronisation [s]
+
+        Returns: True if the verified offset lies within the given tolerance, False otherwise.
+        """
+
+        return abs(self.offset_after) <= tolerance
+
+
+# Per camera: computer time [s since epoch] at which the clock was last set, and the offset that was verified then
+__CLOCK_SYNC_HISTORY: dict = {}
+__CLOCK_SYNC_LOCK = threading.Lock()
+
+
+def __get_datetime_widget(config):
+    """ Private method to find the date and time widget of the camera.
+
+    The name of this widget varies with the camera driver ('datetimeutc', 'datetime' for Canon EOS, 'd034' for PTP).
+
+    Returns: Tuple with the widget and its name, or (None, None) if the camera has no date and time widget.
+    """
+
+    for name in ('datetimeutc', 'datetime', 'd034'):
+        ok, date_config = gp.gp_widget_get_child_by_name(config, name)
+        if ok >= gp.GP_OK:
+            return date_config, name
+
+    return None, None
+
+
+def __read_camera_clock(camera: Camera) -> (float, float, float):
+    """ Private method to read the clock of the camera once.
+
+    Args:
+        - camera: Camera object
+
+    Returns:
+        - Computer time at which the request was sent [s since epoch]
+        - Computer time at which the answer was received [s since epoch]
+        - Camera time [s since epoch], truncated to whole seconds by the camera
+    """
+
+    sent = time.time()
+    config = camera.get_config()
+    received = time.time()
+
+    date_config, name = __get_datetime_widget(config)
+    if date_config is None:
+        raise CameraError("Unknown date/time config item")
+
+    raw_value = date_config.get_value()
+    if date_config.get_type() == gp.GP_WIDGET_DATE:
+        camera_time = float(raw_value)
+    elif name == 'd034':
+        camera_time = float(raw_value)
+    else:
+        camera_time = datetime.strptime(raw_value, '%Y-%m-%d %H:%M:%S').timestamp()
+
+    return sent, received, camera_time
+
+
+def measure_time_offset(camera: Camera, samples: int = 5) -> (float, float, float):
+    """ Measure the offset of the camera clock w.r.t. the computer clock.
+
+    The camera only reports whole seconds, so a single reading only tells that the offset lies within an interval of
+    (at least) one second.  The readings are therefore spread over a second, and the intervals of all readings are
+    intersected, which gives an estimate that is considerably more accurate than the resolution of the camera clock.
+
+    Args:
+        - camera: Camera object
+        - samples: Number of round trips to the camera
+
+    Returns:
+        - Estimated offset (camera clock minus computer clock) [s]
+        - Half-width of the interval in which the offset is known to lie [s]
+        - Shortest round-trip time [s]
+    """
+
+    lower, upper = -float("inf"), float("inf")
+    round_trip = float("inf")
+    start = time.time()
+
+    for sample in range(samples):
+        sent, received, camera_time = __read_camera_clock(camera)
+
+        # The true camera clock lay in [camera_time, camera_time + 1) at some moment between sending and receiving
+
+        sample_lower = camera_time - received
+        sample_upper = camera_time + 1 - sent
+
+        if sample_lower > upper or sample_upper < lower:
+            # The camera clock was changed (or jumped) while sampling: restart from this sample
+            lower, upper = sample_lower, sample_upper
+        else:
+            lower, upper = max(lower, sample_lower), min(upper, sample_upper)
+        round_trip = min(round_trip, received - sent)
+
+        # Spread the readings evenly over a second, so they hit different phases of the camera clock
+
+        if sample < samples - 1:
+            time.sleep(max(0.0, start + (sample + 1) / samples - time.time()))
+
+    return (lower + upper) / 2, (upper - lower) / 2, round_trip
+
+
+def __set_aligned_datetime(camera: Camera, write_latency: float) -> None:
+    """ Private method to set the camera clock exactly on a second boundary of the computer clock.
+
+    The camera only accepts whole seconds, so the value is written such that it arrives at the camera when the
+    computer clock passes that whole second.
+
+    Args:
+        - camera: Camera object
+        - write_latency: Expected time between sending the configuration and the camera applying it [s]
+    """
+
+    config = camera.get_config()
+    date_config, name = __get_datetime_widget(config)
+    if date_config is None or name == 'd034':
+        raise CameraError("Could not set date & time")
+
+    target = int(time.time() + write_latency) + 1
+    time.sleep(max(0.0, target - write_latency - time.time()))
+
+    if date_config.get_type() == gp.GP_WIDGET_DATE:
+        date_config.set_value(target)
+    else:
+        date_config.set_value(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(target)))
+    camera.set_config(config)
+
+
+def sync_time(camera_name: str, camera: Camera, samples: int = 5) -> ClockSyncResult:
+    """ Synchronise the clock of the given camera with the computer clock and verify the result.
+
+    The following steps are taken:
+
+        - Measure the current offset of the camera clock with repeated round-trip sampling;
+        - Set the camera time, aligned to a second boundary of the computer clock;
+        - Measure the offset again to verify the result;
+        - Estimate the drift of the camera clock from the offset that built up since the previous synchronisation.
+
+    Args:
+        - camera_name: Name of the camera
+        - camera: Camera object
+        - samples: Number of round trips to the camera for each offset measurement
+
+    Returns: Result of the clock synchronisation.
+    """
+
+    offset_before, _, round_trip = measure_time_offset(camera, samples)
+    measured_at = time.time()
+
+    __set_aligned_datetime(camera, round_trip / 2)
+    set_at = time.time()
+
+    offset_after, uncertainty, _ = measure_time_offset(camera, samples)
+
+    with __CLOCK_SYNC_LOCK:
+        previous = __CLOCK_SYNC_HISTORY.get(camera_name)
+        __CLOCK_SYNC_HISTORY[camera_name] = (set_at, offset_after)
+
+    drift = None
+    if previous:
+        previous_set_at, previous_offset = previous
+        elapsed_days = (measured_at - previous_set_at) / 86400
+        if elapsed_days > 0:
+            drift = (offset_before - previous_offset) / elapsed_days
+
+    result = ClockSyncResult(camera_name, offset_before, offset_after, uncertainty, round_trip, drift)
+
+    logging.info(f"Clock of camera {camera_name}: offset {offset_before:+.3f}s before sync, {offset_after:+.3f}s "
+                 f"(+/- {uncertainty:.3f}s) after sync, round trip {round_trip * 1000:.0f}ms"
+                 + (f", drift {drift:+.2f}s/day" if drift is not None else ""))
+    if not result.is_synchronised():
+        logging.warning(f"Clock of camera {camera_name} is still off by {offset_after:+.3f}s after syncing")
+
+    return result
+
+
+def sync_camera_times(cameras: dict, samples: int = 5) -> dict:
+    """ Synchronise the clocks of all given cameras with the computer clock, in parallel.
+
+    Args:
+        - cameras: Dictionary of camera names and camera objects
+        - samples: Number of round trips to each camera for each offset measurement
+
+    Returns: Dictionary with the camera names as keys and the ClockSyncResult as values.  Cameras for which the
+             synchronisation failed are left out.
+    """
+
+    results = {}
+    if not cameras:
+        return results
+
+    with ThreadPoolExecutor(max_workers=len(cameras)) as executor:
+        futures = {executor.submit(sync_time, camera_name, camera, samples): camera_name
+                   for camera_name, camera in cameras.items()}
+
+        for future in as_completed(futures):
+            camera_name = futures[future]
+            try:
+                results[camera_name] = future.result()
+            except (gp.GPhoto2Error, CameraError) as exc:
+                logging.error(f"Could not sync the time of camera {camera_name}: {exc}")
+
+    return results
+
+
 def get_camera_dict() -> dict:
     """ Get a dictionary of camera names and their GPhoto2 camera object
     Returns: Dictionary of camera names and their GPhoto2 camera object
@@ -426,6 +732,53 @@ def get_camera_dict() -> dict:
     return cameras
 
 
+def release_cameras(cameras: dict) -> None:
+    """ Release the connection to the given cameras (e.g. when the command line is stopped).
+
+    Args:
+        - cameras: Dictionary of camera names and their GPhoto2 camera object
+    """
+
+    for camera_name, camera in cameras.items():
+        try:
+            camera.exit()
+        except gp.GPhoto2Error:
+            logging.warning(f"Could not release camera {camera_name}")
+
+
+def sample_camera_status(cameras: dict, worker_pool: "CameraWorkerPool" = None) -> list:
+    """ Read the battery level and free memory of the given cameras, and publish them on the event bus.
+
+    When the cameras are owned by camera workers, their status is requested from the workers, as the cameras cannot be
+    accessed from this process.
+
+    Args:
+        - cameras: Dictionary of camera names and their GPhoto2 camera object
+        - worker_pool: Pool of camera workers (None to access the cameras directly)
+
+    Returns: List of CameraStatusSampled events, for the cameras of which the status could be read.
+    """
+
+    samples = []
+
+    for camera_name, camera in cameras.items():
+        try:
+            if worker_pool:
+                # None (which cannot be unpacked) if the worker did not answer in time
+                battery_level, free_space, total_space = worker_pool.get_camera_status(camera_name)
+            else:
+                battery_level, free_space, total_space = \
+                    get_battery_level(camera), get_free_space(camera), get_space(camera)
+        except (gp.GPhoto2Error, IndexError, TypeError, AttributeError):
+            continue
+
+        sample = CameraStatusSampled(camera_name, battery_level, free_space, total_space)
+        get_event_bus().publish(sample)
+        samples.append(sample)
+
+    return samples
+
+
 def get_camera_overview() -> dict:
     """ Returns a dictionary with information of the connected cameras.
 
@@ -536,7 +889,7 @@ def main():
 
             # Set the correct time
             print(get_time(camera_object))
-            set_time(camera_object)
+            sync_time(camera[0], camera_object)
 
             # Take picture
             camera_settings = CameraSettings(camera[0], "1/1000", "8", 100)
@@ -0,0 +1,429 @@
+""" Out-of-process camera workers.
+
+The GUI, the scheduler threads, the voice prompts, and all gphoto2 calls share one Python process.  A misbehaving
+driver call can therefore freeze the countdown display or delay the voice prompts.  In worker mode, each camera gets its
+own worker process, which:
+
+    - Owns the connection to its camera (the main process releases it);
+    - Receives the compiled camera commands over a pipe, as soon as they are scheduled, together with their
+      (precomputed) execution time;
+    - Fires the commands itself at their execution time (commands that are too late are skipped);
+    - Reports the result of each command back to the main process.
+
+A crash (or hang) of a worker is isolated to that camera: the worker is restarted (a bounded number of times) and the
+commands that are still to come are sent to it again.
+"""
+import functools
+import heapq
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import wait
+from typing import Union
+
+from solareclipseworkbench.camera import CameraError, CameraSettings
+from solareclipseworkbench.tracing import add_span
+
+DEFAULT_GRACE_TIME = 1.0
+DEFAULT_RESULT_TIMEOUT = 30.0
+MAX_RESTARTS = 3
+
+# Messages from the main process to a worker
+
+COMMAND = "command"
+STATUS = "status"
+STOP = "stop"
+
+# Messages from a worker to the main process
+
+READY = "ready"
+RESULT = "result"
+STATUS_INFO = "status_info"
+
+# Outcome of a command
+
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+def run_camera_worker(camera_name: str, connection, grace_time: float = DEFAULT_GRACE_TIME):
+    """ Main loop of a camera worker process.
+
+    Args:
+        - camera_name: Name of the camera that is owned by this worker
+        - connection: Connection to the main process
+        - grace_time: Maximum delay of a command w.r.t. its execution time before it is skipped [s]
+    """
+
+    from solareclipseworkbench.camera import get_camera, take_picture, take_burst, take_bracket, get_battery_level, \
+        get_free_space, get_space
+
+    commands = {
+        "take_picture": lambda camera, settings, extra: take_picture(camera, settings),
+        "take_burst": lambda camera, settings, extra: take_burst(camera, settings, float(extra[0])),
+        "take_bracket": lambda camera, settings, extra: take_bracket(camera, settings, str(extra[0]))
+    }
+
+    camera = get_camera(camera_name)
+    connection.send((READY, camera_name))
+
+    pending = []    # Heap of (execution time, command ID, command name, camera settings, extra arguments)
+
+    while True:
+        timeout = max(0.0, pending[0][0] - time.time()) if pending else None
+
+        if connection.poll(timeout):
+            message = connection.recv()
+
+            if message[0] == COMMAND:
+                heapq.heappush(pending, message[1:])
+            elif message[0] == STATUS:
+                request_id = message[1]
+                try:
+                    connection.send((STATUS_INFO, camera_name, request_id, get_battery_level(camera),
+                                     get_free_space(camera), get_space(camera)))
+                except Exception as exc:
+                    connection.send((STATUS_INFO, camera_name, request_id, None, None, None))
+                    logging.error(f"Could not get the status of camera {camera_name}: {exc}")
+            elif message[0] == STOP:
+                break
+            continue
+
+        execution_time, command_id, func_name, settings, extra = heapq.heappop(pending)
+
+        start = time.time()
+        if start - execution_time > grace_time:
+            connection.send((RESULT, command_id, SKIPPED, start, start, f"{start - execution_time:.1f}s too late"))
+            continue
+
+        try:
+            commands[func_name](camera, CameraSettings(*settings), extra)
+            connection.send((RESULT, command_id, DONE, start, time.time(), ""))
+        except Exception as exc:
+            connection.send((RESULT, command_id, FAILED, start, time.time(), str(exc)))
+
+    camera.exit()
+
+
+class CommandResult:
+
+    def __init__(self, command_id: int, outcome: str, start: float, end: float, detail: str):
+        """ Keep the result of a command that was executed by a camera worker.
+
+        Args:
+            - command_id: Identifier of the command
+            - outcome: Outcome of the command (done, skipped, failed)
+            - start: Time at which the execution started [s since epoch]
+            - end: Time at which the execution finished [s since epoch]
+            - detail: Additional information (e.g. error message)
+        """
+
+        self.command_id = command_id
+        self.outcome = outcome
+        self.start = start
+        self.end = end
+        self.detail = detail
+
+
+class CameraWorkerPool:
+
+    def __init__(self, cameras: dict, grace_time: float = DEFAULT_GRACE_TIME,
+                 result_timeout: float = DEFAULT_RESULT_TIMEOUT):
+        """ Start a worker process for each of the given cameras.
+
+        The cameras are released by the main process, as they will be owned by their worker.
+
+        Args:
+            - cameras: Dictionary of camera names and camera objects
+            - grace_time: Maximum delay of a command w.r.t. its execution time before it is skipped [s]
+            - result_timeout: Time to wait for the result of a command, after its execution time, before the worker
+                              is considered to be hanging [s]
+        """
+
+        self.grace_time = grace_time
+        self.result_timeout = result_timeout
+
+        self.context = multiprocessing.get_context("spawn")
+        self.lock = threading.Lock()
+        self.restart_lock = threading.RLock()
+        self.command_ids = itertools.count()
+
+        self.processes: dict = {}
+        self.connections: dict = {}
+        self.restarts: dict = {}
+
+        # Commands that have been sent but for which no result has been received yet, per camera, and the results of
+        # the commands (command id -> result) until they have been taken by the monitored job (see monitor)
+
+        self.pending: dict = {}
+        self.results: dict = {}
+        self.result_events: dict = {}
+        self.result_lock = threading.Lock()
+
+        # Requests for the status of a camera for which no answer has been received yet (request id -> event), and the
+        # answers (request id -> status).  Every request has its own id, so concurrent requests do not interfere
+
+        self.status: dict = {}
+        self.status_events: dict = {}
+
+        self.is_running = True
+
+        for camera_name, camera in cameras.items():
+            try:
+                camera.exit()
+            except Exception:
+                pass
+            self.restarts[camera_name] = 0
+            self.pending[camera_name] = {}
+            self.__start_worker(camera_name)
+
+        self.reader = threading.Thread(target=self.__read_messages, name="Camera worker results", daemon=True)
+        self.reader.start()
+
+    def __start_worker(self, camera_name: str):
+        """ Start the worker process for the given camera.
+
+        Args:
+            - camera_name: Name of the camera
+        """
+
+        parent_connection, child_connection = self.context.Pipe()
+        process = self.context.Process(target=run_camera_worker, args=(camera_name, child_connection, self.grace_time),
+                                       name=f"Camera worker ({camera_name})", daemon=True)
+        process.start()
+        child_connection.close()
+
+        self.processes[camera_name] = process
+        self.connections[camera_name] = parent_connection
+
+        # (Re-)send the commands for which no result has been received yet
+
+        for message in list(self.pending[camera_name].values()):
+            self.__send(camera_name, message)
+
+    def __send(self, camera_name: str, message: tuple) -> bool:
+        """ Send the given message to the worker of the given camera.
+
+        Args:
+            - camera_name: Name of the camera
+            - message: Message to send
+
+        Returns: True if the message was sent, False otherwise (e.g. the worker has died).
+        """
+
+        with self.lock:
+            try:
+                self.connections[camera_name].send(message)
+                return True
+            except (OSError, EOFError, BrokenPipeError):
+                return False
+
+    def submit(self, camera_name: str, execution_time: float, func_name: str, camera_settings: CameraSettings,
+               extra: list) -> int:
+        """ Send the given camera command to the worker of its camera.
+
+        Args:
+            - camera_name: Name of the camera
+            - execution_time: Execution time [s since epoch]
+            - func_name: Name of the command (take_picture, take_burst, take_bracket)
+            - camera_settings: Camera settings
+            - extra: Extra arguments of the command (duration of a burst, steps of a bracket)
+
+        Returns: Identifier of the command.
+        """
+
+        command_id = next(self.command_ids)
+        settings = (camera_settings.camera_name, camera_settings.shutter_speed, camera_settings.aperture,
+                    camera_settings.iso)
+        message = (COMMAND, execution_time, command_id, func_name, settings, [str(arg) for arg in extra])
+
+        self.result_events[command_id] = threading.Event()
+        self.pending[camera_name][command_id] = message
+        self.__send(camera_name, message)
+
+        return command_id
+
+    def monitor(self, func, camera_name: str, command_id: int):
+        """ Returns a function that waits for the result of the given command of a camera worker.
+
+        The returned function has the same name and signature as the given camera command, so it can be scheduled in
+        its place (keeping the overview of the scheduled jobs intact).  It raises a CameraError when the command failed
+        in the worker, or when the worker did not report back in time (in which case the worker is restarted).
+
+        Args:
+            - func: Camera command (take_picture, take_burst, take_bracket)
+            - camera_name: Name of the camera
+            - command_id: Identifier of the command
+
+        Returns: Function that waits for the result of the command.
+        """
+
+        @functools.wraps(func)
+        def monitored(*args):
+            timeout = self.result_timeout + (float(args[2]) if func.__name__ == "take_burst" else 0.0)
+
+            try:
+                if not self.result_events[command_id].wait(timeout):
+                    logging.error(f"Worker for camera {camera_name} did not report back in time: restarting it")
+                    self.restart(camera_name)
+                    raise CameraError(f"Camera worker for {camera_name} is hanging")
+
+                result: CommandResult = self.results[command_id]
+            finally:
+                # A result that is received after the timeout is dropped (see __set_result)
+                with self.result_lock:
+                    self.results.pop(command_id, None)
+                    self.result_events.pop(command_id, None)
+            add_span(func.__name__, "camera", result.start, result.end, f"Worker {camera_name}", outcome=result.outcome,
+                     detail=result.detail)
+
+            if result.outcome == FAILED:
+                raise CameraError(f"{func.__name__} failed on camera {camera_name}: {result.detail}")
+            if result.outcome == SKIPPED:
+                logging.warning(f"{func.__name__} skipped by camera {camera_name}: {result.detail}")
+
+            return result
+
+        return monitored
+
+    def restart(self, camera_name: str) -> bool:
+        """ Restart the worker of the given camera, for a bounded number of times.
+
+        Commands whose execution time has not passed yet are sent again to the new worker.
+
+        Args:
+            - camera_name: Name of the camera
+
+        Returns: True if the worker was restarted, False otherwise.
+        """
+
+        with self.restart_lock:
+            process = self.processes[camera_name]
+            if process.is_alive():
+                process.kill()
+            process.join(5.0)
+            self.connections[camera_name].close()
+
+            if not self.is_running or self.restarts[camera_name] >= MAX_RESTARTS:
+                logging.error(f"Worker for camera {camera_name} is not restarted anymore")
+                self.__fail_pending(camera_name, "Camera worker stopped")
+                return False
+
+            self.restarts[camera_name] += 1
+            logging.warning(f"Restarting worker for camera {camera_name} (restart {self.restarts[camera_name]})")
+
+            # Commands of which the execution time has passed are not sent again
+
+            now = time.time()
+            for command_id, message in list(self.pending[camera_name].items()):
+                if now - message[1] > self.grace_time:
+                    self.__set_result(camera_name,
+                                      CommandResult(command_id, SKIPPED, now, now, "Camera worker restarted"))
+
+            self.__start_worker(camera_name)
+            return True
+
+    def __fail_pending(self, camera_name: str, reason: str):
+        """ Mark all commands for the given camera for which no result has been received as failed.
+
+        Args:
+            - camera_name: Name of the camera
+            - reason: Reason why the commands failed
+        """
+
+        now = time.time()
+        for command_id in list(self.pending[camera_name]):
+            self.__set_result(camera_name, CommandResult(command_id, FAILED, now, now, reason))
+
+    def __set_result(self, camera_name: str, result: CommandResult):
+        """ Store the given result of a command and wake up whoever is waiting for it.
+
+        Args:
+            - camera_name: Name of the camera
+            - result: Result of the command
+        """
+
+        self.pending[camera_name].pop(result.command_id, None)
+
+        with self.result_lock:
+            result_event = self.result_events.get(result.command_id)
+            if result_event is None:
+                # Nobody is waiting for the result anymore
+                return
+            self.results[result.command_id] = result
+            result_event.set()
+
+    def __read_messages(self):
+        """ Read the messages of all camera workers (in a separate thread). """
+
+        while self.is_running:
+            connections = {connection: camera_name for camera_name, connection in self.connections.items()
+                           if not connection.closed}
+
+            for connection in wait(list(connections), timeout=0.5):
+                camera_name = connections[connection]
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    # The worker has died (unless it is being restarted already)
+                    with self.restart_lock:
+                        if self.is_running and connection is self.connections[camera_name]:
+                            logging.error(f"Worker for camera {camera_name} has died")
+                            self.restart(camera_name)
+                    continue
+
+                if message[0] == RESULT:
+                    self.__set_result(camera_name, CommandResult(*message[1:]))
+                elif message[0] == STATUS_INFO:
+                    request_id = message[2]
+                    status_event = self.status_events.get(request_id)
+                    if status_event:
+                        self.status[request_id] = message[3:]
+                        status_event.set()
+                elif message[0] == READY:
+                    logging.info(f"Worker for camera {camera_name} is ready")
+
+    def get_camera_status(self, camera_name: str, timeout: float = 5.0) -> Union[tuple, None]:
+        """ Request the status of the given camera from its worker.
+
+        Args:
+            - camera_name: Name of the camera
+            - timeout: Time to wait for the answer [s]
+
+        Returns: Tuple with the battery level, free space [GB], and total space [GB] of the camera, or None if the
+                 worker did not answer in time.
+        """
+
+        request_id = next(self.command_ids)
+        status_event = self.status_events[request_id] = threading.Event()
+
+        try:
+            if self.__send(camera_name, (STATUS, request_id)) and status_event.wait(timeout):
+                return self.status.pop(request_id)
+            return None
+        finally:
+            self.status_events.pop(request_id, None)
+            self.status.pop(request_id, None)
+
+    def get_camera_names(self) -> list:
+        """ Returns the names of the cameras that are handled by a worker.
+
+        Returns: List with the camera names.
+        """
+
+        return list(self.processes)
+
+    def shutdown(self):
+        """ Stop all camera workers. """
+
+        self.is_running = False
+
+        for camera_name, process in self.processes.items():
+            self.__send(camera_name, (STOP,))
+            process.join(5.0)
+            if process.is_alive():
+                process.kill()
+            self.connections[camera_name].close()
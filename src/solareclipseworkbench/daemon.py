@@ -0,0 +1,669 @@
+""" Headless daemon with a local status and control API.
+
+The daemon runs the dispatcher without UI (e.g. on a capture laptop in a box), and serves a small HTTP API on the local
+network, so the observation can be followed (and controlled) from e.g. a tablet:
+
+    - GET  /                 Page that shows the countdowns and the next jobs (for a browser on a tablet);
+    - GET  /api/status       State of the daemon, reference moments (with countdown), and number of jobs;
+    - GET  /api/jobs?limit=N Next N jobs (with countdown, at most MAX_NUM_JOBS);
+    - GET  /api/cameras      Camera status (state, battery level, and free memory);
+    - GET  /api/events       Stream of server-sent events: telemetry (every second), the outcome of every job, the
+                             actions of the watchdog, the forecasts that a memory card fills up or a camera buffer
+                             overflows, and the batteries that are predicted to run out (as soon as they are published
+                             on the event bus);
+    - GET  /api/trace        Spans that have been recorded so far, in the Chrome trace event format (when the daemon
+                             was started with --trace);
+    - POST /api/start        Schedule the script ({"script": ..., "reference_moment": ..., "minutes": ...}), where the
+                             script can also be a list of scripts, which are merged into a single plan;
+    - POST /api/stop         Stop the scheduler;
+    - POST /api/retime       Reschedule the script, with all reference moments shifted ({"offset": seconds}), or as a
+                             simulation that starts the given number of minutes before the given reference moment
+                             ({"reference_moment": "C2", "minutes": 5}).
+
+Updates are pushed to the clients as server-sent events (which browsers support natively, with EventSource), so the
+clients do not have to poll.  When a token is given, the POST requests must carry it in an "Authorization: Bearer
+<token>" header.  Without a token, the daemon only listens on the loopback interface.
+"""
+import copy
+import hmac
+import ipaddress
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta
+from enum import Enum
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Union
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pytz
+
+from solareclipseworkbench.camera import sample_camera_status
+from solareclipseworkbench.dispatcher import Dispatcher, clean_description
+from solareclipseworkbench.events import get_event_bus, CameraStatusSampled, JobFinished, RecoveryActionTaken, \
+    StorageShortageForecast, BatteryAlert
+from solareclipseworkbench.tracing import get_tracer
+from solareclipseworkbench.utils import observe_solar_eclipse
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Interval between telemetry events [s]
+
+TELEMETRY_INTERVAL = 1.0
+
+# Interval between keep-alive comments on an event stream without events [s]
+
+KEEP_ALIVE_INTERVAL = 15.0
+
+# Number of events that are buffered for a slow client (older events are dropped)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+NUM_NEXT_JOBS = 10
+
+# Maximum number of jobs that can be requested at once (larger limits are clamped)
+
+MAX_NUM_JOBS = 1000
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench")
+
+STATUS_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Solar Eclipse Workbench</title>
+<style>
+body { font-family: sans-serif; background: #111; color: #eee; margin: 1em; }
+table { border-collapse: collapse; width: 100%; margin-bottom: 1em; }
+td, th { padding: 0.3em 0.6em; text-align: left; border-bottom: 1px solid #333; }
+.countdown { font-family: monospace; text-align: right; }
+</style>
+</head>
+<body>
+<h1 id="state">Solar Eclipse Workbench</h1>
+<table id="moments"></table>
+<table id="jobs"></table>
+<table id="cameras"></table>
+<script>
+function countdown(seconds) {
+    const sign = seconds < 0 ? "+" : "-";
+    seconds = Math.abs(Math.round(seconds));
+    const h = Math.floor(seconds / 3600), m = Math.floor(seconds % 3600 / 60), s = seconds % 60;
+    return sign + (h ? h + ":" : "") + String(m).padStart(2, "0") + ":" + String(s).padStart(2, "0");
+}
+function row(tag, cells) {
+    const tr = document.createElement("tr");
+    for (const cell of cells) {
+        const td = document.createElement(tag);
+        td.textContent = cell;
+        tr.appendChild(td);
+    }
+    return tr;
+}
+function rows(table, header, items) {
+    document.getElementById(table).replaceChildren(row("th", header), ...items.map(item => row("td", item)));
+}
+const events = new EventSource("/api/events");
+events.addEventListener("telemetry", event => {
+    const status = JSON.parse(event.data);
+    document.getElementById("state").textContent = status.state + (status.quiet ? " (quiet window)" : "");
+    rows("moments", ["Moment", "Time (UTC)", "Countdown"], Object.entries(status.reference_moments).map(
+        ([name, moment]) => [name, moment.time_utc.substring(11, 19), countdown(moment.countdown)]));
+    rows("jobs", ["Countdown", "Command", "Description"], status.next_jobs.map(
+        job => [countdown(job.countdown), job.command, job.description]));
+    rows("cameras", ["Camera", "State", "Battery", "Free"], Object.entries(status.cameras).map(
+        ([name, camera]) => [name, camera.state, camera.battery_level ?? "", camera.free_space_percentage ?? ""]));
+});
+</script>
+</body>
+</html>
+"""
+
+
+def is_loopback(host: str) -> bool:
+    """ Check whether the given host only refers to the loopback interface.
+
+    Host names other than "localhost" are not resolved, and are considered not to be a loopback host.
+
+    Args:
+        - host: Host name or IP address to listen on
+
+    Returns: True if the given host is "localhost" or a loopback address; False otherwise.
+    """
+
+    if host == "localhost":
+        return True
+
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class DaemonState(str, Enum):
+    """ Enumeration of the states of the daemon. """
+
+    IDLE = "idle"
+    RUNNING = "running"
+
+
+def shift_reference_moments(reference_moments: dict, offset: timedelta) -> dict:
+    """ Returns a copy of the given reference moments, all shifted by the given offset.
+
+    Args:
+        - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects
+        - offset: Offset to add to all reference moments
+
+    Returns: Dictionary with the shifted reference moments.
+    """
+
+    shifted = {}
+
+    for name, info in reference_moments.items():
+        if hasattr(info, "time_utc"):
+            info = copy.copy(info)
+            info.time_utc += offset
+            info.time_local += offset
+        shifted[name] = info
+
+    return shifted
+
+
+class SolarEclipseDaemon:
+
+    def __init__(self, reference_moments: dict, cameras: dict, quiet_windows: list = None,
+                 use_camera_workers: bool = False, token: str = None, storage_profiles: dict = None):
+        """ Initialisation of a daemon that runs the dispatcher without UI.
+
+        Args:
+            - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo
+                                 objects
+            - cameras: Dictionary of camera names and camera objects
+            - quiet_windows: List of QuietWindow objects in which no housekeeping is done (None for the default ones)
+            - use_camera_workers: Whether to execute the camera commands in a separate worker process per camera
+            - token: Token that must be given with the control requests (None to allow all control requests)
+            - storage_profiles: Dictionary with the camera names as keys and CameraProfile objects as values (None for
+                                the default storage profiles, see forecast.py)
+        """
+
+        self.reference_moments = reference_moments
+        self.cameras = cameras
+        self.quiet_windows = quiet_windows
+        self.use_camera_workers = use_camera_workers
+        self.token = token
+        self.storage_profiles = storage_profiles
+
+        self.scheduler: Union[Dispatcher, None] = None
+        self.script: Union[str, list, None] = None
+        self.simulation: tuple = (None, None)   # Reference moment and minutes before it (None if not simulating)
+        self.offset = timedelta(0)              # Shift of the reference moments (by retime requests)
+
+        # Schedule overview, sorted by execution time (for the countdowns of the next jobs)
+
+        self.job_order = np.empty(0, dtype=int)
+        self.job_times = np.empty(0)
+
+        # Camera name -> latest status (battery level, free space [GB], total space [GB])
+
+        self.camera_status: dict = {}
+
+        self.subscribers: list = []
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.server: Union[ThreadingHTTPServer, None] = None
+
+    def start(self, script: Union[str, list] = None, reference_moment: str = None, minutes: float = None) -> dict:
+        """ Schedule the given script (and stop the current schedule, if any).
+
+        Args:
+            - script: Name of the script, or list of names of scripts that are merged into a single plan (None to
+                      reschedule the current script)
+            - reference_moment: Reference moment to use for a simulation (None if no simulation should be used)
+            - minutes: Minutes to the reference moment when simulating
+
+        Returns: Status of the daemon.
+        """
+
+        with self.lock:
+            script = script or self.script
+            if not script:
+                raise ValueError("No script to schedule")
+
+            self.stop()
+
+            reference_moments = shift_reference_moments(self.reference_moments, self.offset)
+            self.scheduler = observe_solar_eclipse(reference_moments, script, self.cameras, None, reference_moment,
+                                                   minutes, self.quiet_windows, self.use_camera_workers,
+                                                   storage_profiles=self.storage_profiles)
+
+            self.script = script
+            self.simulation = (reference_moment, minutes)
+
+            execution_times = np.array(self.scheduler.schedule.execution_times)
+            self.job_order = np.argsort(execution_times, kind="stable")
+            self.job_times = execution_times[self.job_order]
+
+            LOGGER.info(f"Scheduled {len(self.job_times)} job(s) from {script}")
+
+        self.publish("state", self.get_status())
+
+        return self.get_status()
+
+    def stop(self) -> dict:
+        """ Stop the current schedule (if any).
+
+        Returns: Status of the daemon.
+        """
+
+        with self.lock:
+            if self.scheduler:
+                self.scheduler.shutdown(wait=False)
+                self.scheduler = None
+
+                self.job_order = np.empty(0, dtype=int)
+                self.job_times = np.empty(0)
+
+                LOGGER.info("Scheduler stopped")
+                self.publish("state", self.get_status())
+
+        return self.get_status()
+
+    def retime(self, offset: float = None, reference_moment: str = None, minutes: float = None) -> dict:
+        """ Reschedule the current script with new timing.
+
+        Args:
+            - offset: Shift of all reference moments w.r.t. the calculated ones [s] (e.g. after a correction), None to
+                      keep the current shift
+            - reference_moment: Reference moment to use for a simulation (None to keep the current simulation, if any)
+            - minutes: Minutes to the reference moment when simulating
+
+        Returns: Status of the daemon.
+        """
+
+        with self.lock:
+            if offset is not None:
+                self.offset = timedelta(seconds=offset)
+
+            if reference_moment is None:
+                reference_moment, minutes = self.simulation
+
+            return self.start(self.script, reference_moment, minutes)
+
+    def get_status(self) -> dict:
+        """ Returns the status of the daemon.
+
+        Returns: Dictionary with the state of the daemon, the script, the reference moments (with countdown), the
+                 number of executed, failed, missed, and pending jobs, the next jobs, and the status of the cameras.
+        """
+
+        now = datetime.now(pytz.utc)
+
+        with self.lock:
+            scheduler = self.scheduler
+
+            # The outcomes as reported by the scheduler (a job whose execution time has passed can still be waiting in
+            # its lane, or can have been missed)
+
+            outcomes = scheduler.get_outcomes() if scheduler else {}
+
+            # In a simulation, the reference moments are shifted to the timeline of the scheduler
+
+            time_shift = scheduler.time_shift if scheduler else timedelta(0)
+            reference_moments = {
+                name: {"time_utc": (info.time_utc - time_shift).isoformat(),
+                       "countdown": round((info.time_utc - time_shift - now).total_seconds(), 1)}
+                for name, info in shift_reference_moments(self.reference_moments, self.offset).items()
+                if hasattr(info, "time_utc")}
+
+            return {
+                "time_utc": now.isoformat(),
+                "state": (DaemonState.RUNNING if scheduler else DaemonState.IDLE).value,
+                "script": self.script,
+                "simulation": {"reference_moment": self.simulation[0], "minutes": self.simulation[1]}
+                if self.simulation[0] else None,
+                "offset": self.offset.total_seconds(),
+                "quiet": scheduler.is_quiet(now) if scheduler else False,
+                "reference_moments": reference_moments,
+                "num_executed": outcomes.get("executed", 0),
+                "num_failed": outcomes.get("failed", 0),
+                "num_missed": outcomes.get("missed", 0),
+                "num_pending": outcomes.get("pending", 0),
+                "next_jobs": self.get_jobs(NUM_NEXT_JOBS, now),
+                "cameras": self.get_cameras(),
+            }
+
+    def get_jobs(self, limit: int = NUM_NEXT_JOBS, now: datetime = None) -> list:
+        """ Returns the next jobs that will be executed.
+
+        Args:
+            - limit: Maximum number of jobs to return
+            - now: Current time [UTC] (None for the current time)
+
+        Returns: List with a dictionary per job (execution time, countdown, command, description, camera name, and
+                 script).
+        """
+
+        now = now or datetime.now(pytz.utc)
+
+        with self.lock:
+            if not self.scheduler:
+                return []
+
+            schedule = self.scheduler.schedule
+            first = int(np.searchsorted(self.job_times, now.timestamp(), side="right"))
+
+            jobs = []
+            for row in self.job_order[first: first + limit]:
+                execution_time = schedule.execution_times[row]
+                jobs.append({
+                    "time_utc": datetime.fromtimestamp(execution_time, tz=pytz.utc).isoformat(),
+                    "countdown": round(execution_time - now.timestamp(), 1),
+                    "command": schedule.commands[row],
+                    "description": clean_description(schedule.descriptions[row]),
+                    "camera": schedule.camera_names[row],
+                    "script": schedule.sources[row],
+                })
+
+            return jobs
+
+    def get_cameras(self) -> dict:
+        """ Returns the status of the cameras.
+
+        Returns: Dictionary with the camera names as keys and dictionaries with the state (as seen by the watchdog),
+                 battery level [%], free space [GB], free space [%], and the latest action of the watchdog as values.
+        """
+
+        watchdog = self.scheduler.watchdog if self.scheduler else None
+        last_actions = {action.camera_name: str(action) for action in watchdog.actions} if watchdog else {}
+        cameras = {}
+
+        for camera_name in self.cameras or {}:
+            battery_level, free_space, total_space = self.camera_status.get(camera_name) or (None, None, None)
+            cameras[camera_name] = {
+                "state": watchdog.get_state(camera_name).value if watchdog else None,
+                "battery_level": battery_level.rstrip("%") if battery_level else None,
+                "free_space_gb": free_space,
+                "free_space_percentage": int(free_space / total_space * 100) if free_space and total_space else None,
+                "last_action": last_actions.get(camera_name),
+            }
+
+        return cameras
+
+    def subscribe(self) -> queue.Queue:
+        """ Subscribe to the events of the daemon.
+
+        Returns: Queue on which the events (tuples with the event type and the data) are put.
+        """
+
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+        with self.lock:
+            self.subscribers.append(subscriber)
+
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        """ Stop sending events to the given subscriber.
+
+        Args:
+            - subscriber: Queue that was returned by subscribe
+        """
+
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, event: str, data: dict):
+        """ Send the given event to all subscribers.
+
+        Events for a subscriber that does not keep up are dropped, so a slow client cannot hold up the daemon.
+
+        Args:
+            - event: Type of the event (e.g. "telemetry", "job", or "state")
+            - data: Data of the event
+        """
+
+        message = (event, json.dumps(data))
+
+        with self.lock:
+            subscribers = list(self.subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                pass
+
+    def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """ Serve the API until shutdown is called (e.g. on SIGINT).
+
+        Args:
+            - host: Host name or IP address to listen on ("0.0.0.0" to listen on all network interfaces, only with a
+                    token)
+            - port: Port to listen on
+
+        Raises: ValueError if the host is not a loopback host and no token has been given.
+        """
+
+        if not self.token and not is_loopback(host):
+            raise ValueError(f"Without a token, the daemon only listens on the loopback interface (not on {host})")
+
+        self.server = ThreadingHTTPServer((host, port), ApiRequestHandler)
+        self.server.daemon_threads = True
+        self.server.daemon = self
+
+        event_bus = get_event_bus()
+        subscriptions = [
+            event_bus.subscribe(JobFinished, self.__on_job_finished),
+            event_bus.subscribe(CameraStatusSampled, self.__on_camera_status),
+            event_bus.subscribe(RecoveryActionTaken, self.__on_recovery_action),
+            event_bus.subscribe(StorageShortageForecast, self.__on_storage_shortage),
+            event_bus.subscribe(BatteryAlert, self.__on_battery_alert)
+        ]
+
+        threading.Thread(target=self.__send_telemetry, name="Telemetry", daemon=True).start()
+
+        # While a script is scheduled, the status of the cameras is read in the lane of each camera (see
+        # Dispatcher.sample_camera_status), and received from the event bus.  Before that, nothing is using the cameras,
+        # so the status is read once straight away (unless the cameras will be owned by the camera workers)
+
+        if self.cameras and not self.use_camera_workers:
+            sample_camera_status(self.cameras)
+
+        LOGGER.info(f"Serving the API on http://{host}:{port}")
+
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stopped.set()
+            self.stop()
+            self.server.server_close()
+
+            for subscription in subscriptions:
+                event_bus.unsubscribe(subscription)
+
+    def shutdown(self):
+        """ Stop serving the API (from another thread than the one that called serve). """
+
+        self.stopped.set()
+        if self.server:
+            self.server.shutdown()
+
+    def __send_telemetry(self):
+        """ Publish the status of the daemon, at the start of every second. """
+
+        while not self.stopped.wait(TELEMETRY_INTERVAL - datetime.now().timestamp() % TELEMETRY_INTERVAL):
+            if self.subscribers:
+                self.publish("telemetry", self.get_status())
+
+    def __on_job_finished(self, event: JobFinished):
+        """ Publish the outcome of a job of the current schedule as soon as it is known.
+
+        Args:
+            - event: Job that has been executed, has failed, or has been missed
+        """
+
+        scheduler = self.scheduler
+        if not scheduler or event.job_id not in scheduler.job_timings:
+            return
+
+        self.publish("job", {
+            "description": event.description,
+            "scheduled_time_utc": event.scheduled_time.isoformat(),
+            "outcome": event.outcome,
+            "error": str(event.error) if event.error else None,
+        })
+
+    def __on_camera_status(self, event: CameraStatusSampled):
+        """ Keep the latest status of the cameras.
+
+        Args:
+            - event: Reading of the status of a camera
+        """
+
+        self.camera_status[event.camera_name] = (event.battery_level, event.free_space, event.total_space)
+
+    def __on_recovery_action(self, event: RecoveryActionTaken):
+        """ Publish an action of the watchdog as soon as it is taken.
+
+        Args:
+            - event: Action that was taken by the watchdog
+        """
+
+        self.publish("watchdog", {"camera": event.action.camera_name, "action": event.action.action,
+                                  "detail": event.action.detail, "time_utc": event.action.time.isoformat()})
+
+    def __on_storage_shortage(self, event: StorageShortageForecast):
+        """ Publish a forecast that the memory card of a camera fills up, or that its buffer overflows.
+
+        Args:
+            - event: Forecast of the shortage
+        """
+
+        self.publish("storage", {"camera": event.camera_name, "kind": event.kind,
+                                 "description": event.description,
+                                 "scheduled_time_utc": event.scheduled_time.isoformat(), "message": event.message})
+
+    def __on_battery_alert(self, event: BatteryAlert):
+        """ Publish a prediction that the battery of a camera runs out before the end of the script.
+
+        Args:
+            - event: Prediction of the battery drain
+        """
+
+        self.publish("battery", {"camera": event.camera_name, "battery_level": event.battery_level,
+                                 "depletion_time_utc": event.depletion_time.isoformat(),
+                                 "swap_deadline_utc": event.swap_deadline.isoformat() if event.swap_deadline else None,
+                                 "message": event.message})
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """ Handler for the requests to the API of the daemon (the daemon is available as self.server.daemon). """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        daemon: SolarEclipseDaemon = self.server.daemon
+
+        if url.path == "/":
+            self.__send(HTTPStatus.OK, STATUS_PAGE.encode(), "text/html; charset=utf-8")
+        elif url.path == "/api/status":
+            self.__send_json(HTTPStatus.OK, daemon.get_status())
+        elif url.path == "/api/jobs":
+            try:
+                limit = int(parse_qs(url.query).get("limit", [NUM_NEXT_JOBS])[0])
+            except ValueError:
+                self.__send_json(HTTPStatus.BAD_REQUEST, {"error": "The limit must be an integer"})
+                return
+            if limit < 0:
+                self.__send_json(HTTPStatus.BAD_REQUEST, {"error": "The limit must not be negative"})
+                return
+            self.__send_json(HTTPStatus.OK, daemon.get_jobs(min(limit, MAX_NUM_JOBS)))
+        elif url.path == "/api/cameras":
+            self.__send_json(HTTPStatus.OK, daemon.get_cameras())
+        elif url.path == "/api/events":
+            self.__stream_events(daemon)
+        elif url.path == "/api/trace":
+            tracer = get_tracer()
+            if tracer is None:
+                self.__send_json(HTTPStatus.NOT_FOUND, {"error": "Tracing is not enabled (start with --trace)"})
+            else:
+                self.__send_json(HTTPStatus.OK, tracer.get_trace())
+        else:
+            self.__send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown resource {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        daemon: SolarEclipseDaemon = self.server.daemon
+
+        if daemon.token and not hmac.compare_digest(self.headers.get("Authorization", "").encode(),
+                                                    f"Bearer {daemon.token}".encode()):
+            self.__send_json(HTTPStatus.UNAUTHORIZED, {"error": "Invalid token"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            if url.path == "/api/start":
+                status = daemon.start(body.get("script"), body.get("reference_moment"), body.get("minutes"))
+            elif url.path == "/api/stop":
+                status = daemon.stop()
+            elif url.path == "/api/retime":
+                status = daemon.retime(body.get("offset"), body.get("reference_moment"), body.get("minutes"))
+            else:
+                self.__send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown resource {url.path}"})
+                return
+        except (ValueError, KeyError, OSError, IndexError) as exc:
+            self.__send_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            return
+
+        self.__send_json(HTTPStatus.OK, status)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(f"{self.address_string()} {format % args}")
+
+    def __send(self, status: HTTPStatus, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __send_json(self, status: HTTPStatus, data):
+        self.__send(status, json.dumps(data).encode(), "application/json")
+
+    def __stream_events(self, daemon: SolarEclipseDaemon):
+        """ Send the events of the daemon as server-sent events, until the client disconnects.
+
+        Args:
+            - daemon: Daemon of which to send the events
+        """
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        subscriber = daemon.subscribe()
+
+        try:
+            self.wfile.write(f"event: state\ndata: {json.dumps(daemon.get_status())}\n\n".encode())
+            self.wfile.flush()
+
+            while not daemon.stopped.is_set():
+                try:
+                    event, data = subscriber.get(timeout=KEEP_ALIVE_INTERVAL)
+                    self.wfile.write(f"event: {event}\ndata: {data}\n\n".encode())
+                except queue.Empty:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            daemon.unsubscribe(subscriber)
@@ -0,0 +1,696 @@
+""" Dispatching of the scheduled commands.
+
+The commands are dispatched in lanes, each with its own executor:
+
+    - Camera lanes: one lane (with a single thread) per camera, so the commands for a camera never compete with each
+      other for the camera;
+    - Voice lane: voice prompts;
+    - Housekeeping lane: synchronisation of the cameras and other status polling.
+
+Around the critical moments of the eclipse (e.g. C2 - 60s ... C3 + 30s), quiet windows can be configured.  Inside a
+quiet window, housekeeping jobs are deferred until the end of the window (or dropped), such that the capture and voice
+jobs have the cameras to themselves.
+
+The status of a camera (battery level and free memory) is always read in the lane of that camera (see
+sample_camera_status), so it is read in between the capture jobs of the camera, and never at the same time as a capture
+(the connection to a camera cannot be used by two threads at once).
+
+The dispatcher keeps track of the start delay and the duration of every job, publishes the start and the end of every
+job on the event bus, and signals when all scheduled jobs have finished (so the command line does not need to poll the
+scheduler).
+"""
+import bisect
+import functools
+import heapq
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from enum import Enum, IntEnum
+from typing import Union
+from uuid import uuid4
+
+import pytz
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, \
+    EVENT_ALL_JOBS_REMOVED, EVENT_SCHEDULER_SHUTDOWN, SchedulerEvent
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.job import Job
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.date import DateTrigger
+
+from solareclipseworkbench.camera import sample_camera_status
+from solareclipseworkbench.camera_workers import CameraWorkerPool
+from solareclipseworkbench.events import get_event_bus, JobStarted, JobFinished
+from solareclipseworkbench.plan import Schedule
+from solareclipseworkbench.tracing import trace_job
+from solareclipseworkbench.watchdog import CameraWatchdog
+
+VOICE_LANE = "default"
+HOUSEKEEPING_LANE = "housekeeping"
+
+# Minimum time between a reading of the status of a camera and the next capture of that camera [s]
+
+STATUS_CAPTURE_MARGIN = 5.0
+
+
+class JobPriority(IntEnum):
+    """ Enumeration of the priorities of the scheduled jobs (lower value = higher priority). """
+
+    CAPTURE = 0
+    VOICE = 1
+    HOUSEKEEPING = 2
+
+
+COMMAND_PRIORITIES = {
+    'take_picture': JobPriority.CAPTURE,
+    'take_burst': JobPriority.CAPTURE,
+    'take_bracket': JobPriority.CAPTURE,
+    'voice_prompt': JobPriority.VOICE,
+    'sync_cameras': JobPriority.HOUSEKEEPING
+}
+
+
+class QuietWindowPolicy(str, Enum):
+    """ Enumeration of what happens to housekeeping jobs that fall inside a quiet window. """
+
+    DEFER = "defer"
+    DROP = "drop"
+
+
+class QuietWindow:
+
+    def __init__(self, start_moment: str, start_offset: float, end_moment: str, end_offset: float):
+        """ Initialisation of a quiet window, relative to the reference moments of the eclipse.
+
+        Args:
+            - start_moment: Reference moment w.r.t. which the start of the window is expressed (e.g. C2)
+            - start_offset: Offset of the start of the window w.r.t. its reference moment [s]
+            - end_moment: Reference moment w.r.t. which the end of the window is expressed (e.g. C3)
+            - end_offset: Offset of the end of the window w.r.t. its reference moment [s]
+        """
+
+        self.start_moment = start_moment
+        self.start_offset = start_offset
+        self.end_moment = end_moment
+        self.end_offset = end_offset
+
+    def resolve(self, reference_moments: dict) -> Union[tuple, None]:
+        """ Calculate the start and end of the quiet window for the given reference moments.
+
+        Args:
+            - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo
+                                 objects
+
+        Returns: Tuple with the start and end of the window [UTC], or None if (one of) the reference moments does not
+                 occur for this eclipse (e.g. C2 for a partial eclipse).
+        """
+
+        if self.start_moment not in reference_moments or self.end_moment not in reference_moments:
+            return None
+
+        start = reference_moments[self.start_moment].time_utc + timedelta(seconds=self.start_offset)
+        end = reference_moments[self.end_moment].time_utc + timedelta(seconds=self.end_offset)
+
+        return start, end
+
+    def __str__(self):
+        return f"{self.start_moment}{self.start_offset:+g}s..{self.end_moment}{self.end_offset:+g}s"
+
+
+DEFAULT_QUIET_WINDOWS = [QuietWindow("C2", -60, "C3", 30)]
+
+
+def parse_quiet_window(text: str) -> QuietWindow:
+    """ Parse the given textual representation of a quiet window.
+
+    Args:
+        - text: Quiet window, in the format <moment><+/-><seconds>..<moment><+/-><seconds>, e.g. "C2-60..C3+30"
+
+    Returns: Quiet window.
+    """
+
+    match = re.fullmatch(r"\s*(\w+)\s*([+-]\s*[\d.]+)?\s*\.\.\s*(\w+)\s*([+-]\s*[\d.]+)?\s*", text)
+    if not match:
+        raise ValueError(f"Invalid quiet window '{text}' (expected e.g. C2-60..C3+30)")
+
+    start_moment, start_offset, end_moment, end_offset = match.groups()
+
+    return QuietWindow(__normalise_moment(start_moment), float(start_offset.replace(" ", "")) if start_offset else 0.0,
+                       __normalise_moment(end_moment), float(end_offset.replace(" ", "")) if end_offset else 0.0)
+
+
+def __normalise_moment(moment: str) -> str:
+    """ Private method to write the given reference moment as in the dictionary with reference moments.
+
+    Args:
+        - moment: Reference moment, in any case
+
+    Returns: Reference moment as in the dictionary with reference moments (C1, C2, MAX, C3, C4, sunrise, sunset).
+    """
+
+    return moment.upper() if moment.upper() in ("C1", "C2", "MAX", "C3", "C4") else moment.lower()
+
+
+class DeferredJob:
+
+    def __init__(self, func_name: str, description: str, scheduled_time: datetime,
+                 deferred_time: Union[datetime, None]):
+        """ Keep track of a housekeeping job that was moved out of a quiet window.
+
+        Args:
+            - func_name: Name of the command
+            - description: Description of the command
+            - scheduled_time: Execution time as specified in the script [UTC]
+            - deferred_time: Execution time after deferral [UTC], None if the job was dropped
+        """
+
+        self.func_name = func_name
+        self.description = description
+        self.scheduled_time = scheduled_time
+        self.deferred_time = deferred_time
+
+    def is_dropped(self) -> bool:
+        """ Check whether the job was dropped rather than deferred.
+
+        Returns: True if the job was dropped, False if it was deferred.
+        """
+
+        return self.deferred_time is None
+
+    def __str__(self):
+        if self.is_dropped():
+            return f"{self.func_name} at {self.scheduled_time:%H:%M:%S} dropped ({self.description})"
+        return (f"{self.func_name} at {self.scheduled_time:%H:%M:%S} deferred to {self.deferred_time:%H:%M:%S} "
+                f"({self.description})")
+
+
+def clean_description(description: str) -> str:
+    """ Returns the given description of a command without the quotes and the line end (as it is read from a script).
+
+    Args:
+        - description: Description of a command
+
+    Returns: Description without the surrounding whitespace and quotes.
+    """
+
+    return description.strip().strip('"')
+
+
+class JobTiming:
+
+    def __init__(self, description: str, lane: str, scheduled_time: datetime):
+        """ Keep track of the timing of a scheduled job.
+
+        Args:
+            - description: Description of the job
+            - lane: Lane in which the job is executed
+            - scheduled_time: Execution time of the job [UTC]
+        """
+
+        self.description = description
+        self.lane = lane
+        self.scheduled_time = scheduled_time
+
+        self.start_time: Union[datetime, None] = None
+        self.start_delay: Union[float, None] = None     # Time between the execution time and the start of the job [s]
+        self.duration: Union[float, None] = None        # Time between the start and the end of the job [s]
+        self.outcome: Union[str, None] = None           # "executed", "failed", or "missed" (None while pending)
+
+    def __str__(self):
+        return f"{self.scheduled_time:%H:%M:%S} {clean_description(self.description)}"
+
+
+def get_camera_lane(camera_name: str) -> str:
+    """ Returns the name of the lane (executor alias) for the given camera.
+
+    Args:
+        - camera_name: Name of the camera
+
+    Returns: Name of the lane for the given camera.
+    """
+
+    return f"camera:{camera_name}"
+
+
+class Dispatcher(BackgroundScheduler):
+
+    def __init__(self, quiet_windows: list = None, policy: QuietWindowPolicy = QuietWindowPolicy.DEFER,
+                 watchdog: CameraWatchdog = None, worker_pool: CameraWorkerPool = None, **options):
+        """ Initialisation of a scheduler that dispatches the commands in lanes and honours quiet windows.
+
+        Args:
+            - quiet_windows: List of QuietWindow objects (None for the default quiet windows)
+            - policy: What to do with housekeeping jobs that fall inside a quiet window
+            - watchdog: Watchdog that supervises the camera commands (None for no supervision)
+            - worker_pool: Pool of camera worker processes that execute the camera commands (None to execute them in
+                           this process)
+            - options: Options for the underlying background scheduler
+        """
+
+        super().__init__(**options)
+
+        self.quiet_windows = DEFAULT_QUIET_WINDOWS if quiet_windows is None else quiet_windows
+        self.policy = policy
+        self.watchdog = watchdog
+        self.worker_pool = worker_pool
+
+        # Camera name -> execution times of the capture jobs of the camera [s since epoch], sorted
+
+        self.capture_times: dict = {}
+        self.schedule = Schedule()
+
+        # Resolved quiet windows [UTC], in the (possibly simulated) timeline of the scheduler
+
+        self.quiet_periods: list = []
+        self.deferred_jobs: list = []
+
+        # Job id -> JobTiming, and the ids of the jobs that have not finished yet
+
+        self.job_timings: dict = {}
+        self.pending_jobs: set = set()
+        self.timing_lock = threading.Lock()
+        self.completed = threading.Event()
+        self.completed.set()
+
+        self.add_listener(self.__on_job_event, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
+                          | EVENT_ALL_JOBS_REMOVED | EVENT_SCHEDULER_SHUTDOWN)
+
+        # Reference moments of the eclipse, and the shift of the timeline of the scheduler w.r.t. them (when simulating)
+
+        self.reference_moments: dict = {}
+        self.time_shift = timedelta(0)
+
+        # Forecast of the storage and of the battery drain of the cameras, updated during the run (StorageMonitor and
+        # BatteryMonitor, None if not monitored)
+
+        self.storage_monitor = None
+        self.battery_monitor = None
+
+        self.add_executor(ThreadPoolExecutor(max_workers=1), alias=HOUSEKEEPING_LANE)
+
+    def set_reference_moments(self, reference_moments: dict, time_shift: timedelta = timedelta(0)):
+        """ Resolve the quiet windows for the given reference moments.
+
+        Args:
+            - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo
+                                 objects
+            - time_shift: Shift that is subtracted from all execution times (when simulating)
+        """
+
+        self.reference_moments = reference_moments
+        self.time_shift = time_shift
+        self.quiet_periods = []
+
+        for quiet_window in self.quiet_windows:
+            period = quiet_window.resolve(reference_moments)
+            if period:
+                self.quiet_periods.append((period[0] - time_shift, period[1] - time_shift))
+            else:
+                logging.info(f"Quiet window {quiet_window} does not apply to this eclipse")
+
+    def get_quiet_period(self, moment: datetime = None) -> Union[tuple, None]:
+        """ Returns the quiet period in which the given moment falls.
+
+        Args:
+            - moment: Moment to check [UTC] (None for the current time)
+
+        Returns: Tuple with the start and end of the quiet period [UTC], None if the given moment is not inside a quiet
+                 period.
+        """
+
+        moment = moment or datetime.now(pytz.utc)
+
+        for start, end in self.quiet_periods:
+            if start <= moment <= end:
+                return start, end
+
+        return None
+
+    def is_quiet(self, moment: datetime = None) -> bool:
+        """ Check whether the given moment falls inside a quiet window.
+
+        Args:
+            - moment: Moment to check [UTC] (None for the current time)
+
+        Returns: True if the given moment is inside a quiet window, False otherwise.
+        """
+
+        return self.get_quiet_period(moment) is not None
+
+    def add_command(self, func, execution_time: datetime, args: list, description: str,
+                    priority: JobPriority, lane: str = VOICE_LANE, kwargs: dict = None,
+                    source: str = None) -> Union[Job, None]:
+        """ Schedule the given command in the given lane.
+
+        Housekeeping jobs that would be executed inside a quiet window are deferred until the end of that window (or
+        dropped, depending on the policy).  Capture jobs are supervised by the watchdog (if any), which also decides
+        whether a late capture job is still executed.
+
+        Every command that is scheduled is added to the schedule overview (which is used to show the scheduled jobs).
+
+        When a pool of camera workers is used, capture jobs are sent to the worker of their camera straight away (with
+        their execution time), and the job that is scheduled here only waits for the result of the worker.
+
+        Args:
+            - func: Function to execute
+            - execution_time: Execution time [UTC]
+            - args: Arguments for the function
+            - description: Description of the command
+            - priority: Priority of the command
+            - lane: Lane in which to execute the command
+            - kwargs: Keyword arguments for the function
+            - source: Name of the script from which the command was compiled (None if unknown)
+
+        Returns: Scheduled job, or None if the job was dropped.
+        """
+
+        if priority == JobPriority.HOUSEKEEPING:
+            lane = HOUSEKEEPING_LANE
+            quiet_period = self.get_quiet_period(execution_time)
+
+            # Keep deferring, in case the end of one window falls inside the next one
+
+            deferred_time = execution_time
+            while quiet_period and self.policy == QuietWindowPolicy.DEFER:
+                deferred_time = quiet_period[1] + timedelta(seconds=1)
+                quiet_period = self.get_quiet_period(deferred_time)
+
+            if deferred_time != execution_time or quiet_period:
+                deferred_job = DeferredJob(func.__name__, description, execution_time,
+                                           None if quiet_period else deferred_time)
+                self.deferred_jobs.append(deferred_job)
+                logging.info(f"Housekeeping in quiet window: {deferred_job}")
+
+                if deferred_job.is_dropped():
+                    return None
+                execution_time = deferred_time
+
+        self.__ensure_lane(lane)
+
+        display_time = datetime.fromtimestamp(kwargs["start_time"], tz=pytz.utc) \
+            if kwargs and "start_time" in kwargs else execution_time
+        self.schedule.add(display_time, func.__name__, args, description, source)
+
+        # Unlike a cron trigger, a date trigger keeps the fractions of a second
+
+        trigger = DateTrigger(run_date=execution_time, timezone=pytz.utc)
+
+        # The job is tracked before it is added, as it may already be executed before add_job returns
+
+        job_id = uuid4().hex
+        with self.timing_lock:
+            self.job_timings[job_id] = JobTiming(description, lane, execution_time)
+            self.pending_jobs.add(job_id)
+            self.completed.clear()
+
+        if priority == JobPriority.CAPTURE:
+            bisect.insort(self.capture_times.setdefault(args[1].camera_name, []), execution_time.timestamp())
+
+        if priority == JobPriority.CAPTURE and self.worker_pool:
+            camera_name = args[1].camera_name
+            command_id = self.worker_pool.submit(camera_name, execution_time.timestamp(), func.__name__, args[1],
+                                                 args[2:])
+            job_func = trace_job(self.worker_pool.monitor(func, camera_name, command_id),
+                                 clean_description(description), lane, execution_time)
+            job_func = self.__track_start(job_func, job_id)
+            return self.add_job(job_func, trigger=trigger, args=args, id=job_id, name=description, executor=lane,
+                                misfire_grace_time=None)
+
+        if priority == JobPriority.CAPTURE and self.watchdog:
+            job_func = trace_job(self.watchdog.watch(func, args[1].camera_name, execution_time),
+                                 clean_description(description), lane, execution_time)
+            job_func = self.__track_start(job_func, job_id)
+            return self.add_job(job_func, trigger=trigger, args=args, id=job_id, name=description, executor=lane,
+                                misfire_grace_time=None)
+
+        job_func = self.__track_start(trace_job(func, clean_description(description), lane, execution_time), job_id)
+        return self.add_job(job_func, trigger=trigger, args=args, kwargs=kwargs, id=job_id, name=description,
+                            executor=lane)
+
+    def __track_start(self, func, job_id: str):
+        """ Wrap the given job function, such that the start of the job is tracked.
+
+        The start is tracked when the job is actually started in its lane, rather than when it is submitted to the
+        executor of the lane: a job that is missed is also submitted, and a job can wait in its lane for the previous
+        job of that lane.
+
+        Args:
+            - func: Function of the job
+            - job_id: Identifier of the job
+
+        Returns: Wrapped function.
+        """
+
+        @functools.wraps(func)
+        def tracked(*args, **kwargs):
+            self.__on_job_start(job_id)
+            return func(*args, **kwargs)
+
+        return tracked
+
+    def __on_job_start(self, job_id: str):
+        """ Keep track of the start of the given job, and publish it.
+
+        Args:
+            - job_id: Identifier of the job
+        """
+
+        now = datetime.now(pytz.utc)
+
+        with self.timing_lock:
+            timing: Union[JobTiming, None] = self.job_timings.get(job_id)
+            if timing is None:
+                return
+
+            timing.start_time = now
+            timing.start_delay = (now - timing.scheduled_time).total_seconds()
+            get_event_bus().publish(JobStarted(job_id, timing.description, timing.lane, timing.scheduled_time,
+                                               timing.start_delay))
+
+    def sample_camera_status(self, cameras: dict, timeout: float = None) -> list:
+        """ Read the status of the given cameras, each in the lane of the camera.
+
+        The status of a camera is read by a job in the lane of the camera, so it is read in between its capture jobs.
+        The readings are published on the event bus (see camera.sample_camera_status).  Inside a quiet window, no status
+        is read, and cameras with a capture job within the next STATUS_CAPTURE_MARGIN seconds are skipped.
+
+        Args:
+            - cameras: Dictionary of camera names and camera objects
+            - timeout: Time to wait for the readings [s] (None to return without waiting for them)
+
+        Returns: List of CameraStatusSampled events, for the cameras of which the status has been read within the
+                 timeout (empty list when not waiting).
+        """
+
+        now = datetime.now(pytz.utc)
+        if self.is_quiet(now):
+            return []
+
+        samples = []
+        finished_events = []
+
+        for camera_name, camera in cameras.items():
+            capture_times = self.capture_times.get(camera_name, [])
+            index = bisect.bisect_left(capture_times, now.timestamp())
+            if index < len(capture_times) and capture_times[index] - now.timestamp() < STATUS_CAPTURE_MARGIN:
+                logging.debug(f"Status of camera {camera_name} not read, as it has a capture job coming up")
+                continue
+
+            lane = get_camera_lane(camera_name)
+            self.__ensure_lane(lane)
+
+            finished = threading.Event()
+            finished_events.append(finished)
+            self.add_job(self.__sample_camera_status, trigger=DateTrigger(run_date=now, timezone=pytz.utc),
+                         args=[camera_name, camera, samples, finished], name=f"Status of {camera_name}",
+                         executor=lane, misfire_grace_time=None)
+
+        if timeout is None:
+            return []
+
+        deadline = datetime.now(pytz.utc) + timedelta(seconds=timeout)
+        for finished in finished_events:
+            finished.wait(max(0.0, (deadline - datetime.now(pytz.utc)).total_seconds()))
+
+        return list(samples)
+
+    def __sample_camera_status(self, camera_name: str, camera, samples: list, finished: threading.Event):
+        """ Read the status of the given camera (job in the lane of the camera).
+
+        Args:
+            - camera_name: Name of the camera
+            - camera: Camera object
+            - samples: List to which the reading is appended (as CameraStatusSampled event)
+            - finished: Event that is set when the status has been read (or could not be read)
+        """
+
+        try:
+            samples.extend(sample_camera_status({camera_name: camera}, self.worker_pool))
+        finally:
+            finished.set()
+
+    def __ensure_lane(self, lane: str):
+        """ Create a single-threaded executor for the given lane, if it does not exist yet.
+
+        Args:
+            - lane: Name of the lane
+        """
+
+        if lane in (VOICE_LANE, HOUSEKEEPING_LANE):
+            return
+
+        try:
+            self.add_executor(ThreadPoolExecutor(max_workers=1), alias=lane)
+        except ValueError:
+            # Lane already exists
+            pass
+
+    def get_deferred_jobs(self) -> list:
+        """ Returns the housekeeping jobs that were deferred or dropped because of a quiet window.
+
+        Returns: List of DeferredJob objects.
+        """
+
+        return self.deferred_jobs
+
+    def report_deferred_jobs(self):
+        """ Log an overview of the housekeeping jobs that were deferred or dropped because of a quiet window. """
+
+        if not self.deferred_jobs:
+            return
+
+        logging.warning(f"{len(self.deferred_jobs)} housekeeping job(s) fell inside a quiet window:")
+        for deferred_job in self.deferred_jobs:
+            logging.warning(f"    {deferred_job}")
+
+    def wait_until_completed(self, timeout: float = None) -> bool:
+        """ Wait until all scheduled jobs have finished (or the scheduler has been shut down).
+
+        Args:
+            - timeout: Maximum time to wait [s] (None to wait until the jobs have finished)
+
+        Returns: True if all jobs have finished, False if the timeout expired.
+        """
+
+        return self.completed.wait(timeout)
+
+    def get_progress(self) -> tuple:
+        """ Returns how many of the scheduled jobs have finished.
+
+        Returns: Tuple with the number of finished jobs and the number of scheduled jobs.
+        """
+
+        with self.timing_lock:
+            return len(self.job_timings) - len(self.pending_jobs), len(self.job_timings)
+
+    def get_outcomes(self) -> dict:
+        """ Returns how many of the scheduled jobs have been executed, have failed, have been missed, or are pending.
+
+        Returns: Dictionary with the outcomes ("executed", "failed", "missed", and "pending") as keys and the number of
+                 jobs with that outcome as values.
+        """
+
+        with self.timing_lock:
+            outcomes = [timing.outcome for timing in self.job_timings.values()]
+
+        return {"executed": outcomes.count("executed"), "failed": outcomes.count("failed"),
+                "missed": outcomes.count("missed"), "pending": outcomes.count(None)}
+
+    def get_next_jobs(self, limit: int = 1) -> list:
+        """ Returns the pending jobs that will be executed first.
+
+        Args:
+            - limit: Maximum number of jobs to return
+
+        Returns: List of JobTiming objects, sorted by execution time.
+        """
+
+        with self.timing_lock:
+            pending = [self.job_timings[job_id] for job_id in self.pending_jobs]
+
+        return heapq.nsmallest(limit, pending, key=lambda timing: timing.scheduled_time)
+
+    def get_timing_summary(self) -> list:
+        """ Returns a summary of the timing of the jobs that have been started.
+
+        Returns: List of lines with the number of executed, failed, and missed jobs, and the start delay and busy time
+                 per lane.
+        """
+
+        with self.timing_lock:
+            timings = list(self.job_timings.values())
+
+        outcomes = [timing.outcome for timing in timings]
+        summary = [f"{outcomes.count('executed')} job(s) executed, {outcomes.count('failed')} failed, "
+                   f"{outcomes.count('missed')} missed, {outcomes.count(None)} not run"]
+
+        # Missed jobs are never started, so they have no start delay
+
+        dispatched = [timing for timing in timings if timing.start_delay is not None and timing.outcome != "missed"]
+        if dispatched:
+            latest = max(dispatched, key=lambda timing: timing.start_delay)
+            mean_delay = sum(timing.start_delay for timing in dispatched) / len(dispatched)
+            summary.append(f"Start delay: mean {mean_delay * 1000:.1f}ms, max {latest.start_delay * 1000:.1f}ms "
+                           f"({latest})")
+
+        for lane in sorted({timing.lane for timing in dispatched}):
+            lane_timings = [timing for timing in dispatched if timing.lane == lane]
+            durations = [timing.duration for timing in lane_timings if timing.duration is not None]
+            summary.append(f"Lane {lane}: {len(lane_timings)} job(s), max start delay "
+                           f"{max(timing.start_delay for timing in lane_timings) * 1000:.1f}ms, busy "
+                           f"{sum(durations):.1f}s, longest job {max(durations, default=0):.1f}s")
+
+        return summary
+
+    def __on_job_event(self, event: SchedulerEvent):
+        """ Keep track of the timing of the jobs, publish their start and end, and signal when all jobs have finished.
+
+        Args:
+            - event: Event of the scheduler
+        """
+
+        now = datetime.now(pytz.utc)
+
+        with self.timing_lock:
+            if event.code == EVENT_SCHEDULER_SHUTDOWN:
+                self.completed.set()
+                return
+
+            if event.code == EVENT_ALL_JOBS_REMOVED:
+                self.pending_jobs.clear()
+                self.completed.set()
+                return
+
+            timing: Union[JobTiming, None] = self.job_timings.get(event.job_id)
+            if timing is None:
+                return
+
+            if event.code == EVENT_JOB_MISSED:
+                timing.outcome = "missed"
+            else:
+                timing.outcome = "executed" if event.code == EVENT_JOB_EXECUTED else "failed"
+                if timing.start_time:
+                    timing.duration = (now - timing.start_time).total_seconds()
+
+            get_event_bus().publish(JobFinished(event.job_id, timing.description, timing.lane, timing.scheduled_time,
+                                                timing.outcome, timing.duration, getattr(event, "exception", None)))
+
+            self.pending_jobs.discard(event.job_id)
+            if not self.pending_jobs:
+                self.completed.set()
+
+    def shutdown(self, wait=True):
+        """ Shut down the scheduler, the camera workers, and the storage and battery monitors (if any).
+
+        Args:
+            - wait: Whether to wait until all currently executing jobs have finished
+        """
+
+        super().shutdown(wait)
+
+        if self.worker_pool:
+            self.worker_pool.shutdown()
+        if self.storage_monitor:
+            self.storage_monitor.stop()
+        if self.battery_monitor:
+            self.battery_monitor.stop()
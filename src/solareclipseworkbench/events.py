@@ -0,0 +1,334 @@
+""" Event bus for the events of the scheduler, the watchdog, and the cameras.
+
+The events are published from the threads in which they happen (e.g. the threads of the scheduler), and delivered to
+the subscribers in another thread, so a slow (or failing) subscriber cannot delay the dispatching of the jobs:
+
+    - Every subscriber has its own queue, and its own thread that takes the events from that queue and passes them to
+      the callback of the subscriber.  Publishing an event only puts it in the queues of the interested subscribers;
+    - An exception raised by a callback is logged, and does not affect the other subscribers (or the next events);
+    - When the queue of a subscriber is full, new events for that subscriber are dropped (and counted);
+    - A subscriber can pass an invoker, which is called with the callback and the event instead of calling the callback
+      directly.  The GUI uses this to execute the callback in the GUI thread (see tasks.GuiInvoker).
+
+The subscribers choose the events they receive by their type (including the subclasses of that type).
+"""
+import logging
+import queue
+import threading
+from datetime import datetime
+from typing import Callable, Union
+
+import pytz
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench")
+
+# Maximum number of events that wait to be delivered to a subscriber
+
+DEFAULT_QUEUE_SIZE = 1000
+
+
+class Event:
+
+    def __init__(self):
+        """ Initialisation of an event, which happens now. """
+
+        self.time = datetime.now(pytz.utc)
+
+
+class JobStarted(Event):
+
+    def __init__(self, job_id: str, description: str, lane: str, scheduled_time: datetime, start_delay: float):
+        """ Event for a job that has been started in its lane.
+
+        Args:
+            - job_id: Identifier of the job
+            - description: Description of the job
+            - lane: Lane in which the job is executed
+            - scheduled_time: Execution time of the job [UTC]
+            - start_delay: Time between the execution time and the start of the job [s]
+        """
+
+        super().__init__()
+
+        self.job_id = job_id
+        self.description = description
+        self.lane = lane
+        self.scheduled_time = scheduled_time
+        self.start_delay = start_delay
+
+
+class JobFinished(Event):
+
+    def __init__(self, job_id: str, description: str, lane: str, scheduled_time: datetime, outcome: str,
+                 duration: Union[float, None], error: Union[BaseException, None] = None):
+        """ Event for a job that has been executed, has failed, or has been missed.
+
+        Args:
+            - job_id: Identifier of the job
+            - description: Description of the job
+            - lane: Lane in which the job is executed
+            - scheduled_time: Execution time of the job [UTC]
+            - outcome: "executed", "failed", or "missed"
+            - duration: Time between the start and the end of the job [s] (None if the job was missed)
+            - error: Exception raised by the job (None if it did not fail)
+        """
+
+        super().__init__()
+
+        self.job_id = job_id
+        self.description = description
+        self.lane = lane
+        self.scheduled_time = scheduled_time
+        self.outcome = outcome
+        self.duration = duration
+        self.error = error
+
+
+class CameraStatusSampled(Event):
+
+    def __init__(self, camera_name: str, battery_level: str, free_space: float, total_space: float):
+        """ Event for a reading of the status of a camera.
+
+        Args:
+            - camera_name: Name of the camera
+            - battery_level: Battery level of the camera (e.g. "75%")
+            - free_space: Free space on the memory card [GB]
+            - total_space: Total space on the memory card [GB]
+        """
+
+        super().__init__()
+
+        self.camera_name = camera_name
+        self.battery_level = battery_level
+        self.free_space = free_space
+        self.total_space = total_space
+
+
+class CameraStateChanged(Event):
+
+    def __init__(self, camera_name: str, state):
+        """ Event for a change of the state of a camera (as determined by the watchdog).
+
+        Args:
+            - camera_name: Name of the camera
+            - state: New state of the camera (CameraState)
+        """
+
+        super().__init__()
+
+        self.camera_name = camera_name
+        self.state = state
+
+
+class RecoveryActionTaken(Event):
+
+    def __init__(self, action):
+        """ Event for an action that was taken by the watchdog.
+
+        Args:
+            - action: Action that was taken (RecoveryAction)
+        """
+
+        super().__init__()
+
+        self.action = action
+
+
+class StorageShortageForecast(Event):
+
+    def __init__(self, camera_name: str, kind: str, description: str, scheduled_time: datetime, message: str):
+        """ Event for a forecast that the memory card of a camera fills up, or that its buffer overflows.
+
+        Args:
+            - camera_name: Name of the camera
+            - kind: "card" or "buffer"
+            - description: Description of the camera command at which it runs out
+            - scheduled_time: Execution time of that command [UTC]
+            - message: Description of the shortage
+        """
+
+        super().__init__()
+
+        self.camera_name = camera_name
+        self.kind = kind
+        self.description = description
+        self.scheduled_time = scheduled_time
+        self.message = message
+
+
+class BatteryAlert(Event):
+
+    def __init__(self, camera_name: str, battery_level: float, depletion_time: datetime,
+                 swap_deadline: Union[datetime, None], message: str):
+        """ Event for a battery that is predicted to run out before the end of the script.
+
+        Args:
+            - camera_name: Name of the camera
+            - battery_level: Latest battery level of the camera [%]
+            - depletion_time: Time at which the battery is predicted to run out [UTC]
+            - swap_deadline: Time until which the battery can be swapped before totality [UTC] (None if that time has
+                             passed)
+            - message: Description of the prediction
+        """
+
+        super().__init__()
+
+        self.camera_name = camera_name
+        self.battery_level = battery_level
+        self.depletion_time = depletion_time
+        self.swap_deadline = swap_deadline
+        self.message = message
+
+
+class Subscription:
+
+    def __init__(self, event_types: tuple, callback: Callable, invoker: Callable = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        """ Initialisation of a subscription to the events of the given types.
+
+        The events are delivered to the callback in a dedicated thread, in the order in which they were published.
+
+        Args:
+            - event_types: Types of the events to deliver
+            - callback: Function that is called with each event
+            - invoker: Function that is called with the callback and the event, instead of calling the callback
+                       directly (e.g. to call it in another thread), None to call the callback directly
+            - queue_size: Maximum number of events that wait to be delivered
+        """
+
+        self.event_types = event_types
+        self.callback = callback
+        self.invoker = invoker
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.num_dropped = 0
+
+        self.thread = threading.Thread(target=self.__deliver, name=f"Events for {getattr(callback, '__name__', '')}",
+                                       daemon=True)
+        self.thread.start()
+
+    def put(self, event: Event):
+        """ Queue the given event for delivery (or drop it when the queue is full).
+
+        Args:
+            - event: Event to deliver
+        """
+
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.num_dropped += 1
+
+    def close(self):
+        """ Stop delivering events (after the events that have been queued already).
+
+        This never blocks: when the queue is full (the subscriber is slow), the oldest events are dropped to make room
+        for the end of the queue.
+        """
+
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                return
+            except queue.Full:
+                pass
+
+            try:
+                self.queue.get_nowait()
+                self.num_dropped += 1
+            except queue.Empty:
+                pass
+
+    def __deliver(self):
+        """ Pass the queued events to the callback, until the subscription is closed. """
+
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+
+            try:
+                if self.invoker:
+                    self.invoker(self.callback, event)
+                else:
+                    self.callback(event)
+            except Exception as exc:
+                LOGGER.exception(f"Subscriber {getattr(self.callback, '__name__', self.callback)} failed to handle "
+                                 f"{type(event).__name__}: {exc}")
+
+
+class EventBus:
+
+    def __init__(self):
+        """ Initialisation of the event bus. """
+
+        # Replaced (rather than modified) when a subscriber is added or removed, so publish needs no lock
+
+        self.subscriptions: tuple = ()
+        self.lock = threading.Lock()
+
+    def subscribe(self, event_types: Union[type, tuple], callback: Callable, invoker: Callable = None,
+                  queue_size: int = DEFAULT_QUEUE_SIZE) -> Subscription:
+        """ Subscribe to the events of the given type(s).
+
+        Args:
+            - event_types: Type(s) of the events to receive (subclasses of Event)
+            - callback: Function that is called with each event (in a thread of the subscription)
+            - invoker: Function that is called with the callback and the event, instead of calling the callback
+                       directly (None to call the callback directly)
+            - queue_size: Maximum number of events that wait to be delivered to this subscriber
+
+        Returns: Subscription, to pass to unsubscribe.
+        """
+
+        subscription = Subscription(event_types if isinstance(event_types, tuple) else (event_types,), callback,
+                                    invoker, queue_size)
+
+        with self.lock:
+            self.subscriptions = self.subscriptions + (subscription,)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """ Stop delivering events to the given subscription.
+
+        Args:
+            - subscription: Subscription that was returned by subscribe
+        """
+
+        with self.lock:
+            self.subscriptions = tuple(s for s in self.subscriptions if s is not subscription)
+
+        subscription.close()
+
+    def publish(self, event: Event):
+        """ Deliver the given event to the subscribers of its type.
+
+        This returns immediately: the event is only put in the queues of the subscribers.
+
+        Args:
+            - event: Event to publish
+        """
+
+        for subscription in self.subscriptions:
+            if isinstance(event, subscription.event_types):
+                subscription.put(event)
+
+
+__EVENT_BUS: Union[EventBus, None] = None
+__EVENT_BUS_LOCK = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """ Returns the event bus (which is created on first use).
+
+    Returns: Event bus.
+    """
+
+    global __EVENT_BUS
+
+    with __EVENT_BUS_LOCK:
+        if __EVENT_BUS is None:
+            __EVENT_BUS = EventBus()
+
+        return __EVENT_BUS
@@ -0,0 +1,219 @@
+""" Static check of whether a script can be executed as planned.
+
+The script is compiled against the reference moments of the eclipse (without scheduling anything), and checked for:
+
+    - Commands that refer to reference moments that do not occur for this eclipse (e.g. C2 and C3 for a partial
+      eclipse), including the loops between such moments;
+    - Camera commands that cannot finish before the next command on the same camera is due (e.g. a long burst, a
+      5-shot bracket, or the time it takes to change the settings), using the camera latency model of transitions.py;
+    - Camera commands that are executed while the sun is below the horizon;
+    - Memory cards that fill up, and camera buffers that overflow during bursts (with the given storage profile per
+      camera, see forecast.py).
+
+Every problem is reported with the number of the line in the script (for a loop: the line of the command in the loop).
+
+Usage:
+
+    python src/solareclipseworkbench/feasibility.py script.txt -d 2024-04-08 -lon -104.63525 -lat 24.01491 -alt 1877.3
+"""
+import argparse
+import sys
+import time
+from enum import Enum
+from typing import Union
+
+from solareclipseworkbench.forecast import forecast_storage, find_shortages, read_profiles, ShortageKind
+from solareclipseworkbench.plan import compile_script
+from solareclipseworkbench.transitions import TransitionCostModel, estimate_plan, read_cost_model, measure_cost_model
+
+
+class Severity(str, Enum):
+    """ Enumeration of the severity of a problem in a script. """
+
+    ERROR = "error"
+    WARNING = "warning"
+
+
+class Problem:
+
+    def __init__(self, line_number: Union[int, None], severity: Severity, message: str, camera_name: str = None):
+        """ Problem in a script.
+
+        Args:
+            - line_number: Number of the line in the script (None if the problem does not concern a single line)
+            - severity: Whether the script cannot be executed as planned (error), or may not be (warning)
+            - message: Description of the problem
+            - camera_name: Name of the camera concerned (None if the problem does not concern a single camera)
+        """
+
+        self.line_number = line_number
+        self.severity = severity
+        self.message = message
+        self.camera_name = camera_name
+
+    def __str__(self):
+        location = f"Line {self.line_number}" if self.line_number is not None else "Script"
+        return f"{location}: {self.severity.value}: {self.message}"
+
+
+def check_script(filename: str, reference_moments: dict, model: TransitionCostModel = None,
+                 profiles: dict = None) -> list:
+    """ Check whether the given script can be executed as planned.
+
+    Args:
+        - filename: Name of the script
+        - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects
+        - model: Model of the time the camera commands take (None for the default model)
+        - profiles: Dictionary with the camera names as keys and CameraProfile objects as values (cameras that are
+                    not in it get the default storage profile, see forecast.py)
+
+    Returns: List of Problem objects, sorted by line number.
+    """
+
+    model = model or TransitionCostModel()
+    profiles = profiles or {}
+
+    loop_problems = []
+    plan = compile_script(filename, reference_moments, loop_problems)
+
+    problems = [Problem(line_number, Severity.ERROR, message) for line_number, message in loop_problems]
+
+    # Reference moments that do not occur for this eclipse (reported once per line)
+
+    missing = {}
+    for command in plan:
+        if command.ref_moment not in reference_moments:
+            missing.setdefault(command.line_number, command)
+    for line_number, command in missing.items():
+        problems.append(Problem(line_number, Severity.ERROR, f"{command.func_name} refers to {command.ref_moment}, "
+                                                             f"which does not occur for this eclipse"))
+
+    # Overlapping commands on the same camera
+
+    estimates = estimate_plan(plan, reference_moments, model)
+
+    for estimate in estimates:
+        if not estimate.is_feasible():
+            next_command = estimate.next_command
+            problems.append(Problem(
+                estimate.command.line_number, Severity.ERROR,
+                f"{estimate.command} takes {estimate.duration:.2f}s (setup {estimate.setup_time:.2f}s), but the next "
+                f"command on {estimate.command.get_camera_name()} ({next_command}, line {next_command.line_number}) "
+                f"is due {estimate.available_time:.2f}s later: it is delayed by {estimate.overrun:.2f}s",
+                estimate.command.get_camera_name()))
+
+    # Sun below the horizon
+
+    sunrise = reference_moments["sunrise"].time_utc if "sunrise" in reference_moments else None
+    sunset = reference_moments["sunset"].time_utc if "sunset" in reference_moments else None
+
+    for estimate in estimates:
+        if (sunrise and estimate.execution_time < sunrise) or (sunset and estimate.execution_time > sunset):
+            problems.append(Problem(estimate.command.line_number, Severity.WARNING,
+                                    f"{estimate.command} is executed while the sun is below the horizon",
+                                    estimate.command.get_camera_name()))
+
+    # Memory card and buffer
+
+    problems += check_capacity(estimates, profiles)
+
+    return sorted(problems, key=lambda problem: (problem.line_number is not None, problem.line_number or 0))
+
+
+def check_capacity(estimates: list, profiles: dict) -> list:
+    """ Check whether the memory cards fill up, or the buffers of the cameras overflow (see forecast.py).
+
+    Args:
+        - estimates: List of CommandEstimate objects, sorted by execution time
+        - profiles: Dictionary with the camera names as keys and CameraProfile objects as values
+
+    Returns: List of Problem objects (for each camera: only the first time the card is full, and the first time the
+             buffer overflows).
+    """
+
+    return [Problem(shortage.point.command.line_number,
+                    Severity.ERROR if shortage.kind == ShortageKind.CARD else Severity.WARNING, shortage.message,
+                    shortage.camera_name)
+            for shortage in find_shortages(forecast_storage(estimates, profiles), profiles)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check whether a script can be executed as planned")
+    parser.add_argument("script", help="script to check")
+    parser.add_argument(
+        "-d",
+        "--date",
+        help="date of the solar eclipse (in YYYY-MM-DD format)",
+        required=True
+    )
+    parser.add_argument(
+        "-lon",
+        "--longitude",
+        help="longitude of the location where to watch the solar eclipse (W is negative)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "-lat",
+        "--latitude",
+        help="latitude of the location where to watch the solar eclipse (N is positive)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "-alt",
+        "--altitude",
+        help="altitude of the location where to watch the solar eclipse (in meters)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "--costs",
+        help="JSON file with the time the steps of the camera commands take (see transitions.py)",
+        default=None
+    )
+    parser.add_argument(
+        "--trace",
+        help="trace of a rehearsal (see --trace of sew.py), from which to measure the time the steps take",
+        default=None
+    )
+    parser.add_argument(
+        "--profiles",
+        help="JSON file with the storage profile per camera: free space on the memory card, size of an image, and "
+             "capacity of the buffer (see forecast.read_profiles)",
+        default=None
+    )
+
+    args = parser.parse_args()
+
+    from astropy.time import Time
+    from solareclipseworkbench.reference_moments import calculate_reference_moments
+
+    reference_moments, _, eclipse_type = calculate_reference_moments(args.longitude, args.latitude, args.altitude,
+                                                                     Time(args.date))
+
+    if args.trace:
+        model = measure_cost_model(args.trace)
+    elif args.costs:
+        model = read_cost_model(args.costs)
+    else:
+        model = TransitionCostModel()
+
+    profiles = read_profiles(args.profiles) if args.profiles else {}
+
+    start = time.perf_counter()
+    problems = check_script(args.script, reference_moments, model, profiles)
+    check_time = time.perf_counter() - start
+
+    for problem in problems:
+        print(problem)
+
+    num_errors = sum(problem.severity == Severity.ERROR for problem in problems)
+    print(f"{eclipse_type} eclipse: {num_errors} error(s), {len(problems) - num_errors} warning(s) "
+          f"(checked in {check_time * 1000:.0f}ms)")
+
+    return 1 if num_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
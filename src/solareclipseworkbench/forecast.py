@@ -0,0 +1,464 @@
+""" Forecast of the free space on the memory cards and of the occupancy of the camera buffers during a script.
+
+The compiled script (with the estimated duration of the camera commands, see transitions.py) is combined with a storage
+profile per camera: the free space on its memory card, the average size of an image, the number of images that fit in
+its buffer, and the speed at which the buffer is written to the card.  This gives a timeline per camera of:
+
+    - The free space on the memory card, which decreases with every image that is taken;
+    - The number of images in the buffer of the camera, which is filled by the images that are taken (during a burst:
+      at the burst rate), and emptied at the write speed of the camera.  When the buffer is full, the camera slows down.
+
+The forecast is made before the run (a card that fills up is reported as an error, a buffer that overflows as a
+warning), and updated during the run from the status of the cameras: the free space is read from the camera, and the
+average size of an image is measured from the space that has been used by the images that have been taken since the
+first reading.
+
+Usage:
+
+    python src/solareclipseworkbench/forecast.py script.txt -d 2024-04-08 -lon -104.63525 -lat 24.01491 -alt 1877.3 \
+        --profiles profiles.json
+"""
+import argparse
+import copy
+import json
+import logging
+import math
+import sys
+import threading
+from datetime import datetime, timedelta
+from enum import Enum
+from pathlib import Path
+from typing import Union
+
+import pytz
+from solareclipseworkbench.events import get_event_bus, CameraStatusSampled, StorageShortageForecast
+from solareclipseworkbench.plan import compile_script
+from solareclipseworkbench.transitions import TransitionCostModel, estimate_plan, read_cost_model, BRACKET_SHOTS
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench")
+
+# Default storage profile of a camera: size of an image (RAW) [MB], images in the buffer, speed at which the buffer is
+# written to the card [MB/s], and images per second of a (Canon) burst
+
+DEFAULT_FILE_SIZE = 30.0
+DEFAULT_BUFFER_IMAGES = 30
+DEFAULT_WRITE_SPEED = 60.0
+DEFAULT_BURST_RATE = 6.0
+
+# Minimum space that must have been used since the first reading of the free space, before the average size of an image
+# is measured from it (the free space is read with a resolution of 0.1GB) [GB]
+
+MIN_MEASURED_SPACE = 1.0
+
+MB_PER_GB = 1024
+
+
+class ShortageKind(str, Enum):
+    """ Enumeration of the storage that can run out. """
+
+    CARD = "card"
+    BUFFER = "buffer"
+
+
+class CameraProfile:
+
+    def __init__(self, free_space: float = None, file_size: float = DEFAULT_FILE_SIZE,
+                 buffer_images: int = DEFAULT_BUFFER_IMAGES, write_speed: float = DEFAULT_WRITE_SPEED,
+                 burst_rate: float = DEFAULT_BURST_RATE):
+        """ Storage profile of a camera.
+
+        Args:
+            - free_space: Free space on the memory card [GB] (None if unknown)
+            - file_size: Average size of an image [MB]
+            - buffer_images: Number of images that fit in the buffer of the camera
+            - write_speed: Speed at which the buffer is written to the memory card [MB/s]
+            - burst_rate: Number of images per second of a burst (Canon: the burst lasts as long as given in the script)
+        """
+
+        self.free_space = free_space
+        self.file_size = file_size
+        self.buffer_images = buffer_images
+        self.write_speed = write_speed
+        self.burst_rate = burst_rate
+
+    def get_write_rate(self) -> float:
+        """ Returns the number of images per second that are written from the buffer to the memory card.
+
+        Returns: Number of images per second.
+        """
+
+        return self.write_speed / self.file_size
+
+    def get_card_images(self) -> Union[int, None]:
+        """ Returns the number of images that still fit on the memory card.
+
+        Returns: Number of images (None if the free space is unknown).
+        """
+
+        if self.free_space is None:
+            return None
+
+        return int(self.free_space * MB_PER_GB / self.file_size)
+
+
+class StoragePoint:
+
+    def __init__(self, command, time: datetime, images: int, card_free: Union[float, None], buffer_images: float):
+        """ Forecast of the storage of a camera, right after a camera command.
+
+        Args:
+            - command: Camera command (PlannedCommand)
+            - time: Execution time of the command [UTC]
+            - images: Number of images taken by the command
+            - card_free: Free space on the memory card after the command [GB] (None if unknown)
+            - buffer_images: Highest number of images in the buffer during the command
+        """
+
+        self.command = command
+        self.time = time
+        self.images = images
+        self.card_free = card_free
+        self.buffer_images = buffer_images
+
+    def __str__(self):
+        card_free = f"{self.card_free:.1f}GB" if self.card_free is not None else "unknown"
+        return f"{self.time.strftime('%H:%M:%S')} {self.command}: {self.images} image(s), card {card_free} free, " \
+               f"buffer {self.buffer_images:.0f} image(s)"
+
+
+class StorageShortage:
+
+    def __init__(self, camera_name: str, kind: ShortageKind, point: StoragePoint, message: str):
+        """ Forecast that the memory card of a camera fills up, or that its buffer overflows.
+
+        Args:
+            - camera_name: Name of the camera
+            - kind: Whether the memory card or the buffer runs out
+            - point: Forecast of the storage right after the command at which it runs out
+            - message: Description of the shortage
+        """
+
+        self.camera_name = camera_name
+        self.kind = kind
+        self.point = point
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def count_images(command, profile: CameraProfile) -> int:
+    """ Returns the number of images that are taken by the given camera command.
+
+    Args:
+        - command: Camera command (PlannedCommand)
+        - profile: Storage profile of the camera
+
+    Returns: Number of images.
+    """
+
+    camera_name = command.get_camera_name()
+
+    if command.func_name == "take_burst":
+        duration = float(command.args[4])
+        return round(duration) if "Nikon" in camera_name else round(duration * profile.burst_rate)
+    if command.func_name == "take_bracket":
+        return BRACKET_SHOTS if "Canon" in camera_name else 0
+
+    return 1
+
+
+def forecast_storage(estimates: list, profiles: dict, start: datetime = None) -> dict:
+    """ Forecast the free space on the memory cards and the occupancy of the buffers of the cameras.
+
+    The buffer is filled by the images that are taken, and emptied at the write rate of the camera.  The images of a
+    burst arrive during the burst, while the buffer is being emptied.  The buffers are empty at the start.
+
+    Args:
+        - estimates: List of CommandEstimate objects, sorted by execution time (see transitions.estimate_plan)
+        - profiles: Dictionary with the camera names as keys and CameraProfile objects as values (cameras that are
+                    not in it get the default profile)
+        - start: Time from which to forecast [UTC] (the commands before it have been executed already, and are
+                 not in the forecast; None to forecast all commands)
+
+    Returns: Dictionary with the camera names as keys and the list of StoragePoint objects (one per command) as values.
+    """
+
+    forecast = {}
+    card_free = {}          # Camera name -> free space on the memory card [GB]
+    buffers = {}            # Camera name -> (images in the buffer, time at which the last image arrived [UTC])
+
+    for estimate in estimates:
+        if start is not None and estimate.execution_time < start:
+            continue
+
+        command = estimate.command
+        camera_name = command.get_camera_name()
+        profile = profiles.get(camera_name) or CameraProfile()
+        write_rate = profile.get_write_rate()
+        num_images = count_images(command, profile)
+
+        free_space = card_free.get(camera_name, profile.free_space)
+        if free_space is not None:
+            free_space -= num_images * profile.file_size / MB_PER_GB
+            card_free[camera_name] = free_space
+
+        occupancy, last_time = buffers.get(camera_name, (0.0, estimate.execution_time))
+        # A command that is due during a burst, is delayed until the burst has finished
+        elapsed_time = max(0.0, (estimate.execution_time - last_time).total_seconds())
+        occupancy = max(0.0, occupancy - write_rate * elapsed_time)
+
+        if command.func_name == "take_burst":
+            # The buffer fills up during the burst if the images arrive faster than they are written
+            burst_time = estimate.duration - estimate.setup_time
+            occupancy = occupancy + num_images - write_rate * burst_time
+            peak = max(occupancy, occupancy - num_images + write_rate * burst_time)
+            occupancy = max(0.0, occupancy)
+            last_time = estimate.execution_time + timedelta(seconds=burst_time)
+        else:
+            occupancy += num_images
+            peak = occupancy
+            last_time = estimate.execution_time
+
+        buffers[camera_name] = (occupancy, last_time)
+        forecast.setdefault(camera_name, []).append(
+            StoragePoint(command, estimate.execution_time, num_images, free_space, peak))
+
+    return forecast
+
+
+def find_shortages(forecast: dict, profiles: dict) -> list:
+    """ Find the first command at which the memory card of a camera fills up, and at which its buffer overflows.
+
+    Args:
+        - forecast: Dictionary with the camera names as keys and the list of StoragePoint objects as values (see
+                    forecast_storage)
+        - profiles: Dictionary with the camera names as keys and CameraProfile objects as values
+
+    Returns: List of StorageShortage objects (for each camera: at most one for the card, and one for the buffer).
+    """
+
+    shortages = []
+
+    for camera_name, points in forecast.items():
+        profile = profiles.get(camera_name) or CameraProfile()
+
+        for point in points:
+            if point.card_free is not None and point.card_free < 0:
+                missing_space = -points[-1].card_free
+                shortages.append(StorageShortage(
+                    camera_name, ShortageKind.CARD, point,
+                    f"The memory card of {camera_name} is full at {point.command} "
+                    f"({point.time.strftime('%H:%M:%S')}): the script needs {missing_space:.1f}GB "
+                    f"({math.ceil(missing_space * MB_PER_GB / profile.file_size)} images) more"))
+                break
+
+        for point in points:
+            if point.buffer_images > profile.buffer_images:
+                shortages.append(StorageShortage(
+                    camera_name, ShortageKind.BUFFER, point,
+                    f"The buffer of {camera_name} is full ({point.buffer_images:.0f} of {profile.buffer_images} "
+                    f"images) at {point.command} ({point.time.strftime('%H:%M:%S')}): the camera slows down"))
+                break
+
+    return shortages
+
+
+class StorageMonitor:
+
+    def __init__(self, estimates: list, profiles: dict = None, time_shift: timedelta = timedelta(0),
+                 samples: list = ()):
+        """ Initialisation of a monitor that forecasts the storage of the cameras, and updates the forecast whenever
+            the status of a camera is read.
+
+        The forecast is made right away (with the given readings of the status of the cameras, if any), and a
+        shortage is logged as a warning.  A shortage is reported (logged, and published on the event bus) only once per
+        camera and kind.
+
+        Args:
+            - estimates: List of CommandEstimate objects, sorted by execution time (see transitions.estimate_plan)
+            - profiles: Dictionary with the camera names as keys and CameraProfile objects as values (None for the
+                        default profiles).  The profiles are copied, as they are updated from the readings
+            - time_shift: Shift of the timeline of the scheduler w.r.t. the reference moments (when simulating)
+            - samples: Readings of the status of the cameras, as CameraStatusSampled events
+        """
+
+        self.estimates = estimates
+        self.profiles = copy.deepcopy(profiles) if profiles else {}
+        self.time_shift = time_shift
+
+        # Camera name -> (time of the first reading [UTC, timeline of the reference moments], free space [GB])
+
+        self.first_readings: dict = {}
+
+        # Camera name -> list of StoragePoint objects, for the commands that have not been executed yet
+
+        self.forecast: dict = {}
+        self.reported: set = set()
+        self.lock = threading.Lock()
+
+        for sample in samples:
+            self.update(sample)
+
+        with self.lock:
+            self.forecast = forecast_storage(estimates, self.profiles, datetime.now(pytz.utc) + time_shift)
+            self.__report(find_shortages(self.forecast, self.profiles))
+
+        self.subscription = get_event_bus().subscribe(CameraStatusSampled, self.update)
+
+    def update(self, sample: CameraStatusSampled):
+        """ Update the storage profile of the camera from the given reading, and the forecast for that camera.
+
+        Args:
+            - sample: Reading of the status of a camera
+        """
+
+        if sample.free_space is None:
+            return
+
+        camera_name = sample.camera_name
+        now = sample.time + self.time_shift
+
+        with self.lock:
+            profile = self.profiles.setdefault(camera_name, CameraProfile())
+            first_time, first_free_space = self.first_readings.setdefault(camera_name, (now, sample.free_space))
+
+            # Average size of an image, from the space used by the images that should have been taken since then
+
+            used_space = first_free_space - sample.free_space
+            if used_space >= MIN_MEASURED_SPACE:
+                images = sum(count_images(estimate.command, profile) for estimate in self.estimates
+                             if first_time <= estimate.execution_time < now
+                             and estimate.command.get_camera_name() == camera_name)
+                if images:
+                    profile.file_size = used_space * MB_PER_GB / images
+
+            profile.free_space = sample.free_space
+
+            estimates = [estimate for estimate in self.estimates if estimate.command.get_camera_name() == camera_name]
+            self.forecast.update(forecast_storage(estimates, self.profiles, now))
+            self.__report(find_shortages({camera_name: self.forecast.get(camera_name, [])}, self.profiles))
+
+    def stop(self):
+        """ Stop updating the forecast. """
+
+        get_event_bus().unsubscribe(self.subscription)
+
+    def __report(self, shortages: list):
+        """ Log and publish the given shortages that have not been reported yet.
+
+        Args:
+            - shortages: List of StorageShortage objects
+        """
+
+        for shortage in shortages:
+            if (shortage.camera_name, shortage.kind) in self.reported:
+                continue
+
+            self.reported.add((shortage.camera_name, shortage.kind))
+            LOGGER.warning(shortage.message)
+            get_event_bus().publish(StorageShortageForecast(
+                shortage.camera_name, shortage.kind.value, str(shortage.point.command),
+                shortage.point.time - self.time_shift, shortage.message))
+
+
+def read_profiles(filename: Union[str, Path]) -> dict:
+    """ Read the storage profiles of the cameras from the given JSON file.
+
+    The file contains the profile per camera name, e.g. {"Canon EOS R": {"free_space": 58.2, "file_size": 31,
+    "buffer_images": 47, "write_speed": 90, "burst_rate": 8}}.  Missing values get their default.
+
+    Args:
+        - filename: Name of the JSON file
+
+    Returns: Dictionary with the camera names as keys and CameraProfile objects as values.
+    """
+
+    return {camera_name: CameraProfile(**profile)
+            for camera_name, profile in json.loads(Path(filename).read_text()).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast the free space on the memory cards and the occupancy of "
+                                                 "the camera buffers during a script")
+    parser.add_argument("script", help="script to forecast")
+    parser.add_argument(
+        "-d",
+        "--date",
+        help="date of the solar eclipse (in YYYY-MM-DD format)",
+        required=True
+    )
+    parser.add_argument(
+        "-lon",
+        "--longitude",
+        help="longitude of the location where to watch the solar eclipse (W is negative)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "-lat",
+        "--latitude",
+        help="latitude of the location where to watch the solar eclipse (N is positive)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "-alt",
+        "--altitude",
+        help="altitude of the location where to watch the solar eclipse (in meters)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "--profiles",
+        help="JSON file with the storage profile per camera (see read_profiles)",
+        default=None
+    )
+    parser.add_argument(
+        "--costs",
+        help="JSON file with the time the steps of the camera commands take (see transitions.py)",
+        default=None
+    )
+    parser.add_argument(
+        "-t",
+        "--timeline",
+        help="show the forecast after every camera command",
+        default=False,
+        action='store_true'
+    )
+
+    args = parser.parse_args()
+
+    from astropy.time import Time
+    from solareclipseworkbench.reference_moments import calculate_reference_moments
+
+    reference_moments, _, _ = calculate_reference_moments(args.longitude, args.latitude, args.altitude,
+                                                          Time(args.date))
+
+    model = read_cost_model(args.costs) if args.costs else TransitionCostModel()
+    profiles = read_profiles(args.profiles) if args.profiles else {}
+
+    estimates = estimate_plan(compile_script(args.script, reference_moments, []), reference_moments, model)
+    forecast = forecast_storage(estimates, profiles)
+
+    for camera_name, points in forecast.items():
+        if args.timeline:
+            for point in points:
+                print(f"{camera_name}: {point}")
+
+        profile = profiles.get(camera_name) or CameraProfile()
+        images = sum(point.images for point in points)
+        card_free = f"{points[-1].card_free:.1f}GB" if points[-1].card_free is not None else "unknown"
+        print(f"{camera_name}: {images} image(s) ({images * profile.file_size / MB_PER_GB:.1f}GB), {card_free} free "
+              f"at the end, at most {max(point.buffer_images for point in points):.0f} of {profile.buffer_images} "
+              f"image(s) in the buffer")
+
+    shortages = find_shortages(forecast, profiles)
+    for shortage in shortages:
+        print(shortage)
+
+    return 1 if any(shortage.kind == ShortageKind.CARD for shortage in shortages) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
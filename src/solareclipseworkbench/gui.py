@@ -4,6 +4,9 @@
     - View: SolarEclipseView
     - Controller: SolarEclipseController
 """
+# Imported first, so the imports below are included in the startup profile (if requested)
+from solareclipseworkbench import startup
+
 import argparse
 import datetime
 import logging
@@ -12,29 +15,34 @@ import sys
 import time
 from enum import Enum
 from pathlib import Path
-from typing import Union
+from functools import partial
+from typing import Callable, Union, TYPE_CHECKING
 
-import geopandas
-import pandas as pd
+import numpy as np
 import pytz
 from PyQt6.QtCore import QTimer, QRect, Qt, QAbstractTableModel, QModelIndex, QSettings
 from PyQt6.QtGui import QIcon, QAction, QDoubleValidator, QIntValidator, QCloseEvent
 from PyQt6.QtWidgets import QMainWindow, QApplication, QWidget, QFrame, QLabel, QHBoxLayout, QVBoxLayout, QGridLayout, \
-    QGroupBox, QComboBox, QPushButton, QLineEdit, QFileDialog, QScrollArea, QTableView
-from apscheduler.job import Job
+    QGroupBox, QComboBox, QPushButton, QLineEdit, QFileDialog, QScrollArea, QTableView, QProgressBar, QCheckBox
 from apscheduler.schedulers import SchedulerNotRunningError
-from apscheduler.schedulers.background import BackgroundScheduler
-from astropy.time import Time
-from geodatasets import get_path
 from gphoto2 import GPhoto2Error, Camera
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-from timezonefinder import TimezoneFinder
 
-from solareclipseworkbench.camera import get_camera_dict, get_battery_level, get_free_space, get_space, \
-    get_shooting_mode, get_focus_mode, set_time, CameraSettings
+from solareclipseworkbench.audio import get_audio_engine
+from solareclipseworkbench.camera import get_camera_dict, get_shooting_mode, get_focus_mode, sync_camera_times, \
+    sample_camera_status
+from solareclipseworkbench.dispatcher import Dispatcher
+from solareclipseworkbench.events import get_event_bus, CameraStatusSampled, CameraStateChanged, \
+    RecoveryActionTaken
+from solareclipseworkbench.logs import configure_logging
+from solareclipseworkbench.merge import ScriptSource
 from solareclipseworkbench.observer import Observer, Observable
-from solareclipseworkbench.reference_moments import calculate_reference_moments, ReferenceMomentInfo
+from solareclipseworkbench.camera_workers import CameraWorkerPool
+from solareclipseworkbench.tasks import TaskRunner, GuiInvoker
+from solareclipseworkbench.tracing import TRACE_OPTION, start_tracing, export_trace
+from solareclipseworkbench.watchdog import CameraState
+
+if TYPE_CHECKING:
+    from solareclipseworkbench.reference_moments import ReferenceMomentInfo
 
 ICON_PATH = Path(__file__).parent.resolve() / ".." / ".." / "img"
 
@@ -55,6 +63,16 @@ BEFORE_AFTER = {
 
 REFERENCE_MOMENTS = ["C1", "C2", "MAX", "C3", "C4", "sunset", "sunrise"]
 
+JOBS_VIEW_MODES = ["All jobs", "Upcoming jobs"]
+DEFAULT_JOBS_WINDOW = (5, 20)     # Number of executed and pending jobs in the upcoming jobs view
+ALL_CAMERAS = "All cameras"
+
+# Keys of the background tasks
+
+REFERENCE_MOMENTS_TASK = "Reference moments"
+CAMERA_TASK = "Camera(s)"
+SCRIPT_TASK = "Script"
+
 LOGGER = logging.getLogger("Solar Eclipse Workbench UI")
 
 
@@ -71,7 +89,8 @@ class SolarEclipseModel:
             - The current time (local time + UTC);
             - The information of the reference moments (C1, C2, maximum eclipse, C3, C4, sunrise, and sunset) of the
               solar eclipse: time (local time + UTC), azimuth, and altitude;
-            - A dictionary with the connected cameras.
+            - A dictionary with the connected cameras;
+            - The result of the latest clock synchronisation of the connected cameras.
         """
 
         # Location
@@ -84,7 +103,7 @@ class SolarEclipseModel:
         # Eclipse date
 
         self.is_eclipse_date_set = False
-        self.eclipse_date: Union[Time, None] = None
+        self.eclipse_date: Union[datetime.datetime, None] = None
 
         # Time
 
@@ -95,17 +114,18 @@ class SolarEclipseModel:
 
         self.reference_moments: Union[dict, None] = None
 
-        self.c1_info: Union[ReferenceMomentInfo, None] = None
-        self.c2_info: Union[ReferenceMomentInfo, None] = None
-        self.max_info: Union[ReferenceMomentInfo, None] = None
-        self.c3_info: Union[ReferenceMomentInfo, None] = None
-        self.c4_info: Union[ReferenceMomentInfo, None] = None
-        self.sunrise_info: Union[ReferenceMomentInfo, None] = None
-        self.sunset_info: Union[ReferenceMomentInfo, None] = None
+        self.c1_info: Union["ReferenceMomentInfo", None] = None
+        self.c2_info: Union["ReferenceMomentInfo", None] = None
+        self.max_info: Union["ReferenceMomentInfo", None] = None
+        self.c3_info: Union["ReferenceMomentInfo", None] = None
+        self.c4_info: Union["ReferenceMomentInfo", None] = None
+        self.sunrise_info: Union["ReferenceMomentInfo", None] = None
+        self.sunset_info: Union["ReferenceMomentInfo", None] = None
 
         # Camera(s)
 
         self.camera_overview: CameraOverviewTableModel = CameraOverviewTableModel()
+        self.clock_sync_results: dict = {}
 
     def set_position(self, longitude: float, latitude: float, altitude: float):
         """ Set the geographical position of the observing location.
@@ -122,7 +142,7 @@ class SolarEclipseModel:
 
         self.is_location_set = True
 
-    def set_eclipse_date(self, eclipse_date: Time):
+    def set_eclipse_date(self, eclipse_date: datetime.datetime):
         """ Set the eclipse date.
 
         Args:
@@ -133,6 +153,14 @@ class SolarEclipseModel:
 
         self.is_eclipse_date_set = True
 
+    def get_reference_moment_inputs(self) -> tuple:
+        """ Returns the input for the calculation of the reference moments.
+
+        Returns: Tuple with the longitude [degrees], latitude [degrees], altitude [meters], and date of the eclipse.
+        """
+
+        return self.longitude, self.latitude, self.altitude, self.eclipse_date
+
     def get_reference_moments(self):
         """ Calculate and return timing of reference moments, eclipse magnitude, and eclipse type.
 
@@ -143,8 +171,28 @@ class SolarEclipseModel:
             - Eclipse type (total / annular / partial / no eclipse)
         """
 
-        self.reference_moments, magnitude, eclipse_type = calculate_reference_moments(self.longitude, self.latitude,
-                                                                                      self.altitude, self.eclipse_date)
+        reference_moments, magnitude, eclipse_type = \
+            calculate_reference_moments_for_date(*self.get_reference_moment_inputs())
+
+        return self.set_reference_moments(reference_moments, magnitude, eclipse_type)
+
+    def set_reference_moments(self, reference_moments: dict, magnitude: float, eclipse_type: str):
+        """ Set the timing of the reference moments, eclipse magnitude, and eclipse type.
+
+        Args:
+            - reference_moments: Dictionary with the information about the reference moments (C1, C2, maximum eclipse,
+                                 C3, C4, sunrise, and sunset)
+            - magnitude: Magnitude of the eclipse (0: no eclipse, 1: total eclipse)
+            - eclipse_type: Eclipse type (total / annular / partial / no eclipse)
+
+        Returns:
+            - Dictionary with the information about the reference moments (C1, C2, maximum eclipse, C3, C4, sunrise,
+              and sunset)
+            - Magnitude of the eclipse (0: no eclipse, 1: total eclipse)
+            - Eclipse type (total / annular / partial / no eclipse)
+        """
+
+        self.reference_moments = reference_moments
 
         # No eclipse
 
@@ -187,13 +235,44 @@ class SolarEclipseModel:
     #
     #     self.camera_overview = camera_overview
 
+    def refresh_cameras(self, progress: Callable = None) -> list:
+        """ Read the camera overview, synchronise the camera clocks, and check the camera state.
+
+        This does not touch the UI, so it can be executed in a background task.
+
+        Args:
+            - progress: Function that is called before each step, with the fraction that has been done and a description
+                        of the step
+
+        Returns: Rows of the camera overview, to show with CameraOverviewTableModel.show_camera_overview.
+        """
+
+        progress = progress or (lambda fraction, message: None)
+
+        progress(0.0, "Reading the camera overview")
+        data = self.camera_overview.read_camera_overview()
+
+        progress(0.4, "Synchronising the camera clocks")
+        self.sync_camera_time()
+
+        progress(0.8, "Checking the camera state")
+        self.check_camera_state()
+
+        return data
+
     def sync_camera_time(self):
-        """ Set the time of all connected cameras to the time of the computer."""
+        """ Set the time of all connected cameras to the time of the computer.
 
-        for camera_name, camera in self.camera_overview.camera_overview_dict.items():
+        The clocks of all cameras are synchronised in parallel.  For each camera, the clock offset is measured before
+        and after setting the time, and the drift since the previous synchronisation is estimated.
 
-            logging.info(f"Syncing time for camera {camera_name}")
-            set_time(camera)
+        Returns: Dictionary with the camera names as keys and the ClockSyncResult as values.
+        """
+
+        logging.info(f"Syncing time for camera(s) {', '.join(self.camera_overview.camera_overview_dict)}")
+        self.clock_sync_results.update(sync_camera_times(self.camera_overview.camera_overview_dict))
+
+        return self.clock_sync_results
 
     def check_camera_state(self):
         """ Check whether the focus mode and shooting mode of all connected cameras is set to 'Manual'.
@@ -273,6 +352,8 @@ class SolarEclipseView(QMainWindow, Observable):
         self.simulator_action = QAction("Simulator", self)
         self.file_action = QAction("File", self)
         self.shutdown_scheduler_action = QAction("Stop", self)
+        self.jobs_view_action = QAction("Jobs view", self)
+        self.scripts_action = QAction("Scripts", self)
         self.datetime_format_action = QAction("Datetime format", self)
         self.save_action = QAction("Save", self)
 
@@ -335,6 +416,11 @@ class SolarEclipseView(QMainWindow, Observable):
 
         self.jobs_table = QJobsTableView()
 
+        # Progress of the background tasks (in the status bar)
+
+        self.task_progress = QProgressBar()
+        self.cancel_task_button = QPushButton("Cancel")
+
         self.init_ui()
 
     def save_settings(self):
@@ -493,6 +579,8 @@ class SolarEclipseView(QMainWindow, Observable):
 
         self.setCentralWidget(app_frame)
 
+        self.add_task_progress()
+
     def add_toolbar(self):
         """ Create the toolbar of the UI.
 
@@ -506,6 +594,7 @@ class SolarEclipseView(QMainWindow, Observable):
               computer they are connected to;
             - Loading the configuration file to schedule the tasks (voice prompts, taking pictures, updating the camera
               state);
+            - Bringing up a pop-up window in which you can choose which of the scheduled jobs are shown;
             - Bringing up a pop-up window in which you can choose the time and date format.
         """
 
@@ -559,6 +648,18 @@ class SolarEclipseView(QMainWindow, Observable):
         self.shutdown_scheduler_action.triggered.connect(self.on_toolbar_button_click)
         self.toolbar.addAction(self.shutdown_scheduler_action)
 
+        # Jobs view
+
+        self.jobs_view_action.setStatusTip("Choose which scheduled jobs are shown")
+        self.jobs_view_action.triggered.connect(self.on_toolbar_button_click)
+        self.toolbar.addAction(self.jobs_view_action)
+
+        # Scripts
+
+        self.scripts_action.setStatusTip("Choose which of the loaded scripts are scheduled")
+        self.scripts_action.triggered.connect(self.on_toolbar_button_click)
+        self.toolbar.addAction(self.scripts_action)
+
         # Date & time format
 
         self.datetime_format_action.setStatusTip("Datetime format")
@@ -573,6 +674,43 @@ class SolarEclipseView(QMainWindow, Observable):
         self.save_action.triggered.connect(self.on_toolbar_button_click)
         self.toolbar.addAction(self.save_action)
 
+    def add_task_progress(self):
+        """ Add the progress bar for the background tasks, with a button to cancel them, to the status bar.
+
+        Both are hidden when no background tasks are running.
+        """
+
+        self.task_progress.setRange(0, 100)
+        self.task_progress.setMaximumWidth(200)
+        self.task_progress.hide()
+        self.statusBar().addPermanentWidget(self.task_progress)
+
+        self.cancel_task_button.setStatusTip("Cancel the background tasks")
+        self.cancel_task_button.clicked.connect(self.on_toolbar_button_click)
+        self.cancel_task_button.hide()
+        self.statusBar().addPermanentWidget(self.cancel_task_button)
+
+    def show_task_progress(self, key: str, fraction: float, message: str):
+        """ Show the progress of a background task in the status bar.
+
+        Args:
+            - key: Key of the background task
+            - fraction: Fraction of the task that has been done [0, 1]
+            - message: Description of the current step
+        """
+
+        self.task_progress.setValue(int(fraction * 100))
+        self.task_progress.show()
+        self.cancel_task_button.show()
+        self.statusBar().showMessage(f"{key}: {message}" if message else key)
+
+    def hide_task_progress(self):
+        """ Hide the progress of the background tasks, as none are running. """
+
+        self.task_progress.hide()
+        self.cancel_task_button.hide()
+        self.statusBar().clearMessage()
+
     def on_toolbar_button_click(self):
         """ Action triggered when a toolbar button is clicked."""
 
@@ -657,7 +795,7 @@ class SolarEclipseView(QMainWindow, Observable):
         # First contact
 
         if "C1" in reference_moments:
-            c1_info: ReferenceMomentInfo = reference_moments["C1"]
+            c1_info: "ReferenceMomentInfo" = reference_moments["C1"]
             self.c1_time_utc_label.setText(format_time(c1_info.time_utc, self.time_format))
             self.c1_time_local_label.setText(format_time(c1_info.time_local, self.time_format))
             self.c1_azimuth_label.setText(str(int(c1_info.azimuth)))
@@ -671,7 +809,7 @@ class SolarEclipseView(QMainWindow, Observable):
         # Second contact
 
         if "C2" in reference_moments:
-            c2_info: ReferenceMomentInfo = reference_moments["C2"]
+            c2_info: "ReferenceMomentInfo" = reference_moments["C2"]
             self.c2_time_utc_label.setText(format_time(c2_info.time_utc, self.time_format))
             self.c2_time_local_label.setText(format_time(c2_info.time_local, self.time_format))
             self.c2_azimuth_label.setText(str(int(c2_info.azimuth)))
@@ -685,7 +823,7 @@ class SolarEclipseView(QMainWindow, Observable):
         # Maximum eclipse
 
         if "MAX" in reference_moments:
-            max_info: ReferenceMomentInfo = reference_moments["MAX"]
+            max_info: "ReferenceMomentInfo" = reference_moments["MAX"]
             self.max_time_utc_label.setText(format_time(max_info.time_utc, self.time_format))
             self.max_time_local_label.setText(format_time(max_info.time_local, self.time_format))
             self.max_azimuth_label.setText(str(int(max_info.azimuth)))
@@ -699,7 +837,7 @@ class SolarEclipseView(QMainWindow, Observable):
         # Third contact
 
         if "C3" in reference_moments:
-            c3_info: ReferenceMomentInfo = reference_moments["C3"]
+            c3_info: "ReferenceMomentInfo" = reference_moments["C3"]
             self.c3_time_utc_label.setText(format_time(c3_info.time_utc, self.time_format))
             self.c3_time_local_label.setText(format_time(c3_info.time_local, self.time_format))
             self.c3_azimuth_label.setText(str(int(c3_info.azimuth)))
@@ -713,7 +851,7 @@ class SolarEclipseView(QMainWindow, Observable):
         # Fourth contact
 
         if "C4" in reference_moments:
-            c4_info: ReferenceMomentInfo = reference_moments["C4"]
+            c4_info: "ReferenceMomentInfo" = reference_moments["C4"]
             self.c4_time_utc_label.setText(format_time(c4_info.time_utc, self.time_format))
             self.c4_time_local_label.setText(format_time(c4_info.time_local, self.time_format))
             self.c4_azimuth_label.setText(str(int(c4_info.azimuth)))
@@ -726,13 +864,13 @@ class SolarEclipseView(QMainWindow, Observable):
 
         # Sunrise
 
-        sunrise_info: ReferenceMomentInfo = reference_moments["sunrise"]
+        sunrise_info: "ReferenceMomentInfo" = reference_moments["sunrise"]
         self.sunrise_time_utc_label.setText(format_time(sunrise_info.time_utc, self.time_format))
         self.sunrise_time_local_label.setText(format_time(sunrise_info.time_local, self.time_format))
 
         # Sunset
 
-        sunset_info: ReferenceMomentInfo = reference_moments["sunset"]
+        sunset_info: "ReferenceMomentInfo" = reference_moments["sunset"]
         self.sunset_time_utc_label.setText(format_time(sunset_info.time_utc, self.time_format))
         self.sunset_time_local_label.setText(format_time(sunset_info.time_local, self.time_format))
 
@@ -749,13 +887,16 @@ class SolarEclipseView(QMainWindow, Observable):
 class SolarEclipseController(Observer):
     """ Controller for the Solar Eclipse Workbench UI in the MVC pattern. """
 
-    def __init__(self, model: SolarEclipseModel, view: SolarEclipseView, is_simulator: bool):
+    def __init__(self, model: SolarEclipseModel, view: SolarEclipseView, is_simulator: bool,
+                 use_camera_workers: bool = False):
         """ Initialisation of the controller of the Solar Eclipse Workbench UI.
 
         Args:
             - model: Model for the Solar Eclipse Workbench UI
             - view: View for the Solar Eclipse Workbench UI
             - is_simulator: Indicates whether the UI should be started in simulator mode
+            - use_camera_workers: Indicates whether the camera commands should be executed in a separate worker process
+                                  per camera
         """
 
         self.model = model
@@ -769,8 +910,9 @@ class SolarEclipseController(Observer):
         self.view.add_observer(self)
 
         self.is_simulator: bool = is_simulator
+        self.use_camera_workers: bool = use_camera_workers
 
-        self.scheduler: Union[BackgroundScheduler, None] = None
+        self.scheduler: Union[Dispatcher, None] = None
         self.sim_reference_moment: Union[str, None] = None
         self.sim_offset_minutes: Union[int, None] = None
 
@@ -778,6 +920,34 @@ class SolarEclipseController(Observer):
         self.eclipse_popup: Union[EclipsePopup, None] = None
         self.simulator_popup: Union[SimulatorPopup, None] = None
         self.settings_popup: Union[SettingsPopup, None] = None
+        self.jobs_view_popup: Union[JobsViewPopup, None] = None
+        self.scripts_popup: Union[ScriptsPopup, None] = None
+
+        # Scripts that have been loaded (merged into a single plan), each of which can be enabled or disabled
+
+        self.script_sources: list = []
+
+        # Which scheduled jobs are shown: window with the number of executed and pending jobs (None for all jobs), and
+        # the camera of which the jobs are shown (None for all cameras)
+
+        self.jobs_window: Union[tuple, None] = None
+        self.jobs_camera_filter: Union[str, None] = None
+
+        # Background tasks (reference moments, camera refresh, and script loading), so the UI does not freeze
+
+        self.tasks = TaskRunner()
+        self.tasks.progress.connect(self.view.show_task_progress)
+        self.tasks.idle.connect(self.view.hide_task_progress)
+
+        # Events of the scheduler threads (camera status, watchdog), handled in the GUI thread
+
+        self.gui_invoker = GuiInvoker()
+        event_bus = get_event_bus()
+        self.subscriptions = [
+            event_bus.subscribe(CameraStatusSampled, self.model.camera_overview.show_camera_status, self.gui_invoker),
+            event_bus.subscribe(CameraStateChanged, self.show_camera_state, self.gui_invoker),
+            event_bus.subscribe(RecoveryActionTaken, self.show_recovery_action, self.gui_invoker)
+        ]
 
         self.time_display_timer = QTimer()
         self.time_display_timer.timeout.connect(self.update_time)
@@ -808,11 +978,29 @@ class SolarEclipseController(Observer):
 
         self.update_jobs_countdown()
 
+    def show_camera_state(self, event: CameraStateChanged):
+        """ Show the new state of a camera, as determined by the watchdog of the scheduler.
+
+        Args:
+            - event: Change of the state of a camera
+        """
+
+        self.model.camera_overview.update_camera_states({event.camera_name: event.state})
+
+    def show_recovery_action(self, event: RecoveryActionTaken):
+        """ Show the latest action of the watchdog of the scheduler in the status bar.
+
+        Args:
+            - event: Action that was taken by the watchdog
+        """
+
+        self.view.statusBar().showMessage(f"Watchdog: {event.action}")
+
     def update_jobs_countdown(self):
         """ Update the countdown of the scheduled jobs. """
 
         if self.jobs_model:
-            self.jobs_model.update_countdown()
+            self.jobs_model.update_countdown(*self.view.jobs_table.get_visible_rows())
 
     def do(self, actions):
         pass
@@ -826,6 +1014,7 @@ class SolarEclipseController(Observer):
             - Change in date at which the solar eclipse will be observed;
             - Change in simulation starting time (only when the UI was started in simulation mode);
             - Change in date and/or time format;
+            - Change in the loaded scripts that are scheduled;
             - Closure of the UI window;
             - One of the buttons in the toolbar of the view is clicked.
 
@@ -843,14 +1032,17 @@ class SolarEclipseController(Observer):
             self.view.longitude_label.setText(str(longitude))
             self.view.latitude_label.setText(str(latitude))
             self.view.altitude_label.setText(str(altitude))
+
+            self.tasks.cancel(REFERENCE_MOMENTS_TASK)
             return
 
         elif isinstance(changed_object, EclipsePopup):
             eclipse_date = changed_object.eclipse_combobox.currentText()
-            self.model.set_eclipse_date(
-                Time(datetime.datetime.strptime(eclipse_date, DATE_FORMATS[self.view.date_format])))
+            self.model.set_eclipse_date(datetime.datetime.strptime(eclipse_date, DATE_FORMATS[self.view.date_format]))
 
             self.view.eclipse_date.setText(changed_object.eclipse_combobox.currentText())
+
+            self.tasks.cancel(REFERENCE_MOMENTS_TASK)
             return
 
         elif isinstance(changed_object, SimulatorPopup):
@@ -859,6 +1051,31 @@ class SolarEclipseController(Observer):
                                        * BEFORE_AFTER[changed_object.before_after_combobox.currentText()])
             return
 
+        elif isinstance(changed_object, JobsViewPopup):
+            if changed_object.mode_combobox.currentText() == JOBS_VIEW_MODES[1]:
+                self.jobs_window = (int(changed_object.num_executed.text() or 0),
+                                    int(changed_object.num_pending.text() or 0))
+            else:
+                self.jobs_window = None
+
+            camera_filter = changed_object.camera_combobox.currentText()
+            self.jobs_camera_filter = None if camera_filter == ALL_CAMERAS else camera_filter
+
+            if self.jobs_model:
+                self.jobs_model.set_view(self.jobs_window, self.jobs_camera_filter)
+            return
+
+        elif isinstance(changed_object, ScriptsPopup):
+            for source, checkbox in zip(self.script_sources, changed_object.checkboxes):
+                source.enabled = checkbox.isChecked()
+
+            # Only the scripts that have changed since they were loaded are compiled again
+
+            if self.model.reference_moments and any(source.enabled for source in self.script_sources):
+                self.stop_scheduler()
+                self.load_script(self.script_sources)
+            return
+
         elif isinstance(changed_object, SettingsPopup):
             date_format = changed_object.date_combobox.currentText()
             self.view.date_format = date_format
@@ -900,6 +1117,12 @@ class SolarEclipseController(Observer):
 
         elif isinstance(changed_object, QCloseEvent):
 
+            self.tasks.cancel()
+            self.tasks.wait(timeout=5)
+
+            if self.scheduler and self.scheduler.worker_pool:
+                self.scheduler.worker_pool.shutdown()
+
             if self.model.camera_overview.camera_overview_dict:
                 cameras = self.model.camera_overview.camera_overview_dict.values()
 
@@ -921,50 +1144,39 @@ class SolarEclipseController(Observer):
 
         elif text == "Reference moments":
             if self.model.is_location_set and self.model.is_eclipse_date_set:
-                reference_moments, magnitude, eclipse_type = self.model.get_reference_moments()
-                self.view.show_reference_moments(reference_moments, magnitude, eclipse_type)
+                self.set_reference_moments()
 
         elif text == "Camera(s)":
-            self.model.camera_overview.update_camera_overview()
-            self.sync_camera_time()
-            self.check_camera_state()
+            self.tasks.submit(CAMERA_TASK, self.model.refresh_cameras, self.model.camera_overview.show_camera_overview)
 
         elif text == "Simulator":
             self.simulator_popup = SimulatorPopup(self)
             self.simulator_popup.show()
 
         elif text == "File":
-            filename, _ = QFileDialog.getOpenFileName(None, "QFileDialog.getOpenFileName()", "",
-                                                      "All Files (*);;Python Files (*.py);;Text Files (*.txt)")
-
-            if self.model.reference_moments and os.path.exists(filename):
-                try:
-                    from solareclipseworkbench.utils import observe_solar_eclipse
-                    self.scheduler: BackgroundScheduler \
-                        = observe_solar_eclipse(self.model.reference_moments, filename,
-                                                self.model.camera_overview.camera_overview_dict, self,
-                                                self.sim_reference_moment, self.sim_offset_minutes)
+            # Multiple scripts (e.g. one per camera, and one with the voice prompts) are merged into a single plan
+            filenames, _ = QFileDialog.getOpenFileNames(None, "QFileDialog.getOpenFileNames()", "",
+                                                        "All Files (*);;Python Files (*.py);;Text Files (*.txt)")
+            filenames = [filename for filename in filenames if os.path.exists(filename)]
 
-                    self.jobs_model = JobsTableModel(self.scheduler, self)
-                    self.view.jobs_table.setModel(self.jobs_model)
-                    self.jobs_model.add_observer(self.view.jobs_table)
-                    self.view.jobs_table.resizeColumnsToContents()
+            if self.model.reference_moments and filenames:
+                self.script_sources = [ScriptSource(filename) for filename in filenames]
+                self.load_script(self.script_sources)
 
-                    self.view.camera_action.setDisabled(True)
+        elif text == "Scripts":
+            if self.script_sources:
+                self.scripts_popup = ScriptsPopup(self)
+                self.scripts_popup.show()
 
-                except IndexError:
-                    LOGGER.warning(f"File {filename} does not contain scheduled jobs")
+        elif text == "Cancel":
+            self.tasks.cancel()
 
         elif text == "Stop":
-            try:
-                if self.scheduler:
-                    self.scheduler.shutdown()
-                    self.jobs_model.clear_jobs_overview()
+            self.stop_scheduler()
 
-                    self.view.camera_action.setEnabled(True)
-            except SchedulerNotRunningError:
-                # Scheduler not running
-                pass
+        elif text == "Jobs view":
+            self.jobs_view_popup = JobsViewPopup(self)
+            self.jobs_view_popup.show()
 
         elif text == "Datetime format":
             self.settings_popup = SettingsPopup(self)
@@ -1072,24 +1284,116 @@ class SolarEclipseController(Observer):
         if eclipse_date:
 
             if date_format:
-                dt = datetime.datetime.strptime(eclipse_date, DATE_FORMATS[date_format])
-                date = datetime.datetime.strftime(dt, "%Y-%m-%d")
+                date = datetime.datetime.strptime(eclipse_date, DATE_FORMATS[date_format])
                 self.view.eclipse_date.setText(eclipse_date)
             else:
                 date = datetime.datetime.strptime(eclipse_date, "%Y-%m-%d")
                 self.view.eclipse_date.setText(date.strftime(DATE_FORMATS[self.view.date_format]))
 
-            self.model.set_eclipse_date(Time(date))
+            self.model.set_eclipse_date(date)
             return True
 
         return False
 
     def set_reference_moments(self):
-        """ Set the reference moments of the eclipse in the model and the view."""
+        """ Calculate the reference moments of the eclipse in a background task.
+
+        When the calculation has finished, the reference moments are set in the model and the view (see
+        show_reference_moments).
+        """
+
+        inputs = self.model.get_reference_moment_inputs()
+
+        self.tasks.submit(REFERENCE_MOMENTS_TASK, calculate_reference_moments_for_date,
+                          partial(self.show_reference_moments, inputs), args=inputs)
+
+    def show_reference_moments(self, inputs: tuple, result: tuple):
+        """ Set the calculated reference moments of the eclipse in the model and the view.
+
+        The result is discarded if the location or the eclipse date has changed during the calculation.
 
-        reference_moments, magnitude, eclipse_type = self.model.get_reference_moments()
+        Args:
+            - inputs: Location and eclipse date for which the reference moments were calculated
+            - result: Reference moments, magnitude, and type of the eclipse
+        """
+
+        if inputs != self.model.get_reference_moment_inputs():
+            LOGGER.info("The location or eclipse date has changed: the calculated reference moments are discarded")
+            return
+
+        reference_moments, magnitude, eclipse_type = self.model.set_reference_moments(*result)
         self.view.show_reference_moments(reference_moments, magnitude, eclipse_type)
 
+    def load_script(self, filename: Union[str, list]):
+        """ Schedule the commands in the given script(s) in a background task.
+
+        When the script has been loaded, the scheduled jobs are shown (see show_jobs).
+
+        Args:
+            - filename: Name of the script, or list of ScriptSource objects (of which the enabled ones are merged into a
+                        single plan)
+        """
+
+        from solareclipseworkbench.utils import observe_solar_eclipse
+
+        name = filename if isinstance(filename, str) else \
+            ", ".join(str(source) for source in filename if source.enabled)
+
+        self.tasks.submit(SCRIPT_TASK, observe_solar_eclipse, self.show_jobs,
+                          on_failed=partial(self.report_script_error, name),
+                          on_discarded=lambda scheduler: scheduler.shutdown(wait=False),
+                          args=(self.model.reference_moments, filename,
+                                self.model.camera_overview.camera_overview_dict, self, self.sim_reference_moment,
+                                self.sim_offset_minutes),
+                          kwargs={"use_camera_workers": self.use_camera_workers})
+
+    def stop_scheduler(self):
+        """ Shut down the scheduler (if any), and clear the overview of the scheduled jobs. """
+
+        try:
+            if self.scheduler:
+                self.scheduler.shutdown()
+                self.jobs_model.clear_jobs_overview()
+                get_audio_engine().report_latencies()
+
+                self.view.camera_action.setEnabled(True)
+        except SchedulerNotRunningError:
+            # Scheduler not running
+            pass
+
+    def show_jobs(self, scheduler: Dispatcher):
+        """ Show the jobs of the given scheduler, which has been started for the loaded script.
+
+        Args:
+            - scheduler: Scheduler with the jobs of the loaded script
+        """
+
+        self.scheduler = scheduler
+        if self.scheduler.watchdog:
+            self.model.camera_overview.update_camera_states(self.scheduler.watchdog.states)
+
+        self.jobs_model = JobsTableModel(self.scheduler, self)
+        self.jobs_model.set_view(self.jobs_window, self.jobs_camera_filter)
+        self.view.jobs_table.setModel(self.jobs_model)
+        self.jobs_model.add_observer(self.view.jobs_table)
+        self.view.jobs_table.resizeColumnsToContents()
+
+        self.view.camera_action.setDisabled(True)
+
+    @staticmethod
+    def report_script_error(filename: str, exc: Exception):
+        """ Log why the given script could not be loaded.
+
+        Args:
+            - filename: Name of the script (or names of the scripts)
+            - exc: Exception that was raised while loading the script
+        """
+
+        if isinstance(exc, IndexError):
+            LOGGER.warning(f"File {filename} does not contain scheduled jobs")
+        else:
+            LOGGER.error(f"File {filename} could not be loaded: {exc}")
+
 
 class LocationPopup(QWidget, Observable):
     def __init__(self, observer: SolarEclipseController):
@@ -1158,6 +1462,7 @@ class LocationPopup(QWidget, Observable):
         plot_button.setFixedWidth(100)
         layout.addWidget(plot_button)
 
+        from solareclipseworkbench.world_map import LocationPlot
         self.location_plot = LocationPlot()
         layout.addWidget(self.location_plot)
 
@@ -1373,58 +1678,147 @@ class SettingsPopup(QWidget, Observable):
         self.close()
 
 
-class LocationPlot(FigureCanvas):
-    """ Display the world with the selected location marked with a red dot."""
+class JobsViewPopup(QWidget, Observable):
 
-    def __init__(self, parent=None, dpi=100):
-        """ Plot a world map."""
+    def __init__(self, observer: SolarEclipseController):
+        """ A pop-up window is shown, in which the user can choose which of the scheduled jobs are shown.
 
-        self.figure = Figure(dpi=dpi)
-        self.ax = self.figure.add_subplot(111, aspect='equal')
+        Either all jobs are shown, or only the upcoming jobs (with a number of jobs that have just been executed).  The
+        jobs can be filtered on a camera as well.
 
-        FigureCanvas.__init__(self, self.figure)
-        self.setParent(parent)
+        When pressing the "OK" button, the given controller will be notified about this.
 
-        FigureCanvas.updateGeometry(self)
+        Args:
+            - observer: SolarEclipseController that needs to be notified about the choice.
+        """
 
-        self.location_is_drawn = False
-        self.location = None
-        self.gdf = None
+        QWidget.__init__(self)
+        self.setWindowTitle("Jobs view")
+        self.setGeometry(QRect(100, 100, 300, 75))
+        self.add_observer(observer)
 
-        # noinspection SpellCheckingInspection
-        world = geopandas.read_file(get_path("naturalearth.land"))
-        # Crop -> min longitude, min latitude, max longitude, max latitude
-        world.clip([-180, -90, 180, 90]).plot(color="white", edgecolor="black", ax=self.ax)
+        layout = QGridLayout()
+        layout.addWidget(QLabel("Show"), 0, 0)
+        self.mode_combobox = QComboBox()
+        self.mode_combobox.addItems(JOBS_VIEW_MODES)
+        layout.addWidget(self.mode_combobox, 0, 1)
+
+        layout.addWidget(QLabel("Executed jobs"), 1, 0)
+        self.num_executed = QLineEdit(str(DEFAULT_JOBS_WINDOW[0]))
+        self.num_executed.setValidator(QIntValidator(0, 1000))
+        layout.addWidget(self.num_executed, 1, 1)
+
+        layout.addWidget(QLabel("Pending jobs"), 2, 0)
+        self.num_pending = QLineEdit(str(DEFAULT_JOBS_WINDOW[1]))
+        self.num_pending.setValidator(QIntValidator(1, 1000))
+        layout.addWidget(self.num_pending, 2, 1)
+
+        layout.addWidget(QLabel("Camera"), 3, 0)
+        self.camera_combobox = QComboBox()
+        self.camera_combobox.addItems([ALL_CAMERAS] + (observer.jobs_model.get_camera_names()
+                                                       if observer.jobs_model else []))
+        layout.addWidget(self.camera_combobox, 3, 1)
+
+        if observer.jobs_window:
+            self.mode_combobox.setCurrentText(JOBS_VIEW_MODES[1])
+            self.num_executed.setText(str(observer.jobs_window[0]))
+            self.num_pending.setText(str(observer.jobs_window[1]))
+
+        if observer.jobs_camera_filter:
+            self.camera_combobox.setCurrentText(observer.jobs_camera_filter)
 
-        self.ax.set_aspect("equal")
+        ok_button = QPushButton("OK")
+        ok_button.clicked.connect(self.accept_jobs_view)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.cancel_jobs_view)
+        layout.addWidget(ok_button, 4, 0)
+        layout.addWidget(cancel_button, 4, 1)
+
+        self.setLayout(layout)
+
+    def accept_jobs_view(self):
+        """ Notify the observer about the choice of jobs to show and close the pop-up window."""
 
-        self.draw()
+        self.notify_observers(self)
+        self.close()
+
+    def cancel_jobs_view(self):
+        """ Close the pop-up window without changing the jobs that are shown."""
+
+        self.close()
 
-    def plot_location(self, longitude: float, latitude: float):
-        """ Indicate the given location on the world map with a red dot.
+
+class ScriptsPopup(QWidget, Observable):
+
+    def __init__(self, observer: SolarEclipseController):
+        """ A pop-up window is shown, in which the user can choose which of the loaded scripts are scheduled.
+
+        When pressing the "OK" button, the given controller will be notified about this, and the enabled scripts are
+        merged and scheduled again.
 
         Args:
-            - longitude: Longitude of the location [degrees]
-            - latitude: Latitude of the location [degrees]
+            - observer: SolarEclipseController that needs to be notified about the choice.
         """
 
-        if self.location_is_drawn:
-            self.gdf.plot(ax=self.ax, color="white")
+        QWidget.__init__(self)
+        self.setWindowTitle("Scripts")
+        self.setGeometry(QRect(100, 100, 300, 75))
+        self.add_observer(observer)
 
-        df = pd.DataFrame(
-            {
-                "Latitude": [latitude],
-                "Longitude": [longitude],
-            }
-        )
-        self.gdf = geopandas.GeoDataFrame(df, geometry=geopandas.points_from_xy(df.Longitude, df.Latitude),
-                                          crs="EPSG:4326")
-        self.gdf.plot(ax=self.ax, color="red")
+        layout = QGridLayout()
+
+        self.checkboxes = []
+        for row, source in enumerate(observer.script_sources):
+            checkbox = QCheckBox(source.get_name())
+            checkbox.setChecked(source.enabled)
+            checkbox.setToolTip(source.filename)
+            layout.addWidget(checkbox, row, 0, 1, 2)
+            self.checkboxes.append(checkbox)
+
+        ok_button = QPushButton("OK")
+        ok_button.clicked.connect(self.accept_scripts)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.cancel_scripts)
+        layout.addWidget(ok_button, len(self.checkboxes), 0)
+        layout.addWidget(cancel_button, len(self.checkboxes), 1)
+
+        self.setLayout(layout)
+
+    def accept_scripts(self):
+        """ Notify the observer about the choice of scripts and close the pop-up window."""
+
+        self.notify_observers(self)
+        self.close()
+
+    def cancel_scripts(self):
+        """ Close the pop-up window without changing the scripts that are scheduled."""
+
+        self.close()
+
+
+def calculate_reference_moments_for_date(longitude: float, latitude: float, altitude: float,
+                                         eclipse_date: datetime.datetime,
+                                         progress: Callable = None) -> (dict, int, str):
+    """ Calculate the reference moments of the solar eclipse on the given date.
+
+    Astropy and skyfield are only imported here, as this is executed in a background task (so they are not imported when
+    the UI is started).
+
+    Args:
+        - longitude: Longitude of the location [degrees]
+        - latitude: Latitude of the location [degrees]
+        - altitude: Altitude of the location [m]
+        - eclipse_date: Date of the eclipse
+        - progress: Function that is called before each step, with the fraction that has been done and a description
+                    of the step
+
+    Returns: Dictionary with the reference moments of the solar eclipse, magnitude, and type of the eclipse.
+    """
 
-        self.ax.set_aspect("equal")
+    from astropy.time import Time
+    from solareclipseworkbench.reference_moments import calculate_reference_moments
 
-        self.draw()
-        self.location_is_drawn = True
+    return calculate_reference_moments(longitude, latitude, altitude, Time(eclipse_date), progress)
 
 
 def format_countdown(countdown: datetime.timedelta):
@@ -1452,6 +1846,50 @@ def format_countdown(countdown: datetime.timedelta):
     return formatted_countdown
 
 
+def get_utc_offsets(timestamps: np.ndarray, timezone: pytz.timezone) -> np.ndarray:
+    """ Returns the UTC offsets of the given timezone at the given times.
+
+    Daylight saving time only changes at a multiple of 15 minutes, so the offset is only looked up once for every
+    15-minute interval in which there is a timestamp.
+
+    Args:
+        - timestamps: Times [s since epoch]
+        - timezone: Timezone
+
+    Returns: UTC offsets at the given times [s].
+    """
+
+    intervals, inverse = np.unique(np.floor_divide(timestamps, 900).astype(np.int64), return_inverse=True)
+    offsets = np.array([datetime.datetime.fromtimestamp(interval * 900, tz=timezone).utcoffset().total_seconds()
+                        for interval in intervals])
+
+    return offsets[inverse].reshape(np.shape(timestamps)) if len(offsets) else np.zeros(np.shape(timestamps))
+
+
+def format_times(timestamps: np.ndarray, time_format: str) -> list:
+    """ Format the given times according to the given time format.
+
+    Each distinct second is only formatted once.
+
+    Args:
+        - timestamps: Times (in the timezone in which they have to be shown) [s since epoch]
+        - time_format: Time format
+
+    Returns: List with the formatted times.
+    """
+
+    seconds, inverse = np.unique(np.floor(timestamps).astype(np.int64) % 86400, return_inverse=True)
+    hours, minutes, seconds = seconds // 3600, (seconds // 60) % 60, seconds % 60
+
+    if time_format == "12 hours":
+        formatted = [f"{(hour - 1) % 12 + 1:02d}:{minute:02d}:{second:02d} {'am' if hour < 12 else 'pm'}"
+                     for hour, minute, second in zip(hours, minutes, seconds)]
+    else:
+        formatted = [f"{hour:02d}:{minute:02d}:{second:02d}" for hour, minute, second in zip(hours, minutes, seconds)]
+
+    return [formatted[index] for index in inverse.ravel()]
+
+
 def format_time(time: datetime.datetime, time_format: str) -> str:
     """ Format the given time according to the given time format.
 
@@ -1475,6 +1913,7 @@ class CameraOverviewTableColumnNames(Enum):
     BATTERY_LEVEL = "Battery level [%]"
     FREE_MEMORY_GB = "Free memory [GB]"
     FREE_MEMORY_PERCENTAGE = "Free memory [%]"
+    STATUS = "Status"
 
 
 class CameraOverviewTableModel(QAbstractTableModel):
@@ -1485,33 +1924,39 @@ class CameraOverviewTableModel(QAbstractTableModel):
         super().__init__()
 
         self.camera_overview_dict: Union[dict, None] = None
+        self.camera_states: dict = {}
+
+        self.columns = [CameraOverviewTableColumnNames.CAMERA.value,
+                        CameraOverviewTableColumnNames.BATTERY_LEVEL.value,
+                        CameraOverviewTableColumnNames.FREE_MEMORY_GB.value,
+                        CameraOverviewTableColumnNames.FREE_MEMORY_PERCENTAGE.value,
+                        CameraOverviewTableColumnNames.STATUS.value]
+
+        # One row (list with a value per column) per camera
 
-        self._data = pd.DataFrame(columns=[CameraOverviewTableColumnNames.CAMERA.value,
-                                           CameraOverviewTableColumnNames.BATTERY_LEVEL.value,
-                                           CameraOverviewTableColumnNames.FREE_MEMORY_GB.value,
-                                           CameraOverviewTableColumnNames.FREE_MEMORY_PERCENTAGE.value])
+        self._data: list = []
 
     def rowCount(self, index):
-        return self._data.shape[0]
+        return len(self._data)
 
     def columnCount(self, index):
-        return self._data.shape[1]
+        return len(self.columns)
 
     def headerData(self, section, orientation, role):
         # section is the index of the column/row.
         if role == Qt.ItemDataRole.DisplayRole:
             if orientation == Qt.Orientation.Horizontal:
-                return str(self._data.columns[section])
+                return str(self.columns[section])
 
             if orientation == Qt.Orientation.Vertical:
-                return str(self._data.index[section])
+                return str(section)
 
     def data(self, index: QModelIndex, role):
         """ Formatting of the data to display. """
 
         if role == Qt.ItemDataRole.DisplayRole:
 
-            value = self._data.loc[index.row()].iat[index.column()]
+            value = self._data[index.row()][index.column()]
             return value
 
         if role == Qt.ItemDataRole.TextAlignmentRole:
@@ -1520,34 +1965,104 @@ class CameraOverviewTableModel(QAbstractTableModel):
             else:
                 return Qt.AlignmentFlag.AlignRight
 
-    def update_camera_overview(self):
-        """ Update the camera overview. """
+    def get_cameras(self) -> dict:
+        """ Returns the cameras in the overview (which are looked up the first time).
 
-        self._data = pd.DataFrame(columns=self._data.columns)
-
-        self.beginResetModel()
+        Returns: Dictionary of camera names and their GPhoto2 camera object.
+        """
 
         if self.camera_overview_dict is None:
             self.camera_overview_dict = get_camera_dict()
 
-        data = []
+        return self.camera_overview_dict
 
-        for camera_name, camera in self.camera_overview_dict.items():
-            try:
-                battery_level = get_battery_level(camera).rstrip("%")
-                free_space_gb = get_free_space(camera)
-                total_space = get_space(camera)
-                free_space_percentage = int(free_space_gb / total_space * 100)
+    def read_camera_overview(self, worker_pool: CameraWorkerPool = None) -> list:
+        """ Read the battery level and free memory of the cameras.
 
-                data.append([camera_name, str(battery_level), str(free_space_gb), str(free_space_percentage)])
+        This does not touch the table, so it can be executed in a background task.
 
-            except (GPhoto2Error, IndexError):
-                pass
+        Args:
+            - worker_pool: Pool of camera workers (None to access the cameras directly)
 
-        self._data = pd.DataFrame(data, columns=self._data.columns)
+        Returns: Rows of the camera overview (camera name, battery level, free memory [GB], and free memory [%]).
+        """
+
+        return [get_camera_overview_row(sample) for sample in sample_camera_status(self.get_cameras(), worker_pool)
+                if sample.total_space]
+
+    def show_camera_overview(self, data: list):
+        """ Show the given camera overview in the table.
+
+        Args:
+            - data: Rows of the camera overview, as returned by read_camera_overview
+        """
+
+        self.beginResetModel()
+
+        self._data = [row + [self.camera_states.get(row[0], CameraState.OK).value] for row in data]
 
         self.endResetModel()
 
+    def show_camera_status(self, sample: CameraStatusSampled):
+        """ Show the given status of a camera in the table (in a new row if the camera is not in the table yet).
+
+        Args:
+            - sample: Reading of the status of a camera
+        """
+
+        if not sample.total_space:
+            return
+
+        row = get_camera_overview_row(sample)
+
+        for index in range(len(self._data)):
+            if self._data[index][0] == sample.camera_name:
+                self._data[index][:len(row)] = row
+                self.dataChanged.emit(self.index(index, 0), self.index(index, len(row) - 1))
+                return
+
+        self.beginInsertRows(QModelIndex(), len(self._data), len(self._data))
+        self._data.append(row + [self.camera_states.get(sample.camera_name, CameraState.OK).value])
+        self.endInsertRows()
+
+    def update_camera_states(self, camera_states: dict):
+        """ Update the status of the cameras (as determined by the watchdog of the scheduler).
+
+        Only the cells of which the status has changed are updated.
+
+        Args:
+            - camera_states: Dictionary with the camera names as keys and their CameraState as values
+        """
+
+        status_column = self.columns.index(CameraOverviewTableColumnNames.STATUS.value)
+
+        for camera_name, state in list(camera_states.items()):
+            if self.camera_states.get(camera_name) == state:
+                continue
+
+            self.camera_states[camera_name] = state
+
+            for row in range(len(self._data)):
+                if self._data[row][0] == camera_name:
+                    self._data[row][status_column] = state.value
+                    index = self.index(row, status_column)
+                    self.dataChanged.emit(index, index)
+
+
+def get_camera_overview_row(sample: CameraStatusSampled) -> list:
+    """ Returns the row of the camera overview for the given status of a camera.
+
+    Args:
+        - sample: Reading of the status of a camera
+
+    Returns: Camera name, battery level, free memory [GB], and free memory [%].
+    """
+
+    free_space_percentage = int(sample.free_space / sample.total_space * 100)
+
+    return [sample.camera_name, str(sample.battery_level).rstrip("%"), str(sample.free_space),
+            str(free_space_percentage)]
+
 
 class JobsTableColumnNames(Enum):
     """ Enumeration of the column names for the table with the scheduled jobs. """
@@ -1557,14 +2072,23 @@ class JobsTableColumnNames(Enum):
     COUNTDOWN = "Countdown"
     COMMAND = "Command"
     DESCRIPTION = "Description"
+    SCRIPT = "Script"
 
 
 class JobsTableModel(QAbstractTableModel, Observable):
-    def __init__(self, scheduler: BackgroundScheduler, controller: SolarEclipseController):
+    def __init__(self, scheduler: Dispatcher, controller: SolarEclipseController):
         """ Initialisation of the model for the table with the scheduled jobs.
 
+        The table is built from the schedule overview of the scheduler in one pass: the execution times are kept in
+        a numpy array (sorted), and they are converted to local time and formatted in batch.  The countdown is only
+        calculated when it is displayed, and every second only the countdown cells of the visible rows are updated.
+
+        Either all jobs are shown, or only a sliding window around the current time (the last executed jobs and the
+        next pending jobs), which is found by binary search in the execution times.  The jobs can be filtered on a
+        camera as well.
+
         Args:
-            - scheduler: Background scheduler
+            - scheduler: Scheduler with the scheduled jobs
             - model: Model for the Solar Eclipse Workbench UI
         """
 
@@ -1572,142 +2096,226 @@ class JobsTableModel(QAbstractTableModel, Observable):
         self.controller = controller
         self.time_format = self.controller.view.time_format
 
-        tf = TimezoneFinder()
-        timezone = pytz.timezone(
-            tf.timezone_at(lng=self.controller.model.longitude, lat=self.controller.model.latitude))
+        from solareclipseworkbench.reference_moments import get_timezone
+        timezone = get_timezone(self.controller.model.longitude, self.controller.model.latitude)
+
+        self.columns = [JobsTableColumnNames.COUNTDOWN.value, JobsTableColumnNames.EXEC_TIME_LOCAL.value,
+                        JobsTableColumnNames.EXEC_TIME_UTC.value, JobsTableColumnNames.COMMAND.value,
+                        JobsTableColumnNames.DESCRIPTION.value]
+
+        schedule = scheduler.schedule
+        order = np.argsort(np.asarray(schedule.execution_times, dtype=float), kind="stable")
 
-        now_utc = datetime.datetime.now().astimezone(tz=datetime.timezone.utc)
-        data = []
+        self.execution_times = np.asarray(schedule.execution_times, dtype=float)[order]
+        self.utc_offsets = get_utc_offsets(self.execution_times, timezone)
+        self.commands = [schedule.commands[row] for row in order]
+        self.descriptions = [schedule.descriptions[row] for row in order]
+        self.camera_names = [schedule.camera_names[row] for row in order]
+        self.sources = [schedule.sources[row] for row in order]
 
-        self.execution_times_utc_as_datetime = []
-        self.execution_times_local_as_datetime = []
+        # The script of each job is only shown when multiple scripts have been merged
 
-        job: Job
-        for job in scheduler.get_jobs():
+        if len(set(self.sources)) > 1:
+            self.columns.append(JobsTableColumnNames.SCRIPT.value)
 
-            execution_time_utc: datetime.datetime = job.next_run_time
-            if execution_time_utc:
-                execution_time_local = execution_time_utc.astimezone(timezone)
+        self.formatted_execution_times_utc = []
+        self.formatted_execution_times_local = []
+        self.format_execution_times()
 
-                countdown = "-"
-                if now_utc <= execution_time_utc:
-                    countdown = format_countdown(execution_time_utc - now_utc)
-                description: str = job.name
+        self.now = time.time()
 
-                job_string = ""
+        # Jobs that pass the camera filter (indices in the arrays above) and their execution times
 
-                if job.func.__name__ == "take_picture":
-                    camera_settings: CameraSettings = job.args[1]
-                    camera_name = camera_settings.camera_name
-                    shutter_speed = camera_settings.shutter_speed
-                    aperture = camera_settings.aperture
-                    iso = camera_settings.iso
+        self.camera_filter: Union[str, None] = None
+        self.filtered_rows = np.arange(len(self.execution_times))
+        self.filtered_execution_times = self.execution_times
 
-                    job_string = f"take_picture(\"{camera_name}\", {shutter_speed}, {aperture}, {iso})"
+        # Window with the number of executed and pending jobs to show (None to show all jobs)
 
-                elif job.func.__name__ == "take_burst":
-                    camera_settings: CameraSettings = job.args[1]
-                    camera_name = camera_settings.camera_name
-                    shutter_speed = camera_settings.shutter_speed
-                    aperture = camera_settings.aperture
-                    iso = camera_settings.iso
-                    duration = job.args[2]
+        self.window: Union[tuple, None] = None
 
-                    job_string = f"take_burst(\"{camera_name}\", {shutter_speed}, {aperture}, {iso}, {duration})"
+        # Jobs that are shown: rows [window_start, window_end) of the filtered jobs
 
-                elif job.func.__name__ == "take_bracket":
-                    camera_settings: CameraSettings = job.args[1]
-                    camera_name = camera_settings.camera_name
-                    shutter_speed = camera_settings.shutter_speed
-                    aperture = camera_settings.aperture
-                    iso = camera_settings.iso
-                    step = job.args[2]
+        self.window_start = 0
+        self.window_end = len(self.execution_times)
+        self.next_row = int(np.searchsorted(self.filtered_execution_times, self.now))
 
-                    job_string = f"take_bracket(\"{camera_name}\", {shutter_speed}, {aperture}, {iso}, {step})"
+    def get_camera_names(self) -> list:
+        """ Returns the names of the cameras that execute the scheduled jobs.
 
-                elif job.func.__name__ == "sync_cameras":
-                    job_string = f"sync_cameras()"
+        Returns: Sorted list with the camera names.
+        """
+
+        return sorted(set(camera_name for camera_name in self.camera_names if camera_name))
+
+    def set_view(self, window: Union[tuple, None] = None, camera_filter: Union[str, None] = None):
+        """ Choose which jobs are shown.
+
+        Args:
+            - window: Number of executed jobs and number of pending jobs to show (None to show all jobs)
+            - camera_filter: Name of the camera of which to show the jobs (None to show the jobs of all cameras)
+        """
 
-                elif job.func.__name__ == "voice_prompt":
-                    job_string = f"{job.func.__name__}({', '.join(job.args).strip()})"
+        self.beginResetModel()
 
-                self.execution_times_utc_as_datetime.append(execution_time_utc)
-                formatted_execution_time_utc = format_time(execution_time_utc, self.time_format)
+        self.window = window
+        self.camera_filter = camera_filter
 
-                self.execution_times_local_as_datetime.append(execution_time_local)
-                formatted_execution_time_local = format_time(execution_time_local, self.time_format)
+        if camera_filter:
+            self.filtered_rows = np.flatnonzero(np.asarray(self.camera_names, dtype=object) == camera_filter)
+            self.filtered_execution_times = self.execution_times[self.filtered_rows]
+        else:
+            self.filtered_rows = np.arange(len(self.execution_times))
+            self.filtered_execution_times = self.execution_times
 
-                data.append([countdown, formatted_execution_time_local, formatted_execution_time_utc, job_string,
-                             description])
+        self.now = time.time()
+        self.next_row = int(np.searchsorted(self.filtered_execution_times, self.now))
+        self.window_start, self.window_end = self.get_window(self.next_row)
+
+        self.endResetModel()
 
-        self._data = pd.DataFrame(data, columns=[JobsTableColumnNames.COUNTDOWN.value,
-                                                 JobsTableColumnNames.EXEC_TIME_LOCAL.value,
-                                                 JobsTableColumnNames.EXEC_TIME_UTC.value,
-                                                 JobsTableColumnNames.COMMAND.value,
-                                                 JobsTableColumnNames.DESCRIPTION.value])
+    def get_window(self, next_row: int) -> tuple:
+        """ Returns the range of filtered jobs to show.
 
-    def update_countdown(self):
-        """ Update the countdown until execution time."""
+        Args:
+            - next_row: Index (in the filtered jobs) of the first job that has not been executed yet
+
+        Returns: Index of the first job to show and index after the last job to show (in the filtered jobs).
+        """
+
+        if self.window is None:
+            return 0, len(self.filtered_rows)
+
+        num_executed, num_pending = self.window
+
+        return max(0, next_row - num_executed), min(len(self.filtered_rows), next_row + num_pending)
+
+    def get_row(self, row: int) -> int:
+        """ Returns the index of the job that is shown in the given row.
+
+        Args:
+            - row: Row index in the table
+
+        Returns: Index of the job in the lists with the job information.
+        """
+
+        return int(self.filtered_rows[self.window_start + row])
+
+    def format_execution_times(self):
+        """ Format the execution times, according to the current time format. """
+
+        self.formatted_execution_times_utc = format_times(self.execution_times, self.time_format)
+        self.formatted_execution_times_local = format_times(self.execution_times + self.utc_offsets, self.time_format)
+
+    def get_countdown(self, row: int) -> str:
+        """ Returns the countdown until the execution time of the job in the given row.
+
+        Args:
+            - row: Row index
+
+        Returns: Formatted countdown, or "-" if the job has been executed.
+        """
 
-        if self._data.shape[0] > 0:
+        countdown = self.execution_times[self.get_row(row)] - self.now
+        if countdown < 0:
+            return "-"
 
-            self.beginResetModel()
-            now_utc = datetime.datetime.now().astimezone(tz=datetime.timezone.utc)
-            time_format = self.controller.view.time_format
-            for row in range(len(self.execution_times_local_as_datetime)):
+        return format_countdown(datetime.timedelta(seconds=countdown))
 
-                new_countdown = self.execution_times_utc_as_datetime[row] - now_utc
-                if new_countdown.total_seconds() >= 0:
-                    if int(new_countdown.total_seconds()) == 0:
-                        self.notify_observers(row)
-                    new_countdown = format_countdown(new_countdown)
-                else:
-                    new_countdown = "-"
-                self._data.loc[row, JobsTableColumnNames.COUNTDOWN.value] = new_countdown
+    def update_countdown(self, first_row: int = 0, last_row: int = None):
+        """ Update the countdown until execution time.
 
-                if self.time_format != time_format:
-                    self._data.loc[row, JobsTableColumnNames.EXEC_TIME_UTC.value] \
-                        = format_time(self.execution_times_utc_as_datetime[row], time_format)
-                    self._data.loc[row, JobsTableColumnNames.EXEC_TIME_LOCAL.value] \
-                        = format_time(self.execution_times_local_as_datetime[row], time_format)
+        Only the countdown cells of the given (visible) rows are updated.  When the time format has changed, the
+        execution times are formatted again.
 
+        Args:
+            - first_row: Index of the first visible row
+            - last_row: Index of the last visible row (None for the last row)
+        """
+
+        if len(self.filtered_rows) == 0:
+            return
+
+        self.now = time.time()
+        next_row = int(np.searchsorted(self.filtered_execution_times, self.now))
+
+        if next_row != self.next_row:
+            self.next_row = next_row
+
+            if self.window is None:
+                # Scroll along with the jobs that are executed
+                self.notify_observers(next_row - 1)
+            else:
+                # Slide the window
+                self.beginResetModel()
+                self.window_start, self.window_end = self.get_window(next_row)
+                self.endResetModel()
+
+        num_rows = self.window_end - self.window_start
+        if num_rows == 0:
+            return
+
+        time_format = self.controller.view.time_format
+        if self.time_format != time_format:
             self.time_format = time_format
+            self.format_execution_times()
+            self.dataChanged.emit(self.index(0, 1), self.index(num_rows - 1, 2))
+
+        last_row = num_rows - 1 if last_row is None else min(last_row, num_rows - 1)
+
+        # Rows of which the job has been executed more than a second ago, do not change anymore
 
-            self.endResetModel()
+        window_times = self.filtered_execution_times[self.window_start: self.window_end]
+        first_row = max(first_row, int(np.searchsorted(window_times, self.now - 1)))
+
+        if first_row <= last_row:
+            self.dataChanged.emit(self.index(first_row, 0), self.index(last_row, 0))
 
     def clear_jobs_overview(self):
         """ Clear the scheduled jobs overview. """
 
         self.beginResetModel()
-        self._data = pd.DataFrame(columns=self._data.columns)
+        self.execution_times = self.utc_offsets = self.filtered_execution_times = np.zeros(0)
+        self.filtered_rows = np.zeros(0, dtype=int)
+        self.commands, self.descriptions, self.camera_names = [], [], []
+        self.formatted_execution_times_utc, self.formatted_execution_times_local = [], []
+        self.window_start = self.window_end = self.next_row = 0
         self.endResetModel()
 
     def rowCount(self, index):
-        return self._data.shape[0]
+        return self.window_end - self.window_start
 
     def columnCount(self, index):
-        return self._data.shape[1]
+        return len(self.columns)
 
     def headerData(self, section, orientation, role):
         # section is the index of the column/row.
         if role == Qt.ItemDataRole.DisplayRole:
             if orientation == Qt.Orientation.Horizontal:
-                return str(self._data.columns[section])
+                return str(self.columns[section])
 
             if orientation == Qt.Orientation.Vertical:
-                return str(self._data.index[section])
+                return str(self.get_row(section))
 
     def data(self, index: QModelIndex, role):
         """ Formatting of the data to display. """
 
         if role == Qt.ItemDataRole.DisplayRole:
 
-            value = self._data.loc[index.row()].iat[index.column()]
-
-            # Perform per-type checks and render accordingly.
-            if isinstance(value, datetime.datetime):
-                return format_time(value, self.controller.view.time_format)
-            return value
+            column = index.column()
+            if column == 0:
+                return self.get_countdown(index.row())
+
+            row = self.get_row(index.row())
+            if column == 1:
+                return self.formatted_execution_times_local[row]
+            elif column == 2:
+                return self.formatted_execution_times_utc[row]
+            elif column == 3:
+                return self.commands[row]
+            elif column == 4:
+                return self.descriptions[row]
+            return self.sources[row]
 
         if role == Qt.ItemDataRole.TextAlignmentRole:
             if index.column() == 0:
@@ -1733,13 +2341,24 @@ class QJobsTableView(QTableView):
         index: QModelIndex = self.model().index(min(row + 5, self.model().rowCount(None) - 1), 0)
         self.setCurrentIndex(index)
 
+    def get_visible_rows(self) -> tuple:
+        """ Returns the range of rows that are visible.
+
+        Returns: Index of the first and the last visible row.
+        """
+
+        first_row = max(0, self.rowAt(0))
+        last_row = self.rowAt(self.viewport().height() - 1)
+
+        return first_row, self.model().rowCount(None) - 1 if last_row < 0 else last_row
+
     def do(self, actions):
         pass
 
 
 def main():
     time_string = time.strftime("%Y%m%d-%H%M%S")
-    logging.basicConfig(filename=f'{time_string}.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+    configure_logging(f"{time_string}.log", level=logging.DEBUG)
     LOGGER.info("Starting up Solar Eclipse Workbench")
 
     parser = argparse.ArgumentParser(description="Solar Eclipse Workbench")
@@ -1781,8 +2400,34 @@ def main():
         default=False,
     )
 
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="execute the camera commands in a separate worker process per camera",
+        default=False,
+        action='store_true'
+    )
+
+    parser.add_argument(
+        TRACE_OPTION,
+        help="trace the camera commands, the jobs, and the voice prompts, and save the trace (Chrome trace format) in "
+             "the given file",
+        default=None,
+        metavar="FILE"
+    )
+
+    parser.add_argument(
+        startup.PROFILE_OPTION,
+        help="log the import time per package and the time it takes to show the window",
+        default=False,
+        action='store_true'
+    )
+
     args = parser.parse_args()
 
+    if args.trace:
+        start_tracing()
+
     # args[1:1] = ["-stylesheet", str(styles_location)]
     app = QApplication(list(sys.argv))
     app.setWindowIcon(QIcon(str(ICON_PATH / "logo-small.svg")))
@@ -1790,7 +2435,7 @@ def main():
 
     model = SolarEclipseModel()
     view = SolarEclipseView(is_simulator=args.sim)
-    controller = SolarEclipseController(model, view, is_simulator=args.sim)
+    controller = SolarEclipseController(model, view, is_simulator=args.sim, use_camera_workers=args.workers)
 
     if args.longitude and args.latitude and args.altitude:
         controller.set_location(args.longitude, args.latitude, args.altitude)
@@ -1803,23 +2448,23 @@ def main():
 
     view.show()
 
-    return app.exec()
+    # Executed as soon as the event loop has started (i.e. the window has been shown)
 
+    QTimer.singleShot(0, report_startup)
 
-def sync_cameras(controller: SolarEclipseController):
-    """ Synchronise the cameras for the given controller.
+    exit_code = app.exec()
 
-    This consists of the following steps:
+    if args.trace and export_trace(args.trace):
+        LOGGER.info(f"Trace saved in {args.trace}")
 
-        - Update the camera overview in the model and the view of the given controller;
-        - Set the time of all connected cameras to the time of the computer;
-        - Check whether the focus mode and shooting mode of all connected cameras is set to 'Manual'.
+    return exit_code
 
-    Args:
-        - controller: Controller of the Solar Eclipse Workbench UI
-    """
 
-    controller.model.camera_overview.update_camera_overview()
+def report_startup():
+    """ Record that the window has been shown, and log the startup profile (if requested). """
+
+    startup.mark("first window shown")
+    startup.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+""" Non-blocking logging to a file.
+
+The scheduler threads (capture, voice prompts, housekeeping) log while they are executing the jobs.  Writing these log
+records to the file in those threads would make the jobs wait for the disk.  Therefore:
+
+    - The log records are put in a bounded queue, and written to the file by a listener in a separate thread.  When the
+      queue is full, the record is dropped (and counted) rather than waiting, so logging never blocks the thread that
+      logs;
+    - The records are written as JSON (one object per line), with the wall-clock time and a monotonic timestamp (taken
+      when the record was logged), so the timing of the jobs can be analysed afterwards even if the system clock has
+      been adjusted in the meantime;
+    - The queue is flushed to the file when the application stops, and when it crashes (uncaught exception).
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Union
+
+# Maximum number of log records that wait to be written
+
+LOG_QUEUE_SIZE = 10000
+
+
+class JsonFormatter(logging.Formatter):
+    """ Formatter that formats a log record as a JSON object on a single line. """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "monotonic": getattr(record, "monotonic", None),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+
+    def __init__(self, log_queue: queue.Queue):
+        """ Initialisation of a handler that puts the log records in the given (bounded) queue, without ever waiting.
+
+        Args:
+            - log_queue: Queue in which to put the log records
+        """
+
+        super().__init__(log_queue)
+
+        self.num_dropped = 0
+
+    def emit(self, record: logging.LogRecord):
+        # Taken in the thread that logs, as the record is written later
+
+        record.monotonic = time.monotonic()
+
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message is merged with its arguments (which may change before the record is written), and the traceback
+        # (if any) is kept apart from the message, so it ends up in a field of its own
+
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.num_dropped += 1
+
+
+__LISTENER: Union[QueueListener, None] = None
+__HANDLER: Union[NonBlockingQueueHandler, None] = None
+
+
+def configure_logging(filename: str, level: int = logging.DEBUG):
+    """ Log to the given file (as JSON lines), without blocking the threads that log.
+
+    The log records are flushed to the file at exit, and when the application crashes.
+
+    Args:
+        - filename: Name of the log file
+        - level: Minimum level of the log records that are written
+    """
+
+    global __LISTENER, __HANDLER
+
+    if __LISTENER is not None:
+        return
+
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    __HANDLER = NonBlockingQueueHandler(log_queue)
+    __LISTENER = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    __LISTENER.start()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(__HANDLER)
+
+    atexit.register(stop_logging)
+
+    sys.excepthook = __log_crash(sys.excepthook)
+    threading.excepthook = __log_thread_crash(threading.excepthook)
+
+
+def flush_logging(timeout: float = 5.0):
+    """ Wait until the log records that are in the queue have been written to the file.
+
+    Args:
+        - timeout: Maximum time to wait [s]
+    """
+
+    handler = __HANDLER
+    if handler is None:
+        return
+
+    deadline = time.monotonic() + timeout
+    while handler.queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def stop_logging():
+    """ Write the log records that are still in the queue to the file, and stop the listener. """
+
+    global __LISTENER, __HANDLER
+
+    if __LISTENER is None:
+        return
+
+    logging.getLogger().removeHandler(__HANDLER)
+
+    if __HANDLER.num_dropped:
+        # Directly to the file, as the handler has been removed
+
+        __LISTENER.handle(logging.makeLogRecord({
+            "name": "Solar Eclipse Workbench", "levelno": logging.WARNING, "levelname": "WARNING",
+            "msg": f"{__HANDLER.num_dropped} log record(s) dropped, as the log queue was full",
+            "monotonic": time.monotonic()}))
+
+    __LISTENER.stop()
+    for handler in __LISTENER.handlers:
+        handler.close()
+
+    __LISTENER = None
+    __HANDLER = None
+
+
+def __log_crash(excepthook):
+    """ Returns a hook for uncaught exceptions that logs the exception and flushes the log, then calls the given hook.
+
+    The log is flushed (rather than stopped), as PyQt keeps running after an uncaught exception in a slot when a hook
+    is installed.
+
+    Args:
+        - excepthook: Original hook for uncaught exceptions
+
+    Returns: Hook for uncaught exceptions.
+    """
+
+    def log_crash(exc_type, exc_value, exc_traceback):
+        logging.critical("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
+        flush_logging()
+        excepthook(exc_type, exc_value, exc_traceback)
+
+    return log_crash
+
+
+def __log_thread_crash(excepthook):
+    """ Returns a hook for uncaught exceptions in threads, that logs the exception before calling the given hook.
+
+    Args:
+        - excepthook: Original hook for uncaught exceptions in threads
+
+    Returns: Hook for uncaught exceptions in threads.
+    """
+
+    def log_thread_crash(args):
+        logging.critical(f"Uncaught exception in thread {args.thread.name if args.thread else ''}",
+                         exc_info=(args.exc_type, args.exc_value, args.exc_traceback))
+        excepthook(args)
+
+    return log_thread_crash
@@ -0,0 +1,371 @@
+""" Merge of multiple scripts (e.g. one per camera, and one with the voice prompts) into a single plan.
+
+Every script is compiled into a plan (see plan.compile_script), sorted by execution time, and the plans of the enabled
+scripts are merged by execution time in a streaming k-way merge:
+
+    - Every planned command is tagged with the name of the script it comes from;
+    - A command that also occurs in a script that comes earlier in the list (same command, arguments, and execution
+      time) is a duplicate, and is left out of the merged plan;
+    - Commands that refer to a reference moment that does not occur for this eclipse are left out as well (and
+      reported, as are the loops that cannot be expanded for this eclipse).
+
+The compiled scripts are cached, so when a script is enabled or disabled (or the scripts are loaded again), only the
+scripts that have changed (or the scripts of which the reference moments have changed) are compiled again.
+
+The compiled plans are also cached on disk (in PLAN_CACHE_PATH), keyed by the hash of the content of the script and
+the version of the compilation (plan.PARSER_VERSION).  The planned commands are relative to their reference moment,
+so a cached plan is used for every location and eclipse, without reading the script line by line.  Only the
+expansion of the for loops (from one reference moment to another) depends on the reference moments: a plan with such
+loops is compiled again when the time between the reference moments of one of its loops is different.
+"""
+import hashlib
+import heapq
+import logging
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Union
+
+from solareclipseworkbench.plan import compile_script, PlannedCommand, PARSER_VERSION
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench")
+
+# Directory in which the compiled plans are cached
+
+PLAN_CACHE_PATH = Path.home() / ".cache" / "solareclipseworkbench" / "plans"
+
+
+class ScriptSource:
+
+    def __init__(self, filename: Union[str, Path], enabled: bool = True):
+        """ Script that is merged with other scripts into a single plan.
+
+        Args:
+            - filename: Name of the script
+            - enabled: Whether the commands of the script are scheduled
+        """
+
+        self.filename = str(filename)
+        self.enabled = enabled
+
+    def get_name(self) -> str:
+        """ Returns the name with which the commands of this script are tagged.
+
+        Returns: Name of the script file (without the directory).
+        """
+
+        return Path(self.filename).name
+
+    def __str__(self):
+        return self.get_name()
+
+
+class CompiledScript:
+
+    def __init__(self, source: str, signature: tuple, commands: list, problems: list):
+        """ Script that has been compiled for the reference moments of an eclipse.
+
+        Args:
+            - source: Name of the script, with which the commands are tagged
+            - signature: Modification time and size of the script, and the reference moments for which it has been
+                         compiled
+            - commands: List of tuples (execution time [UTC], PlannedCommand), sorted by execution time
+            - problems: List of (line number, message) tuples, for the commands and loops that have been left out
+        """
+
+        self.source = source
+        self.signature = signature
+        self.commands = commands
+        self.problems = problems
+
+
+class PlanCache:
+
+    def __init__(self, path: Union[Path, None] = PLAN_CACHE_PATH):
+        """ Initialisation of a cache with the compiled scripts.
+
+        Args:
+            - path: Directory in which the compiled plans are cached (None to keep them in memory only)
+        """
+
+        # Resolved path of the script -> CompiledScript
+
+        self.scripts: dict = {}
+        self.lock = threading.Lock()
+
+        self.path = path
+
+    def compile(self, source: ScriptSource, reference_moments: dict) -> CompiledScript:
+        """ Compile the given script, unless it has already been compiled for the same reference moments (and has not
+            changed since).
+
+        Args:
+            - source: Script to compile
+            - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo
+                                 objects
+
+        Returns: Compiled script.
+        """
+
+        path = Path(source.filename).resolve()
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size, get_reference_moments_key(reference_moments))
+
+        with self.lock:
+            compiled_script = self.scripts.get(path)
+            if compiled_script and compiled_script.signature == signature:
+                return compiled_script
+
+        name = source.get_name()
+        content = path.read_bytes()
+        loop_spans = get_loop_spans(content, reference_moments)
+
+        plan, problems = self.load(content, loop_spans)
+        if plan is None:
+            problems = []
+            plan = compile_script(source.filename, reference_moments, problems)
+            self.store(content, loop_spans, plan, problems)
+
+        commands = []
+
+        for command in plan:
+            command.source = name
+            if command.ref_moment in reference_moments:
+                commands.append((command.get_execution_time(reference_moments), command))
+            else:
+                problems.append((command.line_number,
+                                 f"{command} is skipped, as this eclipse has no {command.ref_moment}"))
+
+        # Sorting is stable, so commands at the same time keep the order of the script
+
+        commands.sort(key=lambda item: item[0])
+        compiled_script = CompiledScript(name, signature, commands, problems)
+
+        with self.lock:
+            self.scripts[path] = compiled_script
+
+        return compiled_script
+
+    def get_cache_file(self, content: bytes) -> Path:
+        """ Returns the file in which the compiled plan for a script with the given content is cached.
+
+        Args:
+            - content: Content of the script
+
+        Returns: Path of the cache file.
+        """
+
+        digest = hashlib.sha256(f"{PARSER_VERSION}\n".encode() + content).hexdigest()
+        return self.path / f"{digest}.pickle"
+
+    def load(self, content: bytes, loop_spans: tuple) -> tuple:
+        """ Load the compiled plan for a script with the given content from the cache on disk.
+
+        Args:
+            - content: Content of the script
+            - loop_spans: Reference moments of the for loops in the script, and the time between them (see
+                          get_loop_spans)
+
+        Returns: Tuple (list of PlannedCommand objects, list of (line number, message) tuples for the loops that have
+                 been left out), or (None, None) if the plan has not been cached (for these loop spans).
+        """
+
+        if self.path is None:
+            return None, None
+
+        cache_file = self.get_cache_file(content)
+
+        try:
+            with open(cache_file, "rb") as file:
+                entry = pickle.load(file)
+        except FileNotFoundError:
+            return None, None
+        except (OSError, EOFError, pickle.UnpicklingError) as exc:
+            LOGGER.warning(f"The compiled plan in {cache_file} could not be read: {exc}")
+            return None, None
+
+        if entry["loop_spans"] != loop_spans:
+            return None, None
+
+        plan = list(map(PlannedCommand, *entry["columns"]))
+
+        return plan, entry["problems"]
+
+    def store(self, content: bytes, loop_spans: tuple, plan: list, problems: list):
+        """ Store the compiled plan for a script with the given content in the cache on disk.
+
+        Args:
+            - content: Content of the script
+            - loop_spans: Reference moments of the for loops in the script, and the time between them (see
+                          get_loop_spans)
+            - plan: List of PlannedCommand objects, in the order of the script
+            - problems: List of (line number, message) tuples for the loops that have been left out
+        """
+
+        if self.path is None:
+            return
+
+        # The planned commands are stored column by column (in the order of the arguments of PlannedCommand), as lists
+        # of strings and numbers are unpickled much faster than objects
+
+        entry = {
+            "loop_spans": loop_spans,
+            "columns": ([command.func_name for command in plan], [command.ref_moment for command in plan],
+                        [command.offset for command in plan], [command.args for command in plan],
+                        [command.description for command in plan], [command.line_number for command in plan]),
+            "problems": problems,
+        }
+
+        cache_file = self.get_cache_file(content)
+
+        # Written to a temporary file first, so a plan that is loaded at the same time is never incomplete
+
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            temporary_file = cache_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(temporary_file, "wb") as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_file, cache_file)
+        except OSError as exc:
+            LOGGER.warning(f"The compiled plan could not be stored in {cache_file}: {exc}")
+
+
+def get_reference_moments_key(reference_moments: dict) -> tuple:
+    """ Returns a key that identifies the given reference moments.
+
+    Args:
+        - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects
+
+    Returns: Tuple with the names and times of the reference moments.
+    """
+
+    return tuple(sorted((name, moment.time_utc) for name, moment in reference_moments.items()
+                        if hasattr(moment, "time_utc")))
+
+
+def get_loop_spans(content: bytes, reference_moments: dict) -> tuple:
+    """ Returns the reference moments of the for loops in the given script, and the time between them.
+
+    The number of iterations of these loops (from one reference moment to another) depends on the time between the
+    reference moments, so the compiled plan of a script can only be used for the same loop spans.
+
+    Args:
+        - content: Content of the script
+        - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects
+
+    Returns: Tuple of (start, stop, time between start and stop [s]) tuples, one per for loop (the time is None when
+             the eclipse has no start or stop moment).
+    """
+
+    loop_spans = []
+
+    for line in content.decode(errors="replace").splitlines():
+        if line.startswith("for"):
+            _, start, stop, _ = line.split(",", 3)
+            if hasattr(reference_moments.get(start), "time_utc") and hasattr(reference_moments.get(stop), "time_utc"):
+                span = (reference_moments[stop].time_utc - reference_moments[start].time_utc).total_seconds()
+            else:
+                span = None
+            loop_spans.append((start, stop, span))
+
+    return tuple(loop_spans)
+
+
+def get_script_sources(scripts: Union[str, list]) -> list:
+    """ Returns the script sources for the given script(s).
+
+    Args:
+        - scripts: Name of a script, or list with names of scripts and/or ScriptSource objects
+
+    Returns: List of ScriptSource objects.
+    """
+
+    if isinstance(scripts, (str, Path)):
+        scripts = [scripts]
+
+    return [script if isinstance(script, ScriptSource) else ScriptSource(script) for script in scripts]
+
+
+def merge_scripts(compiled_scripts: list, duplicates: list = None):
+    """ Merge the given compiled scripts by execution time.
+
+    The commands are merged one at a time (the plans are not concatenated and sorted).  Commands at the same execution
+    time keep the order of the scripts.
+
+    Args:
+        - compiled_scripts: List of CompiledScript objects, in order of precedence
+        - duplicates: List to which (duplicate, original) tuples of PlannedCommand objects are appended, for the
+                      commands that are left out because an earlier script has the same command at the same time
+
+    Returns: Iterator over the PlannedCommand objects, in order of execution time.
+    """
+
+    merged_commands = heapq.merge(*[__tag_commands(compiled_script, index)
+                                    for index, compiled_script in enumerate(compiled_scripts)],
+                                  key=lambda item: item[:2])
+
+    # Commands at the current execution time: key -> (index of the script, PlannedCommand).  Duplicates have the same
+    # execution time, so only the commands at the current execution time have to be kept
+
+    current_time = None
+    current_commands: dict = {}
+
+    for execution_time, index, command in merged_commands:
+        if execution_time != current_time:
+            current_time = execution_time
+            current_commands = {}
+
+        key = (command.func_name, tuple(command.args))
+        original = current_commands.get(key)
+
+        if original is None:
+            current_commands[key] = (index, command)
+            yield command
+        elif original[0] != index:
+            if duplicates is not None:
+                duplicates.append((command, original[1]))
+        else:
+            # The same command twice in the same script is not a merge problem
+            yield command
+
+
+def __tag_commands(compiled_script: CompiledScript, index: int):
+    """ Tag the commands of the given compiled script with the index of the script.
+
+    Args:
+        - compiled_script: Compiled script
+        - index: Index of the script in the list of scripts that are merged
+
+    Returns: Iterator over tuples (execution time [UTC], index, PlannedCommand).
+    """
+
+    for execution_time, command in compiled_script.commands:
+        yield execution_time, index, command
+
+
+def describe_command(command: PlannedCommand) -> str:
+    """ Returns a description of the given command, with the script and line it comes from.
+
+    Args:
+        - command: Planned command
+
+    Returns: Description of the command, e.g. "take_picture at C2-0:00:10 (line 12 of testEOSR.txt)".
+    """
+
+    if command.line_number is None:
+        return f"{command} ({command.source})"
+
+    return f"{command} (line {command.line_number} of {command.source})"
+
+
+__PLAN_CACHE = PlanCache()
+
+
+def get_plan_cache() -> PlanCache:
+    """ Returns the cache with the compiled scripts.
+
+    Returns: Cache with the compiled scripts.
+    """
+
+    return __PLAN_CACHE
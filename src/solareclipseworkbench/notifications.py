@@ -1,6 +1,7 @@
 from enum import Enum
-from pathlib import Path
-from playsound import playsound
+
+from solareclipseworkbench.announcements import get_announcement_name
+from solareclipseworkbench.audio import get_audio_engine
 
 
 class Notifications(str, Enum):
@@ -82,16 +83,39 @@ class Notifications(str, Enum):
     C4 = "c4.wav"
 
 
-def voice_prompt(notification: str) -> None:
+def get_sound_name(notification: str) -> str:
+    """ Returns the name of the sound for the given notification.
+
+    Args:
+        - notification: Notification, or the text of an announcement that is assembled from the sound clips (e.g.
+                        C3_IN_37_SECONDS)
+
+    Returns: Name of the sound file, or of the rendered announcement.
+    """
+
+    notification = notification.strip()
+
+    if notification in Notifications.__members__:
+        return Notifications[notification].value
+
+    return get_announcement_name(notification)
+
+
+def voice_prompt(notification: str, start_time: float = None) -> None:
     """ Voice prompt of the given notification.
 
-    In the current implementation, the default voice from your system settings will be used.
+    The sound is played by the audio engine, which has all sound files in memory.  When a start time is given, the
+    silence at the start of the sound file is compensated for, so the speech starts at that time.
+
+    Notifications that are not in the Notifications enumeration are announcements that are assembled from the sound
+    clips.  These must have been rendered (with the synthesizer) beforehand.
 
     Args:
         - notification: Notification
+        - start_time: Time at which the speech has to start [s since epoch] (None to start as soon as possible)
     """
-    SOUND_PATH = Path(__file__).parent.resolve() / ".." / ".." / "sound"
-    playsound(str(SOUND_PATH) + "/" + Notifications[notification.lstrip()].value)
+
+    get_audio_engine().play(get_sound_name(notification), start_time)
 
 
 def main():
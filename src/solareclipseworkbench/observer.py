@@ -1,4 +1,5 @@
 import abc
+import logging
 
 
 class Observer(abc.ABC):
@@ -28,14 +29,19 @@ class Observable:
     # def countObservers(self):
     #     return len(self.observers)
 
+    # The observers are notified synchronously, in the thread of the observable.  For notifications from other threads
+    # (e.g. the threads of the scheduler), use the event bus (see events.py).
+
     def notify_observers(self, changed_object):
-        # FIXME: put a try..except here to log any problem that occurred in the observer's update()
-        #        method
         for observer in self.observers:
-            observer.update(changed_object)
+            try:
+                observer.update(changed_object)
+            except Exception as exc:
+                logging.exception(f"{type(observer).__name__} failed to handle the update: {exc}")
 
     def action_observers(self, actions):
-        # FIXME: put a try..except here to log any problem that occurred in the observer's do()
-        #        method
         for observer in self.observers:
-            observer.do(actions)
+            try:
+                observer.do(actions)
+            except Exception as exc:
+                logging.exception(f"{type(observer).__name__} failed to handle the actions: {exc}")
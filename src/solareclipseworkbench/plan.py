@@ -0,0 +1,177 @@
+""" Compiled plan of the commands in a script.
+
+A script line (after conversion by `scripts.convert_script`) is compiled into a PlannedCommand, which keeps the command
+relative to its reference moment.  The execution time is only calculated when the plan is scheduled, so the same plan
+can be used for different reference moments.
+"""
+from datetime import datetime, timedelta
+from typing import Union
+
+from solareclipseworkbench import scripts
+
+CAMERA_COMMANDS = ("take_picture", "take_burst", "take_bracket")
+
+# Version of the compilation of the scripts (scripts.convert_script and parse_command).  Increase it when the compiled
+# plan changes, so the plans that have been cached (see merge.PlanCache) are compiled again
+
+PARSER_VERSION = 1
+
+
+class PlannedCommand:
+
+    def __init__(self, func_name: str, ref_moment: str, offset: float, args: list, description: str,
+                 line_number: int = None, source: str = None):
+        """ Initialisation of a command in the compiled plan.
+
+        Args:
+            - func_name: Name of the command (take_picture, take_burst, take_bracket, voice_prompt, sync_cameras)
+            - ref_moment: Reference moment w.r.t. which the command is scheduled (C1, C2, MAX, C3, C4, sunrise, sunset)
+            - offset: Offset of the execution time w.r.t. the reference moment [s] (negative = before)
+            - args: Arguments of the command, as specified in the script
+            - description: Description of the command
+            - line_number: Number of the line in the script from which the command was compiled (None if unknown)
+            - source: Name of the script from which the command was compiled (None if unknown)
+        """
+
+        self.func_name = func_name
+        self.ref_moment = ref_moment
+        self.offset = offset
+        self.args = args
+        self.description = description
+        self.line_number = line_number
+        self.source = source
+
+    def get_camera_name(self) -> Union[str, None]:
+        """ Returns the name of the camera for this command.
+
+        Returns: Name of the camera, None for commands that are not executed by a single camera.
+        """
+
+        return self.args[0] if self.func_name in CAMERA_COMMANDS else None
+
+    def get_execution_time(self, reference_moments: dict, time_shift: timedelta = timedelta(0)) -> datetime:
+        """ Calculate the execution time of this command for the given reference moments.
+
+        Args:
+            - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo
+                                 objects
+            - time_shift: Shift that is subtracted from the execution time (when simulating)
+
+        Returns: Execution time [UTC].
+        """
+
+        return reference_moments[self.ref_moment].time_utc + timedelta(seconds=self.offset) - time_shift
+
+    def __str__(self):
+        offset = str(timedelta(seconds=abs(self.offset)))
+        return f"{self.func_name} at {self.ref_moment}{'-' if self.offset < 0 else '+'}{offset}"
+
+
+def parse_command(cmd_str: str) -> PlannedCommand:
+    """ Compile the given command string (in the Solar Eclipse Workbench format) into a planned command.
+
+    Args:
+        - cmd_str: Command string, e.g. 'take_picture, C1, -, 0:01:02.0, Canon EOS 80D, 1/1250, 8, 200, "Comment"'
+
+    Returns: Planned command.
+    """
+
+    cmd_str_split = cmd_str.split(",")
+    func_name = cmd_str_split[0].strip()
+    ref_moment = cmd_str_split[1].strip()
+    sign = cmd_str_split[2].strip()    # + or -
+    hours, minutes, seconds = cmd_str_split[3].strip().split(":")   # hh:mm:ss.ss
+    description = cmd_str_split[-1].lstrip()
+
+    offset = timedelta(hours=float(hours), minutes=float(minutes), seconds=float(seconds)).total_seconds()
+    if sign != "+":
+        offset = -offset
+
+    args = [arg.strip() for arg in cmd_str_split[4:-1]]
+
+    return PlannedCommand(func_name, ref_moment, offset, args, description)
+
+
+def compile_script(filename: str, reference_moments: dict, problems: list = None) -> list:
+    """ Compile the given script into a plan.
+
+    Every planned command keeps the number of the line in the script from which it was compiled (for a loop: the
+    line of the command inside the loop).
+
+    Args:
+        - filename: Name of the script (in the Solar Eclipse Workbench or Solar Eclipse Maestro format)
+        - reference_moments: Dictionary with the reference moments of the solar eclipse (needed to expand the for
+                             loops)
+        - problems: List to which (line number, message) tuples are appended for the loops that cannot be expanded
+                    for this eclipse (None to stop at such a loop, see scripts.convert_script)
+
+    Returns: List of PlannedCommand objects, in the order of the script.
+    """
+
+    line_numbers = []
+    script_file = scripts.convert_script(filename, reference_moments, line_numbers, problems)
+    script_file.seek(0)
+
+    plan = [parse_command(cmd_str) for cmd_str in script_file if cmd_str.strip()]
+    for command, line_number in zip(plan, line_numbers):
+        command.line_number = line_number
+
+    return plan
+
+
+class Schedule:
+
+    def __init__(self):
+        """ Overview of the commands that have been scheduled, kept column by column.
+
+        The command strings (as shown in the UI) are interned, as the same command (e.g. a picture with the same
+        settings) is typically scheduled many times.
+        """
+
+        self.execution_times: list = []     # [s since epoch]
+        self.commands: list = []
+        self.descriptions: list = []
+        self.camera_names: list = []
+        self.sources: list = []
+
+        self.command_strings: dict = {}
+
+    def add(self, execution_time: datetime, func_name: str, args: list, description: str, source: str = None):
+        """ Add the given scheduled command to the overview.
+
+        Args:
+            - execution_time: Execution time of the command [UTC]
+            - func_name: Name of the command
+            - args: Arguments of the command (as they are passed to the function)
+            - description: Description of the command
+            - source: Name of the script from which the command was compiled (None if unknown)
+        """
+
+        if func_name in CAMERA_COMMANDS:
+            camera_settings = args[1]
+            camera_name = camera_settings.camera_name
+            key = (func_name, camera_name, camera_settings.shutter_speed, camera_settings.aperture,
+                   camera_settings.iso) + tuple(str(arg) for arg in args[2:])
+        elif func_name == "voice_prompt":
+            camera_name = None
+            key = (func_name, ) + tuple(arg.strip() for arg in args)
+        else:
+            camera_name = None
+            key = (func_name, )
+
+        command = self.command_strings.get(key)
+        if command is None:
+            if func_name in CAMERA_COMMANDS:
+                command = f"{func_name}(\"{key[1]}\", {', '.join(str(arg) for arg in key[2:])})"
+            else:
+                command = f"{func_name}({', '.join(key[1:])})"
+            self.command_strings[key] = command
+
+        self.execution_times.append(execution_time.timestamp())
+        self.commands.append(command)
+        self.descriptions.append(description)
+        self.camera_names.append(camera_name)
+        self.sources.append(source)
+
+    def __len__(self):
+        return len(self.execution_times)
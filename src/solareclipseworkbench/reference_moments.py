@@ -8,6 +8,8 @@ Reference moments of a solar eclipse:
     - MAX: Maximum eclipse.
 """
 from datetime import datetime
+from functools import lru_cache
+from typing import Callable
 
 import astronomy
 import astropy.units as u
@@ -40,7 +42,24 @@ class ReferenceMomentInfo:
         self.altitude = altitude
 
 
-def calculate_reference_moments(longitude: float, latitude: float, altitude: float, time: Time) -> (dict, int, str):
+@lru_cache(maxsize=16)
+def get_timezone(longitude: float, latitude: float) -> pytz.timezone:
+    """ Returns the timezone of the given location.
+
+    Looking up the timezone is slow, so the result is cached.
+
+    Args:
+        - longitude: Longitude of the location [degrees]
+        - latitude: Latitude of the location [degrees]
+
+    Returns: Timezone of the given location.
+    """
+
+    return pytz.timezone(TimezoneFinder().timezone_at(lng=longitude, lat=latitude))
+
+
+def calculate_reference_moments(longitude: float, latitude: float, altitude: float, time: Time,
+                                progress: Callable = None) -> (dict, int, str):
     """ Calculate the reference moments of the solar eclipse and return as a dictionary.
 
     The reference moments of a solar eclipse are the following:
@@ -59,11 +78,15 @@ def calculate_reference_moments(longitude: float, latitude: float, altitude: flo
         - latitude: Latitude of the location [degrees]
         - altitude: Altitude of the location [m]
         - time: Date of the eclipse [yyyy-mm-dd]
+        - progress: Function that is called before each step, with the fraction that has been done and a description
+                    of the step (e.g. to show the progress in the UI, or to stop by raising an exception)
 
     Returns: Dictionary with the reference moments of the solar eclipse, as datetime objects.
     """
-    tf = TimezoneFinder()
-    timezone = pytz.timezone(tf.timezone_at(lng=longitude, lat=latitude))
+    progress = progress or (lambda fraction, message: None)
+
+    progress(0.0, "Looking up the timezone")
+    timezone = get_timezone(longitude, latitude)
 
     location = EarthLocation(lat=latitude * u.deg, lon=longitude * u.deg, height=altitude * u.m)
 
@@ -71,8 +94,10 @@ def calculate_reference_moments(longitude: float, latitude: float, altitude: flo
     observer = astronomy.Observer(latitude, longitude)
     start_time = astronomy_time
 
+    progress(0.2, "Searching the eclipse")
     eclipse: LocalSolarEclipseInfo = SearchLocalSolarEclipse(start_time, observer)
 
+    progress(0.4, "Loading the ephemeris")
     eph = load("de421.bsp")
     ts = load.timescale()
 
@@ -85,6 +110,7 @@ def calculate_reference_moments(longitude: float, latitude: float, altitude: flo
 
     date = ts.utc(time.datetime.year, time.datetime.month, time.datetime.day, 4)
 
+    progress(0.6, "Calculating sunrise and sunset")
     sunrise, y = almanac.find_risings(observer, sun_ephem, date, date + 1)
     sunset, y = almanac.find_settings(observer, sun_ephem, date, date + 1)
     timings = {}
@@ -99,6 +125,8 @@ def calculate_reference_moments(longitude: float, latitude: float, altitude: flo
     if str(eclipse.partial_begin.time)[:10] != str(time)[:10]:
         return timings, 0, 'No eclipse'
 
+    progress(0.8, "Calculating the contacts")
+
     # Check if altitude at one of the moments is > 0.0
     if eclipse.peak.altitude > 0.0 or eclipse.partial_begin.altitude > 0.0 or eclipse.partial_end.altitude > 0.0:
         alt, az = __calculate_alt_az(ts, earth, sun_ephem, loc, eclipse.partial_begin.time.Utc())
@@ -108,17 +108,38 @@ def _get_delta_datetime(delta: str) -> str:
             delta_datetime = datetime.strptime(delta, "%H:%M:%S")
     return delta_datetime.strftime('%H:%M:%S.%f')[:-5]
 
-def convert_script(filename, reference_moments) -> io.StringIO:
+def convert_script(filename, reference_moments, line_numbers: list = None, problems: list = None) -> io.StringIO:
     """
     Converts the input file from Solar Eclipse Maestro to a file that is readable by Solar Eclipse Workbench.
 
-    Returns: None
+    Args:
+        - filename: Name of the script
+        - reference_moments: Dictionary with the reference moments of the solar eclipse (needed to expand the for loops)
+        - line_numbers: List to which the number of the line in the script is appended for every line of the output
+                        (None if not needed)
+        - problems: List to which (line number, message) tuples are appended for the for loops that refer to reference
+                    moments that do not occur for this eclipse.  These loops are then skipped.  None to stop instead
+
+    Returns: Converted script.
     """    
     input_file = open(filename, 'r')
     output_file = io.StringIO()
+    line_number = 0
+
+    def read_line():
+        nonlocal line_number
+        line_number += 1
+        return input_file.readline()
+
+    def convert(line, ref_moment, sign, time_delta, extra_comment):
+        position = output_file.tell()
+        convert_command(line, ref_moment, sign, time_delta, extra_comment, output_file)
+        if line_numbers is not None and output_file.tell() != position:
+            line_numbers.append(line_number)
+        return output_file
 
     while True:
-        line = input_file.readline()
+        line = read_line()
         if not line:
             break
         # Drop empty lines and comments (starting with #)
@@ -127,7 +148,7 @@ def convert_script(filename, reference_moments) -> io.StringIO:
             if line.startswith('FOR'):
                 _, for_type, direction, interval, number_of_steps = line.split(",")
                 if for_type == '(INTERVALOMETER)':
-                    line = input_file.readline()
+                    line = read_line()
                     while not line.startswith('ENDFOR'):
                         if direction == "0":
                             # If direction is 0, count from high to low.
@@ -168,10 +189,10 @@ def convert_script(filename, reference_moments) -> io.StringIO:
                             time_delta = display1_10th_second(time_delta)
                             extra_comment = f" (Iter. {iteration})"
 
-                            output_file = convert_command(line, ref_moment, sign, time_delta, extra_comment, output_file)
+                            output_file = convert(line, ref_moment, sign, time_delta, extra_comment)
                             iteration = iteration + 1
 
-                        line = input_file.readline()
+                        line = read_line()
             elif line.startswith('for'):
                 _, start, stop, interval, start_delta, stop_delta = line.split(",")
                 # Convert interval to float
@@ -186,7 +207,7 @@ def convert_script(filename, reference_moments) -> io.StringIO:
                     stop_time = timings[stop].time_utc + timedelta(seconds=float(stop_delta))
 
                     # Or just using the step size and stop when the stop moment is reached
-                    line = input_file.readline()
+                    line = read_line()
                     while not line.startswith('endfor'):
                         iteration = 1
                         current_time = start_time
@@ -203,12 +224,18 @@ def convert_script(filename, reference_moments) -> io.StringIO:
 
                             extra_comment = f" (Iter. {iteration})"
 
-                            output_file = convert_command(line, start, sign, time_delta, extra_comment, output_file)
+                            output_file = convert(line, start, sign, time_delta, extra_comment)
 
                             current_time = current_time + timedelta(seconds=interval)
                             iteration = iteration + 1
 
-                        line = input_file.readline()
+                        line = read_line()
+                elif problems is not None:
+                    missing = ", ".join(moment for moment in (start, stop) if moment not in timings)
+                    problems.append((line_number, f"for loop from {start} to {stop} is skipped, as this eclipse has "
+                                                  f"no {missing}"))
+                    while line and not line.startswith('endfor'):
+                        line = read_line()
                 else:
                     print ('for loops need C1, C2, C3, C4, MAX, or END as reference moments.')
                     exit()
@@ -216,7 +243,7 @@ def convert_script(filename, reference_moments) -> io.StringIO:
                 _, ref_moment, sign, delta, _ = line.split(",", 4)
                 time_delta = _get_delta_datetime(delta)
 
-                output_file = convert_command(line, ref_moment, sign, time_delta, "", output_file)
+                output_file = convert(line, ref_moment, sign, time_delta, "")
 
     return output_file
 
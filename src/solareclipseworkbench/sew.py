@@ -1,42 +1,164 @@
+# Imported first, so the imports below are included in the startup profile (if requested)
+from solareclipseworkbench import startup
+
 import argparse
-from time import sleep
+import signal
+import sys
+from datetime import datetime, timedelta
 
 from astropy.time import Time
 
-import camera
-from solareclipseworkbench import gui
+from solareclipseworkbench.audio import get_audio_engine, OverlapPolicy
+from solareclipseworkbench.camera import get_camera_dict, release_cameras
+from solareclipseworkbench.dispatcher import Dispatcher, clean_description, parse_quiet_window
+from solareclipseworkbench.forecast import read_profiles
 from solareclipseworkbench.reference_moments import calculate_reference_moments
+from solareclipseworkbench.tracing import TRACE_OPTION, start_tracing, export_trace
 from solareclipseworkbench.utils import observe_solar_eclipse
 
+# Interval between updates of the progress line [s]
+
+PROGRESS_INTERVAL = 1.0
+
 
 def main(args):
     if args.gui:
+        # The UI is only imported when it is used
+        from solareclipseworkbench import gui
+
         gui.main()
     else:
-        # Check for all needed parameters
-        if args.date and args.longitude and args.latitude and args.altitude and args.script:
+        # Check for all needed parameters (in daemon mode, the script can also be started through the API)
+        if args.date and args.longitude and args.latitude and args.altitude and (args.script or args.daemon):
+            if args.trace:
+                start_tracing()
+
             eclipse_date = Time(args.date)
             timings, magnitude, eclipse_type = calculate_reference_moments(args.longitude, args.latitude, args.altitude,
                                                                            eclipse_date)
 
             filename = args.script
 
-            cameras = camera.get_camera_dict()
+            get_audio_engine().policy = OverlapPolicy(args.voice_overlap)
+
+            cameras = get_camera_dict()
+
+            quiet_windows = [parse_quiet_window(quiet_window) for quiet_window in args.quiet_window] \
+                if args.quiet_window else None
+
+            storage_profiles = read_profiles(args.storage_profiles) if args.storage_profiles else None
+
+            if args.daemon:
+                run_daemon(args, timings, cameras, quiet_windows)
+                save_trace(args.trace)
+                return
 
             # Only do a simulation if args.c1 is set
             if args.ref_moment:
-                scheduler = observe_solar_eclipse(timings, filename, cameras, None, args.ref_moment, args.minutes)
+                scheduler = observe_solar_eclipse(timings, filename, cameras, None, args.ref_moment, args.minutes,
+                                                  quiet_windows, args.workers, storage_profiles=storage_profiles)
             else:
-                scheduler = observe_solar_eclipse(timings, filename, cameras, None, None, None)
+                scheduler = observe_solar_eclipse(timings, filename, cameras, None, None, None, quiet_windows,
+                                                  args.workers, storage_profiles=storage_profiles)
 
-            while len(scheduler.get_jobs()) > 0:
-                sleep(5)
+            startup.report()
+
+            # Stop on SIGTERM (e.g. from systemd) in the same way as on Ctrl-C
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+            try:
+                wait_until_completed(scheduler)
+            except KeyboardInterrupt:
+                print("\nInterrupted: the remaining jobs are cancelled", file=sys.stderr)
+                scheduler.remove_all_jobs()
+
+            # Let the jobs that are running finish before the cameras are released
+            scheduler.shutdown()
+            release_cameras(cameras)
+
+            for line in scheduler.get_timing_summary():
+                print(line)
+            get_audio_engine().report_latencies()
+            save_trace(args.trace)
         else:
             print("When using the command line, you must specify the date, "
                   "script to execute and the exact location of the solar eclipse.")
             exit()
 
 
+def wait_until_completed(scheduler: Dispatcher):
+    """ Wait until all scheduled jobs have finished, and show the progress (when the output is a terminal).
+
+    Args:
+        - scheduler: Scheduler that executes the jobs
+    """
+
+    if not sys.stdout.isatty():
+        scheduler.wait_until_completed()
+        return
+
+    while not scheduler.wait_until_completed(PROGRESS_INTERVAL - datetime.now().timestamp() % PROGRESS_INTERVAL):
+        num_finished, num_jobs = scheduler.get_progress()
+        line = f"{num_finished}/{num_jobs} job(s) done"
+
+        next_jobs = scheduler.get_next_jobs(1)
+        if next_jobs:
+            countdown = max(int(next_jobs[0].scheduled_time.timestamp() - datetime.now().timestamp()), 0)
+            line += f" - next in {timedelta(seconds=countdown)}: {clean_description(next_jobs[0].description)}"
+
+        # Overwrite the previous progress line
+        print(f"\r{line[:150]:<150}", end="", flush=True)
+
+    print()
+
+
+def save_trace(filename: str):
+    """ Export the spans that have been recorded to the given file (if tracing is enabled).
+
+    Args:
+        - filename: Name of the trace file (None if tracing is not enabled)
+    """
+
+    if filename and export_trace(filename):
+        print(f"Trace saved in {filename} (open it in chrome://tracing or https://ui.perfetto.dev)")
+
+
+def run_daemon(args, timings: dict, cameras: dict, quiet_windows: list):
+    """ Run the dispatcher without UI, and serve the status and control API until SIGINT or SIGTERM.
+
+    Args:
+        - args: Command line arguments
+        - timings: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects
+        - cameras: Dictionary of camera names and camera objects
+        - quiet_windows: List of QuietWindow objects (None for the default quiet windows)
+    """
+
+    from solareclipseworkbench.daemon import SolarEclipseDaemon, is_loopback
+
+    if not args.token and not is_loopback(args.host):
+        print(f"The daemon only listens on {args.host} with a token (--token), as anyone on the network could control "
+              f"it otherwise.", file=sys.stderr)
+        return
+
+    daemon = SolarEclipseDaemon(timings, cameras, quiet_windows, args.workers, args.token,
+                                read_profiles(args.storage_profiles) if args.storage_profiles else None)
+
+    if args.script:
+        daemon.start(args.script, args.ref_moment or None, args.minutes or None)
+
+    startup.report()
+
+    # Stop on SIGTERM (e.g. from systemd) in the same way as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    try:
+        daemon.serve(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+
+    get_audio_engine().report_latencies()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Solar Eclipse Workbench")
     parser.add_argument(
@@ -79,8 +201,10 @@ if __name__ == "__main__":
     parser.add_argument(
         "-s",
         "--script",
-        help="script to execute (with voice prompts and camera commands)",
+        help="script(s) to execute (with voice prompts and camera commands); multiple scripts (e.g. one per "
+             "camera) are merged into a single plan",
         default=False,
+        nargs="+"
     )
 
     parser.add_argument(
@@ -99,6 +223,81 @@ if __name__ == "__main__":
         type=float
     )
 
+    parser.add_argument(
+        "-q",
+        "--quiet_window",
+        help="window in which no housekeeping is done, e.g. C2-60..C3+30 (can be repeated, default: C2-60..C3+30)",
+        default=None,
+        action='append'
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="execute the camera commands in a separate worker process per camera",
+        default=False,
+        action='store_true'
+    )
+
+    parser.add_argument(
+        "-v",
+        "--voice_overlap",
+        help="what to do with a voice prompt while another one is still playing (interrupt, drop, queue)",
+        default=OverlapPolicy.QUEUE.value,
+        choices=[policy.value for policy in OverlapPolicy]
+    )
+
+    parser.add_argument(
+        "--storage_profiles",
+        help="JSON file with the storage profile per camera (size of an image, and capacity and write speed of the "
+             "buffer), for the forecast of the free space on the memory cards and of the buffer occupancy",
+        default=None,
+        metavar="FILE"
+    )
+
+    parser.add_argument(
+        "--daemon",
+        help="run without UI, and serve a status and control API (the script is optional, it can be started through "
+             "the API)",
+        default=False,
+        action='store_true'
+    )
+
+    parser.add_argument(
+        "--host",
+        help="host name or IP address on which the daemon listens (0.0.0.0 for all network interfaces, which requires "
+             "a token, default: 127.0.0.1)",
+        default="127.0.0.1"
+    )
+
+    parser.add_argument(
+        "--port",
+        help="port on which the daemon listens (default: 8765)",
+        default=8765,
+        type=int
+    )
+
+    parser.add_argument(
+        "--token",
+        help="token that must be given (as Authorization: Bearer <token>) to start, stop, or retime the daemon",
+        default=None
+    )
+
+    parser.add_argument(
+        TRACE_OPTION,
+        help="trace the camera commands, the jobs, and the voice prompts, and save the trace (Chrome trace format) in "
+             "the given file",
+        default=None,
+        metavar="FILE"
+    )
+
+    parser.add_argument(
+        startup.PROFILE_OPTION,
+        help="log the import time per package and the time it takes to schedule the first job",
+        default=False,
+        action='store_true'
+    )
+
     arguments = parser.parse_args()
 
     main(arguments)
@@ -0,0 +1,189 @@
+""" Startup profile of the GUI and the command line.
+
+When the GUI or the command line is started with the --startup-profile option, the time it takes to import each module
+is recorded, together with the time at which the milestones of the startup are reached (e.g. the first window is shown,
+or the first job is scheduled).  A summary is printed on stderr (like "python -X importtime") when the startup has
+finished.
+
+This module must be imported by the entry points before any other module, so the imports of all other modules are
+included in the profile.  The profile is started as soon as this module is imported (when the option is given).
+"""
+import builtins
+import sys
+import threading
+import time
+from typing import Union
+
+PROFILE_OPTION = "--startup-profile"
+
+# Number of top-level packages that are listed in the summary
+
+NUM_REPORTED_PACKAGES = 15
+
+
+class StartupProfiler:
+
+    def __init__(self):
+        """ Initialisation of a profiler for the imports and the milestones of the startup.
+
+        The imports are timed by wrapping the built-in __import__ function.  For each module, both the cumulative time
+        (including the modules it imports) and the self time (excluding those) are recorded.
+        """
+
+        self.start = time.perf_counter()
+
+        # Module name -> (cumulative, self) import time [s]
+
+        self.import_times: dict = {}
+
+        # Milestone -> time since the start of the profile [s]
+
+        self.milestones: dict = {}
+
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.__timed_import
+
+    def stop(self):
+        """ Stop timing the imports. """
+
+        builtins.__import__ = self.original_import
+
+    def mark(self, milestone: str):
+        """ Record that the given milestone has been reached (only the first time).
+
+        Args:
+            - milestone: Description of the milestone, e.g. "first window shown"
+        """
+
+        with self.lock:
+            self.milestones.setdefault(milestone, time.perf_counter() - self.start)
+
+    def get_package_times(self) -> dict:
+        """ Returns the import time per top-level package.
+
+        Returns: Dictionary with the top-level package names as keys and the sum of the self import times of their
+                 modules as values [s], sorted by decreasing import time.
+        """
+
+        package_times = {}
+
+        with self.lock:
+            for module_name, (_, self_time) in self.import_times.items():
+                package = module_name.split(".")[0]
+                package_times[package] = package_times.get(package, 0.0) + self_time
+
+        return dict(sorted(package_times.items(), key=lambda item: item[1], reverse=True))
+
+    def report(self):
+        """ Print the milestones and the import time of the top-level packages that took longest to import. """
+
+        package_times = self.get_package_times()
+
+        print(f"Startup profile: {len(self.import_times)} module(s) imported in {sum(package_times.values()):.3f}s",
+              file=sys.stderr)
+
+        for package, package_time in list(package_times.items())[:NUM_REPORTED_PACKAGES]:
+            print(f"    import {package:<30} {package_time:.3f}s", file=sys.stderr)
+
+        for milestone, milestone_time in sorted(self.milestones.items(), key=lambda item: item[1]):
+            print(f"    {milestone:<37} {milestone_time:.3f}s after start", file=sys.stderr)
+
+    def __timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """ Import the given module (see builtins.__import__), and record how long this takes if it is a new module. """
+
+        module_name = resolve_module_name(name, globals, level)
+        new_modules = [module_name] if module_name not in sys.modules else []
+        new_modules += [f"{module_name}.{item}" for item in fromlist or ()
+                        if item != "*" and f"{module_name}.{item}" not in sys.modules]
+
+        if not new_modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        # Time spent on the imports of nested modules, per level of nesting in this thread
+
+        stack = self.local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            cumulative_time = time.perf_counter() - start
+            nested_time = stack.pop()
+            if stack:
+                stack[-1] += cumulative_time
+
+            loaded = [new_module for new_module in new_modules if new_module in sys.modules]
+            if loaded:
+                with self.lock:
+                    self.import_times[loaded[0]] = (cumulative_time, cumulative_time - nested_time)
+
+
+def resolve_module_name(name: str, globals: Union[dict, None], level: int) -> str:
+    """ Returns the absolute name of the module that is imported.
+
+    Args:
+        - name: Name of the module, as given in the import statement
+        - globals: Globals of the module in which the import statement is executed
+        - level: Number of leading dots of a relative import (0 for an absolute import)
+
+    Returns: Absolute name of the module.
+    """
+
+    if level == 0 or not globals:
+        return name
+
+    package = globals.get("__package__") or globals.get("__name__", "")
+    base = package.rsplit(".", level - 1)[0] if level > 1 else package
+
+    return f"{base}.{name}" if name else base
+
+
+__PROFILER: Union[StartupProfiler, None] = None
+
+
+def start_profile():
+    """ Start the startup profile (if it has not been started yet). """
+
+    global __PROFILER
+
+    if __PROFILER is None:
+        __PROFILER = StartupProfiler()
+
+
+def is_profiling() -> bool:
+    """ Check whether the startup is being profiled.
+
+    Returns: True if the startup is being profiled, False otherwise.
+    """
+
+    return __PROFILER is not None
+
+
+def mark(milestone: str):
+    """ Record that the given milestone of the startup has been reached (if the startup is being profiled).
+
+    Args:
+        - milestone: Description of the milestone, e.g. "first window shown"
+    """
+
+    if __PROFILER is not None:
+        __PROFILER.mark(milestone)
+
+
+def report():
+    """ Print the startup profile and stop profiling (if the startup is being profiled). """
+
+    global __PROFILER
+
+    if __PROFILER is not None:
+        __PROFILER.stop()
+        __PROFILER.report()
+        __PROFILER = None
+
+
+if PROFILE_OPTION in sys.argv:
+    start_profile()
@@ -0,0 +1,321 @@
+""" Background tasks for the GUI.
+
+Calculating the reference moments (loading the ephemeris and searching the eclipse), refreshing the camera overview,
+and loading a script can take several seconds.  When this is done in the GUI thread, the window freezes (including the
+clocks and the countdowns).  These computations are therefore executed as tasks in a thread pool:
+
+    - A task receives a progress callback, which it calls between its steps (with the fraction that has been done and a
+      description of the next step).  When the task has been cancelled, this callback raises TaskCancelled, so the
+      task stops at the next step;
+    - The result (or the exception) of a task is delivered to the GUI thread by a Qt signal;
+    - Each task has a key (e.g. "Reference moments").  Submitting a task cancels the previous task with the same key,
+      and the result of a task is only delivered if no newer task with the same key has been submitted (and the task
+      has not been cancelled) in the meantime.  Results that were computed from outdated input are thus discarded.
+
+The events of the event bus (which are published in e.g. the threads of the scheduler) are handled in the GUI thread
+with a GuiInvoker.
+"""
+import logging
+import threading
+from typing import Callable, Union
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench UI")
+
+
+class TaskCancelled(Exception):
+    """ Raised by the progress callback of a task that has been cancelled. """
+
+    pass
+
+
+class TaskSignals(QObject):
+    """ Signals with which a task reports to the GUI thread (as QRunnable is no QObject). """
+
+    # Key, generation, fraction done [0, 1], description of the current step
+
+    progress = pyqtSignal(str, int, float, str)
+
+    # Key, generation, result
+
+    finished = pyqtSignal(str, int, object)
+
+    # Key, generation, exception
+
+    failed = pyqtSignal(str, int, object)
+
+
+class Task(QRunnable):
+
+    def __init__(self, key: str, generation: int, func: Callable, args: tuple = (), kwargs: dict = None):
+        """ Initialisation of a task that executes the given function in a thread of the pool.
+
+        Args:
+            - key: Key of the task
+            - generation: Number of tasks with the same key that have been submitted before this one
+            - func: Function to execute.  The progress callback is passed as keyword argument "progress"
+            - args: Positional arguments for the function
+            - kwargs: Keyword arguments for the function
+        """
+
+        super().__init__()
+
+        self.key = key
+        self.generation = generation
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+
+        self.signals = TaskSignals()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        """ Request the task to stop at its next step. """
+
+        self.cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        """ Check whether the task has been cancelled.
+
+        Returns: True if the task has been cancelled, False otherwise.
+        """
+
+        return self.cancelled.is_set()
+
+    def report_progress(self, fraction: float, message: str = ""):
+        """ Report the progress of the task.
+
+        Args:
+            - fraction: Fraction of the task that has been done [0, 1]
+            - message: Description of the current step
+
+        Raises: TaskCancelled if the task has been cancelled.
+        """
+
+        if self.is_cancelled():
+            raise TaskCancelled(self.key)
+
+        self.signals.progress.emit(self.key, self.generation, fraction, message)
+
+    def run(self):
+        """ Execute the function and report its result (or the exception it raised). """
+
+        try:
+            result = self.func(*self.args, progress=self.report_progress, **self.kwargs)
+        except TaskCancelled:
+            LOGGER.info(f"{self.key}: cancelled")
+            return
+        except Exception as exc:
+            self.signals.failed.emit(self.key, self.generation, exc)
+            return
+
+        self.signals.finished.emit(self.key, self.generation, result)
+
+
+class TaskRunner(QObject):
+
+    # Key, fraction done [0, 1], description of the current step
+
+    progress = pyqtSignal(str, float, str)
+
+    # Emitted when no more tasks are running
+
+    idle = pyqtSignal()
+
+    def __init__(self, max_thread_count: int = 4):
+        """ Initialisation of the runner for the background tasks.
+
+        The runner must be created in the GUI thread, as the callbacks are executed in the thread of the runner.
+
+        Args:
+            - max_thread_count: Maximum number of tasks that are executed at the same time
+        """
+
+        super().__init__()
+
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_thread_count)
+
+        # Key -> latest Task with that key, and its callbacks
+
+        self.tasks: dict = {}
+        self.callbacks: dict = {}
+        self.generations: dict = {}
+
+        # (key, generation) -> handler for the result of a task, in case it is discarded
+
+        self.discard_handlers: dict = {}
+
+    def submit(self, key: str, func: Callable, on_finished: Callable, on_failed: Callable = None,
+               on_discarded: Callable = None, args: tuple = (), kwargs: dict = None) -> Task:
+        """ Execute the given function in the thread pool.
+
+        A running task with the same key is cancelled, and its result will be discarded.
+
+        Args:
+            - key: Key of the task
+            - func: Function to execute.  It must accept the progress callback as keyword argument "progress"
+            - on_finished: Called in the GUI thread with the result of the function
+            - on_failed: Called in the GUI thread with the exception raised by the function (None to log it)
+            - on_discarded: Called in the GUI thread with a result that is discarded (e.g. to release resources)
+            - args: Positional arguments for the function
+            - kwargs: Keyword arguments for the function
+
+        Returns: Submitted task.
+        """
+
+        self.cancel(key)
+
+        generation = self.generations.get(key, 0) + 1
+        self.generations[key] = generation
+
+        task = Task(key, generation, func, args, kwargs)
+        task.signals.progress.connect(self.__on_progress)
+        task.signals.finished.connect(self.__on_finished)
+        task.signals.failed.connect(self.__on_failed)
+
+        self.tasks[key] = task
+        self.callbacks[key] = (on_finished, on_failed)
+        if on_discarded:
+            self.discard_handlers[(key, generation)] = on_discarded
+
+        self.pool.start(task)
+
+        return task
+
+    def cancel(self, key: str = None):
+        """ Cancel the running task with the given key (or all running tasks).
+
+        The task stops at its next step.  If it finishes anyway, its result is discarded.
+
+        Args:
+            - key: Key of the task to cancel (None for all tasks)
+        """
+
+        cancelled = False
+
+        for task_key in ([key] if key else list(self.tasks)):
+            task: Union[Task, None] = self.tasks.pop(task_key, None)
+
+            if task:
+                task.cancel()
+                self.callbacks.pop(task_key)
+                self.generations[task_key] = task.generation + 1
+                cancelled = True
+
+        if cancelled and not self.tasks:
+            self.idle.emit()
+
+    def is_running(self, key: str = None) -> bool:
+        """ Check whether the task with the given key (or any task) is running.
+
+        Args:
+            - key: Key of the task (None for any task)
+
+        Returns: True if the task is running, False otherwise.
+        """
+
+        return key in self.tasks if key else len(self.tasks) > 0
+
+    def wait(self, timeout: float = -1) -> bool:
+        """ Wait until all tasks have finished (e.g. when the UI is closed).
+
+        Args:
+            - timeout: Maximum time to wait [s] (-1 to wait forever)
+
+        Returns: True if all tasks have finished, False if the timeout expired.
+        """
+
+        return self.pool.waitForDone(int(timeout * 1000) if timeout >= 0 else -1)
+
+    def __is_current(self, key: str, generation: int) -> bool:
+        """ Check whether the given generation is the latest task with the given key (that was not cancelled).
+
+        Args:
+            - key: Key of the task
+            - generation: Generation of the task
+
+        Returns: True if the result of the task is still relevant, False otherwise.
+        """
+
+        return key in self.tasks and self.generations.get(key) == generation
+
+    def __finish(self, key: str) -> tuple:
+        """ Forget about the task with the given key, as it has finished.
+
+        Args:
+            - key: Key of the task
+
+        Returns: Callbacks for the result and the exception of the task.
+        """
+
+        del self.tasks[key]
+        callbacks = self.callbacks.pop(key)
+
+        if not self.tasks:
+            self.idle.emit()
+
+        return callbacks
+
+    def __on_progress(self, key: str, generation: int, fraction: float, message: str):
+        if self.__is_current(key, generation):
+            self.progress.emit(key, fraction, message)
+
+    def __on_finished(self, key: str, generation: int, result):
+        on_discarded = self.discard_handlers.pop((key, generation), None)
+
+        if not self.__is_current(key, generation):
+            LOGGER.debug(f"{key}: discarded outdated result")
+            if on_discarded:
+                on_discarded(result)
+            return
+
+        on_finished, _ = self.__finish(key)
+        on_finished(result)
+
+    def __on_failed(self, key: str, generation: int, exc: Exception):
+        self.discard_handlers.pop((key, generation), None)
+
+        if not self.__is_current(key, generation):
+            return
+
+        _, on_failed = self.__finish(key)
+
+        if on_failed:
+            on_failed(exc)
+        else:
+            LOGGER.error(f"{key} failed: {exc}")
+
+
+class GuiInvoker(QObject):
+
+    # Callback, event
+
+    invoke_requested = pyqtSignal(object, object)
+
+    def __init__(self):
+        """ Initialisation of an invoker for the event bus, which calls the callbacks in the GUI thread.
+
+        The invoker must be created in the GUI thread, as the callbacks are executed in the thread of the invoker.
+        """
+
+        super().__init__()
+
+        self.invoke_requested.connect(self.__invoke)
+
+    def __call__(self, callback: Callable, event):
+        """ Call the given callback with the given event in the GUI thread (this returns immediately).
+
+        Args:
+            - callback: Function to call
+            - event: Event to pass to the function
+        """
+
+        self.invoke_requested.emit(callback, event)
+
+    def __invoke(self, callback: Callable, event):
+        try:
+            callback(event)
+        except Exception as exc:
+            LOGGER.exception(f"Failed to handle {type(event).__name__}: {exc}")
@@ -0,0 +1,346 @@
+""" Tracing of the hot paths (camera commands, dispatching of the jobs, and playback of the voice prompts).
+
+When a picture is taken late, the trace shows where the time went: waiting for the lane of the camera, reading the
+configuration of the camera, setting the ISO, aperture, and shutter speed (and the pauses in between), or the capture
+itself.  The trace is exported in the Chrome trace event format, which can be opened in chrome://tracing or in
+Perfetto (https://ui.perfetto.dev).
+
+    - Spans are recorded around each phase of the camera commands, around every job (with the time it waited for its
+      lane), and around the playback of the voice prompts;
+    - The spans are kept in a ring buffer, so a long rehearsal only keeps the most recent spans;
+    - When tracing is not enabled, a span is a shared no-op context manager, so the instrumentation costs next to
+      nothing.
+
+Tracing is enabled with the --trace option of the command line and the GUI, which also gives the file to which the trace
+is exported when the application stops.  The daemon also serves the trace that has been recorded so far.
+"""
+import contextlib
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Union
+
+TRACE_OPTION = "--trace"
+
+# Maximum number of spans that are kept
+
+TRACE_BUFFER_SIZE = 100000
+
+# Shared no-op span, when tracing is not enabled
+
+NO_SPAN = contextlib.nullcontext()
+
+# Phases of the Chrome trace event format: complete span, begin and end of an asynchronous span, metadata
+
+COMPLETE = "X"
+ASYNC_BEGIN = "b"
+ASYNC_END = "e"
+METADATA = "M"
+
+# Identifier of the first track that is not a thread of this process (above the range of the thread identifiers)
+
+FIRST_TRACK_ID = 1 << 32
+
+
+class Tracer:
+
+    def __init__(self, buffer_size: int = TRACE_BUFFER_SIZE):
+        """ Initialisation of a tracer, which keeps the most recent spans in a ring buffer.
+
+        The spans are timed with the performance counter (which is monotonic and has the highest resolution), and
+        converted to time since epoch, so they can be combined with the times that are measured elsewhere (e.g. by the
+        camera workers, or by the audio engine).
+
+        Args:
+            - buffer_size: Maximum number of spans that are kept
+        """
+
+        self.offset = time.time() - time.perf_counter()
+
+        # Tuples (phase, name, category, thread or track, start [s since epoch], end [s since epoch], arguments, id);
+        # appending to a deque is thread-safe
+
+        self.spans: deque = deque(maxlen=buffer_size)
+
+        # Thread identifier / track name -> (identifier in the trace, name)
+
+        self.threads: dict = {}
+        self.track_ids = itertools.count(FIRST_TRACK_ID)
+        self.span_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def now(self) -> float:
+        """ Returns the current time, with the resolution of the performance counter.
+
+        Returns: Current time [s since epoch].
+        """
+
+        return time.perf_counter() + self.offset
+
+    def span(self, name: str, category: str, **args) -> "Span":
+        """ Returns a context manager that records a span in the current thread.
+
+        Args:
+            - name: Name of the span, e.g. "set_config"
+            - category: Category of the span, e.g. "camera"
+            - args: Additional information, shown with the span
+
+        Returns: Span.
+        """
+
+        return Span(self, name, category, args)
+
+    def add_span(self, name: str, category: str, start: float, end: float, track: str = None, **args):
+        """ Record a span that has been timed elsewhere.
+
+        Args:
+            - name: Name of the span
+            - category: Category of the span
+            - start: Start of the span [s since epoch]
+            - end: End of the span [s since epoch]
+            - track: Name of the track on which to show the span (None for the current thread)
+            - args: Additional information, shown with the span
+        """
+
+        self.spans.append((COMPLETE, name, category, self.__get_thread(track), start, end, args, None))
+
+    def add_async_span(self, name: str, category: str, start: float, end: float, **args):
+        """ Record a span that may overlap with other spans (e.g. the time a job waited for its lane).
+
+        Args:
+            - name: Name of the span
+            - category: Category of the span
+            - start: Start of the span [s since epoch]
+            - end: End of the span [s since epoch]
+            - args: Additional information, shown with the span
+        """
+
+        self.spans.append((ASYNC_BEGIN, name, category, self.__get_thread(None), start, end, args,
+                           next(self.span_ids)))
+
+    def get_trace(self) -> dict:
+        """ Returns the recorded spans in the Chrome trace event format.
+
+        Returns: Dictionary with the trace events (timestamps and durations in microseconds).
+        """
+
+        pid = os.getpid()
+        events = [{"ph": METADATA, "name": "process_name", "pid": pid, "tid": 0,
+                   "args": {"name": "Solar Eclipse Workbench"}}]
+
+        with self.lock:
+            threads = list(self.threads.values())
+
+        for tid, thread_name in threads:
+            events.append({"ph": METADATA, "name": "thread_name", "pid": pid, "tid": tid,
+                           "args": {"name": thread_name}})
+
+        for phase, name, category, tid, start, end, args, span_id in list(self.spans):
+            event = {"ph": phase, "name": name, "cat": category, "pid": pid, "tid": tid, "ts": round(start * 1e6, 1),
+                     "args": args}
+
+            if phase == COMPLETE:
+                event["dur"] = round((end - start) * 1e6, 1)
+                events.append(event)
+            else:
+                event["id"] = span_id
+                events.append(event)
+                events.append({"ph": ASYNC_END, "name": name, "cat": category, "pid": pid, "tid": tid,
+                               "ts": round(end * 1e6, 1), "id": span_id})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"exported": datetime.now().isoformat(), "spans": len(self.spans)}}
+
+    def export(self, filename: Union[str, Path]):
+        """ Write the recorded spans to the given file, in the Chrome trace event format.
+
+        Args:
+            - filename: Name of the trace file (JSON)
+        """
+
+        Path(filename).write_text(json.dumps(self.get_trace()))
+
+    def __get_thread(self, track: Union[str, None]) -> int:
+        """ Returns the identifier in the trace of the given track, or of the current thread.
+
+        Args:
+            - track: Name of the track (None for the current thread)
+
+        Returns: Identifier of the track or thread in the trace.
+        """
+
+        key = track if track is not None else threading.get_ident()
+
+        thread = self.threads.get(key)
+        if thread is None:
+            with self.lock:
+                thread = self.threads.get(key)
+                if thread is None:
+                    if track is None:
+                        thread = (threading.get_native_id(), threading.current_thread().name)
+                    else:
+                        thread = (next(self.track_ids), track)
+                    self.threads[key] = thread
+
+        return thread[0]
+
+
+class Span:
+
+    def __init__(self, tracer: Tracer, name: str, category: str, args: dict):
+        """ Initialisation of a span, which is recorded in the current thread when it is exited.
+
+        Args:
+            - tracer: Tracer that records the span
+            - name: Name of the span
+            - category: Category of the span
+            - args: Additional information, shown with the span
+        """
+
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc_value}"
+
+        self.tracer.add_span(self.name, self.category, self.start, self.tracer.now(), **self.args)
+
+
+__TRACER: Union[Tracer, None] = None
+
+
+def start_tracing(buffer_size: int = TRACE_BUFFER_SIZE):
+    """ Start recording spans (if this has not been started yet).
+
+    Args:
+        - buffer_size: Maximum number of spans that are kept
+    """
+
+    global __TRACER
+
+    if __TRACER is None:
+        __TRACER = Tracer(buffer_size)
+
+
+def stop_tracing() -> Union[Tracer, None]:
+    """ Stop recording spans.
+
+    Returns: Tracer with the spans that have been recorded (None if tracing was not enabled).
+    """
+
+    global __TRACER
+
+    tracer = __TRACER
+    __TRACER = None
+
+    return tracer
+
+
+def get_tracer() -> Union[Tracer, None]:
+    """ Returns the tracer that records the spans.
+
+    Returns: Tracer, None if tracing is not enabled.
+    """
+
+    return __TRACER
+
+
+def span(name: str, category: str, **args):
+    """ Returns a context manager that records a span in the current thread (if tracing is enabled).
+
+    Args:
+        - name: Name of the span, e.g. "set_config"
+        - category: Category of the span, e.g. "camera"
+        - args: Additional information, shown with the span
+
+    Returns: Span, or a no-op context manager if tracing is not enabled.
+    """
+
+    tracer = __TRACER
+    if tracer is None:
+        return NO_SPAN
+
+    return tracer.span(name, category, **args)
+
+
+def add_span(name: str, category: str, start: float, end: float, track: str = None, **args):
+    """ Record a span that has been timed elsewhere (if tracing is enabled).
+
+    Args:
+        - name: Name of the span
+        - category: Category of the span
+        - start: Start of the span [s since epoch]
+        - end: End of the span [s since epoch]
+        - track: Name of the track on which to show the span (None for the current thread)
+        - args: Additional information, shown with the span
+    """
+
+    tracer = __TRACER
+    if tracer is not None:
+        tracer.add_span(name, category, start, end, track, **args)
+
+
+def trace_job(func, description: str, lane: str, execution_time: datetime):
+    """ Wrap the given job, such that its execution and the time it waited for its lane are traced.
+
+    The wrapped function has the same name and signature as the given one.  Whether tracing is enabled is checked when
+    the job is executed, so tracing can be started after the jobs have been scheduled.
+
+    Args:
+        - func: Function of the job
+        - description: Description of the job
+        - lane: Lane in which the job is executed
+        - execution_time: Execution time of the job [UTC]
+
+    Returns: Wrapped function.
+    """
+
+    scheduled_time = execution_time.timestamp()
+
+    @functools.wraps(func)
+    def traced(*args, **kwargs):
+        tracer = __TRACER
+        if tracer is None:
+            return func(*args, **kwargs)
+
+        start = tracer.now()
+        tracer.add_async_span(f"Waiting: {description}", "dispatcher", scheduled_time, start, lane=lane)
+
+        start_delay = round((start - scheduled_time) * 1000, 3)
+
+        with tracer.span(description, "dispatcher", lane=lane, start_delay_ms=start_delay):
+            return func(*args, **kwargs)
+
+    return traced
+
+
+def export_trace(filename: Union[str, Path]) -> bool:
+    """ Write the spans that have been recorded to the given file, in the Chrome trace event format.
+
+    Args:
+        - filename: Name of the trace file (JSON)
+
+    Returns: True if the trace was written, False if tracing is not enabled.
+    """
+
+    tracer = __TRACER
+    if tracer is None:
+        return False
+
+    tracer.export(filename)
+
+    return True
@@ -0,0 +1,668 @@
+""" Cost of the changes of the camera settings between consecutive commands, and reordering of shots to reduce them.
+
+Brackets and exposure ladders switch the shutter speed, aperture, and ISO between consecutive shots.  Every change
+costs a round trip to the camera (set_config), followed by a pause to let the camera settle, while settings that do not
+change are not sent to the camera.  This module:
+
+    - Keeps a cost model: the time it takes to read the configuration of a camera, to change each of the settings, and
+      to capture an image, per camera (or the defaults).  The costs can be measured from a trace of a rehearsal (see
+      tracing.py);
+    - Estimates, for every camera command in a compiled plan, the setup time (given the settings of the previous
+      command on the same camera) and the duration, and flags the commands that cannot finish before the next command
+      on the same camera is due;
+    - Reorders the shots in the blocks of a script that are marked as reorderable, such that the settings change as
+      little as possible.  The execution times stay where they are: only the settings (and descriptions) of the
+      take_picture commands of a camera are redistributed over the times of those commands.  A block is marked with
+      the comment lines "# reorder" and "# end reorder".
+
+Usage:
+
+    python src/solareclipseworkbench/transitions.py script.txt -d 2024-04-08 -lon -104.63525 -lat 24.01491 \\
+        -alt 1877.3 --trace rehearsal.json --reorder optimised.txt
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Union
+
+from solareclipseworkbench.plan import PlannedCommand, compile_script, parse_command, CAMERA_COMMANDS
+
+# Settings that are changed per command, in the order in which they are sent to the camera
+
+WIDGETS = ("iso", "aperture", "shutterspeed")
+
+# Default costs [s]: reading the configuration, changing a setting (per widget, and for other widgets), the pause after
+# a change, capturing an image (excluding the exposure), and the time per image of a Nikon burst
+
+DEFAULT_COSTS = {
+    "get_config": 0.2,
+    "iso": 0.15,
+    "aperture": 0.15,
+    "shutterspeed": 0.15,
+    "set_config": 0.15,
+    "settle": 0.1,
+    "capture": 0.6,
+    "burst_frame": 0.2
+}
+
+# Number of exposures of a bracket (see camera.take_bracket)
+
+BRACKET_SHOTS = 5
+
+REORDER_START = "# reorder"
+REORDER_END = "# end reorder"
+
+
+class TransitionCostModel:
+
+    def __init__(self, costs: dict = None, camera_costs: dict = None):
+        """ Initialisation of a model of the time the camera commands take.
+
+        Args:
+            - costs: Default costs [s], with the same keys as DEFAULT_COSTS (missing keys are taken from DEFAULT_COSTS)
+            - camera_costs: Dictionary with the camera names as keys and dictionaries with (some of) the costs for that
+                            camera as values
+        """
+
+        self.costs = dict(DEFAULT_COSTS, **(costs or {}))
+        self.camera_costs = camera_costs or {}
+
+    def get_cost(self, camera_name: str, name: str) -> float:
+        """ Returns the given cost for the given camera.
+
+        Args:
+            - camera_name: Name of the camera
+            - name: Name of the cost, e.g. "iso" or "capture"
+
+        Returns: Cost [s].
+        """
+
+        return self.camera_costs.get(camera_name, {}).get(name, self.costs[name])
+
+    def get_transition_cost(self, camera_name: str, previous: Union[dict, None], settings: dict) -> float:
+        """ Returns the time it takes to change the settings of the given camera.
+
+        Args:
+            - camera_name: Name of the camera
+            - previous: Settings of the camera before the change (None if unknown, in which case all settings are
+                        considered to change)
+            - settings: Settings of the camera after the change
+
+        Returns: Time it takes to change the settings [s].
+        """
+
+        return sum(self.get_cost(camera_name, widget) + self.get_cost(camera_name, "settle")
+                   for widget in get_changed_widgets(previous, settings))
+
+    def estimate_duration(self, command: PlannedCommand, previous: Union[dict, None]) -> tuple:
+        """ Estimate how long the given camera command takes.
+
+        Args:
+            - command: Camera command (take_picture, take_burst, take_bracket)
+            - previous: Settings of the camera before the command (None if unknown)
+
+        Returns: Tuple with the setup time (reading the configuration and changing the settings) and the duration of
+                 the whole command [s].
+        """
+
+        camera_name = command.get_camera_name()
+        settings = get_settings(command)
+        exposure = get_exposure_time(settings["shutterspeed"])
+        capture = self.get_cost(camera_name, "capture")
+        set_config = self.get_cost(camera_name, "set_config")
+
+        setup = self.get_cost(camera_name, "get_config") + self.get_transition_cost(camera_name, previous, settings)
+
+        if command.func_name == "take_burst":
+            duration = float(command.args[4])
+            if "Nikon" in camera_name:
+                # Capture mode and number of images, then the images themselves
+                shots = 2 * set_config + capture + round(duration) * max(exposure, self.get_cost(camera_name,
+                                                                                                 "burst_frame"))
+            else:
+                # Press and release the button, with the burst in between
+                shots = 2 * set_config + duration
+        elif command.func_name == "take_bracket":
+            if "Canon" in camera_name:
+                # Set (and reset) the exposure bracketing, then the images themselves
+                shots = 2 * set_config + sum(capture + exposure * factor
+                                             for factor in get_bracket_factors(command.args[4]))
+            else:
+                shots = 0.0
+        else:
+            shots = capture + exposure
+
+        return setup, setup + shots
+
+
+class CommandEstimate:
+
+    def __init__(self, command: PlannedCommand, execution_time: datetime, setup_time: float, duration: float):
+        """ Estimated timing of a camera command in a plan.
+
+        Args:
+            - command: Camera command
+            - execution_time: Scheduled execution time [UTC]
+            - setup_time: Time it takes to read the configuration of the camera and change its settings [s]
+            - duration: Time it takes to execute the whole command [s]
+        """
+
+        self.command = command
+        self.execution_time = execution_time
+        self.setup_time = setup_time
+        self.duration = duration
+
+        # Next command on the same camera (None for the last command on a camera), the time until it is due [s], and
+        # the time by which this command delays it [s]
+
+        self.next_command: Union[PlannedCommand, None] = None
+        self.available_time: Union[float, None] = None
+        self.overrun = 0.0
+
+    def is_feasible(self) -> bool:
+        """ Check whether the command finishes before the next command on the same camera is due.
+
+        Returns: True if the command finishes in time, False otherwise.
+        """
+
+        return self.overrun <= 0.0
+
+    def __str__(self):
+        text = f"{self.command} on {self.command.get_camera_name()}: setup {self.setup_time:.2f}s, duration " \
+               f"{self.duration:.2f}s"
+
+        if self.available_time is not None:
+            text += f", {self.available_time:.2f}s available"
+        if not self.is_feasible():
+            text += f" - OVERRUN by {self.overrun:.2f}s"
+
+        return text
+
+
+def get_settings(command: PlannedCommand) -> dict:
+    """ Returns the settings of the given camera command.
+
+    Args:
+        - command: Camera command (take_picture, take_burst, take_bracket)
+
+    Returns: Dictionary with the widget names (iso, aperture, shutterspeed) as keys and the values as strings.
+    """
+
+    return {"shutterspeed": command.args[1].strip(), "aperture": command.args[2].strip(),
+            "iso": command.args[3].strip()}
+
+
+def get_changed_widgets(previous: Union[dict, None], settings: dict) -> list:
+    """ Returns the widgets of which the value changes between the given settings.
+
+    Args:
+        - previous: Settings before the change (None if unknown, in which case all widgets are considered to change)
+        - settings: Settings after the change
+
+    Returns: List of the names of the widgets that change.
+    """
+
+    return [widget for widget in WIDGETS if previous is None or previous[widget] != settings[widget]]
+
+
+def get_exposure_time(shutter_speed: str) -> float:
+    """ Returns the exposure time for the given shutter speed.
+
+    Args:
+        - shutter_speed: Shutter speed, as in the scripts, e.g. "1/2000", "0.5", or "2"
+
+    Returns: Exposure time [s] (0 if the shutter speed is not numerical, e.g. "bulb").
+    """
+
+    shutter_speed = shutter_speed.strip().rstrip('"s')
+
+    try:
+        if "/" in shutter_speed:
+            numerator, denominator = shutter_speed.split("/")
+            return float(numerator) / float(denominator)
+
+        return float(shutter_speed)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def get_bracket_factors(steps: str) -> list:
+    """ Returns the factors with which the exposure time is multiplied for the images of a bracket.
+
+    Args:
+        - steps: Steps of the bracket, as in the scripts, e.g. "+/- 1 2/3"
+
+    Returns: List with the factor for each image of the bracket.
+    """
+
+    step = 0.0
+    for part in re.findall(r"\d+/\d+|\d+(?:\.\d+)?", steps):
+        step += get_exposure_time(part)
+
+    half = BRACKET_SHOTS // 2
+
+    return [2 ** (step * index) for index in range(-half, BRACKET_SHOTS - half)]
+
+
+def estimate_plan(plan: list, reference_moments: dict, model: TransitionCostModel) -> list:
+    """ Estimate the setup time and the duration of the camera commands in the given plan.
+
+    The commands on the same camera are executed one after the other, so a command that does not finish before the
+    next command on that camera is due, delays that next command.  The settings of the camera are carried from one
+    command to the next.
+
+    Args:
+        - plan: List of PlannedCommand objects (see plan.compile_script)
+        - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects
+        - model: Model of the time the camera commands take
+
+    Returns: List of CommandEstimate objects for the camera commands (for the reference moments that occur for this
+             eclipse), sorted by execution time.
+    """
+
+    commands = [(command.get_execution_time(reference_moments), index, command) for index, command in enumerate(plan)
+                if command.func_name in CAMERA_COMMANDS and command.ref_moment in reference_moments]
+    commands.sort(key=lambda item: item[:2])
+
+    estimates = []
+    last_estimates: dict = {}       # Camera name -> CommandEstimate of the previous command on that camera
+    busy_until: dict = {}           # Camera name -> time at which the previous command finishes [UTC]
+
+    for execution_time, _, command in commands:
+        camera_name = command.get_camera_name()
+        previous = last_estimates.get(camera_name)
+
+        setup_time, duration = model.estimate_duration(command, get_settings(previous.command) if previous else None)
+        estimate = CommandEstimate(command, execution_time, setup_time, duration)
+
+        if previous:
+            previous.next_command = command
+            previous.available_time = (execution_time - previous.execution_time).total_seconds()
+            previous.overrun = (busy_until[camera_name] - execution_time).total_seconds()
+
+        # A command that is delayed by the previous one, starts when that one has finished
+
+        start = max(execution_time, busy_until.get(camera_name, execution_time))
+        busy_until[camera_name] = start + timedelta(seconds=duration)
+        last_estimates[camera_name] = estimate
+
+        estimates.append(estimate)
+
+    return estimates
+
+
+def summarise_estimates(estimates: list) -> list:
+    """ Returns a summary of the given estimates, per camera.
+
+    Args:
+        - estimates: List of CommandEstimate objects
+
+    Returns: List of lines with the number of commands, the number of setting changes, the total setup time, and the
+             number of overruns per camera.
+    """
+
+    summary = []
+
+    for camera_name in sorted({estimate.command.get_camera_name() for estimate in estimates}):
+        camera_estimates = [estimate for estimate in estimates if estimate.command.get_camera_name() == camera_name]
+
+        changes = 0
+        previous = None
+        for estimate in camera_estimates:
+            settings = get_settings(estimate.command)
+            changes += len(get_changed_widgets(previous, settings)) if previous else 0
+            previous = settings
+
+        overruns = [estimate for estimate in camera_estimates if not estimate.is_feasible()]
+        summary.append(f"{camera_name}: {len(camera_estimates)} command(s), {changes} setting change(s), setup "
+                       f"{sum(estimate.setup_time for estimate in camera_estimates):.1f}s, {len(overruns)} overrun(s)"
+                       + (f" (worst {max(estimate.overrun for estimate in overruns):.2f}s)" if overruns else ""))
+
+    return summary
+
+
+def order_settings(model: TransitionCostModel, camera_name: str, start: Union[dict, None], settings: list) -> list:
+    """ Determine the order in which to apply the given settings, such that changing them takes the least time.
+
+    The order is built with the nearest-neighbour heuristic, and then improved with 2-opt (reversing a part of the
+    order when this reduces the total cost).  An order is only replaced by a strictly better one, so an order that is
+    already optimal is kept as it is.
+
+    Args:
+        - model: Model of the time the camera commands take
+        - camera_name: Name of the camera
+        - start: Settings of the camera before the first one (None if unknown)
+        - settings: List of settings (dictionaries) to order
+
+    Returns: List of the indices of the given settings, in the order in which to apply them.
+    """
+
+    def cost(order: list) -> float:
+        total = 0.0
+        previous = start
+        for index in order:
+            total += model.get_transition_cost(camera_name, previous, settings[index])
+            previous = settings[index]
+        return total
+
+    # Nearest neighbour (in the original order when it is a tie)
+
+    remaining = list(range(len(settings)))
+    order = []
+    previous = start
+    while remaining:
+        index = min(remaining, key=lambda i: model.get_transition_cost(camera_name, previous, settings[i]))
+        remaining.remove(index)
+        order.append(index)
+        previous = settings[index]
+
+    best = min((list(range(len(settings))), order), key=cost)
+    best_cost = cost(best)
+
+    improved = True
+    while improved:
+        improved = False
+        for first in range(len(best) - 1):
+            for last in range(first + 1, len(best)):
+                candidate = best[:first] + best[first: last + 1][::-1] + best[last + 1:]
+                candidate_cost = cost(candidate)
+                if candidate_cost < best_cost - 1e-9:
+                    best, best_cost, improved = candidate, candidate_cost, True
+
+    return best
+
+
+def get_reorder_blocks(lines: list) -> list:
+    """ Returns the blocks of the given script lines that are marked as reorderable.
+
+    Args:
+        - lines: Lines of the script
+
+    Returns: List of tuples with the indices of the first and the last line of each block (excluding the markers).
+    """
+
+    blocks = []
+    start = None
+
+    for index, line in enumerate(lines):
+        marker = line.strip().lower()
+        if marker == REORDER_START:
+            if start is not None:
+                raise ValueError(f"Line {index + 1}: reorder block inside another reorder block")
+            start = index + 1
+        elif marker == REORDER_END:
+            if start is None:
+                raise ValueError(f"Line {index + 1}: end of a reorder block that was not started")
+            blocks.append((start, index - 1))
+            start = None
+
+    if start is not None:
+        raise ValueError(f"Line {start}: reorder block is not ended")
+
+    return blocks
+
+
+def reorder_script(lines: list, reference_moments: dict, model: TransitionCostModel) -> tuple:
+    """ Reorder the shots in the reorderable blocks of the given script, such that the settings change as little as
+    possible.
+
+    Per camera, the settings (and descriptions) of the take_picture commands in a block are redistributed over the
+    execution times of these commands.  The other commands stay as they are.  The settings of the camera before the
+    block are those of the last camera command before the block (in time).
+
+    Args:
+        - lines: Lines of the script (in the Solar Eclipse Workbench format inside the blocks)
+        - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects
+        - model: Model of the time the camera commands take
+
+    Returns: Tuple with the reordered lines and the number of setting changes that were saved.
+    """
+
+    lines = list(lines)
+    saved = 0
+
+    for first, last in get_reorder_blocks(lines):
+        shots = {}      # Camera name -> list of (execution time, line index, command)
+
+        for index in range(first, last + 1):
+            line = lines[index].strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.lower().startswith("for"):
+                raise ValueError(f"Line {index + 1}: loops cannot be reordered")
+
+            command = parse_command(line)
+            if command.func_name == "take_picture" and command.ref_moment in reference_moments:
+                shots.setdefault(command.get_camera_name(), []).append(
+                    (command.get_execution_time(reference_moments), index, command))
+
+        block_start = min((shot[0] for camera_shots in shots.values() for shot in camera_shots), default=None)
+
+        for camera_name, camera_shots in shots.items():
+            camera_shots.sort(key=lambda shot: shot[:2])
+            settings = [get_settings(command) for _, _, command in camera_shots]
+
+            start = __get_settings_before(lines[:first] + lines[last + 1:], reference_moments, camera_name, block_start)
+            order = order_settings(model, camera_name, start, settings)
+
+            saved += __count_changes(start, settings) - __count_changes(start, [settings[index] for index in order])
+
+            for (_, index, slot), source in zip(camera_shots, order):
+                command = camera_shots[source][2]
+                lines[index] = format_command(slot, command.args, command.description)
+
+    return lines, saved
+
+
+def __get_settings_before(lines: list, reference_moments: dict, camera_name: str,
+                          moment: Union[datetime, None]) -> Union[dict, None]:
+    """ Returns the settings of the last camera command on the given camera before the given moment.
+
+    Args:
+        - lines: Lines of the script
+        - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects
+        - camera_name: Name of the camera
+        - moment: Moment before which to look [UTC]
+
+    Returns: Settings of the camera, None if there is no camera command on that camera before the given moment.
+    """
+
+    latest = None
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or not line.startswith(CAMERA_COMMANDS):
+            continue
+
+        command = parse_command(line)
+        if command.get_camera_name() != camera_name or command.ref_moment not in reference_moments:
+            continue
+
+        execution_time = command.get_execution_time(reference_moments)
+        if execution_time < moment and (latest is None or execution_time >= latest[0]):
+            latest = (execution_time, command)
+
+    return get_settings(latest[1]) if latest else None
+
+
+def __count_changes(start: Union[dict, None], settings: list) -> int:
+    """ Returns the number of widgets that change when the given settings are applied one after the other.
+
+    Args:
+        - start: Settings before the first one (None if unknown, in which case the first settings are not counted)
+        - settings: List of settings
+
+    Returns: Number of widget changes.
+    """
+
+    changes = 0
+    previous = start
+    for current in settings:
+        changes += len(get_changed_widgets(previous, current)) if previous else 0
+        previous = current
+
+    return changes
+
+
+def format_command(slot: PlannedCommand, args: list, description: str) -> str:
+    """ Returns the script line for a command at the time of the given command, with the given arguments.
+
+    Args:
+        - slot: Command of which the function, reference moment, and offset are used
+        - args: Arguments of the command
+        - description: Description of the command
+
+    Returns: Script line (in the Solar Eclipse Workbench format, with a newline).
+    """
+
+    offset = timedelta(seconds=abs(slot.offset))
+    hours, remainder = divmod(offset.total_seconds(), 3600)
+    minutes, seconds = divmod(remainder, 60)
+
+    return f"{slot.func_name}, {slot.ref_moment}, {'-' if slot.offset < 0 else '+'}, " \
+           f"{int(hours):02d}:{int(minutes):02d}:{seconds:04.1f}, {', '.join(args)}, {description.strip()}\n"
+
+
+def read_cost_model(filename: Union[str, Path]) -> TransitionCostModel:
+    """ Read the cost model from the given JSON file.
+
+    The file contains the default costs under "default", and the costs for specific cameras under their name, e.g.
+    {"default": {"capture": 0.5}, "Canon EOS 80D": {"shutterspeed": 0.12}}.
+
+    Args:
+        - filename: Name of the JSON file
+
+    Returns: Cost model.
+    """
+
+    costs = json.loads(Path(filename).read_text())
+
+    return TransitionCostModel(costs.pop("default", None), costs)
+
+
+def measure_cost_model(trace_filename: Union[str, Path]) -> TransitionCostModel:
+    """ Measure the cost model from the given trace (of a rehearsal with the real cameras).
+
+    The cost of each step is the median of the duration of the corresponding spans in the trace, per camera.
+
+    Args:
+        - trace_filename: Name of the trace file (Chrome trace event format, see tracing.py)
+
+    Returns: Cost model.
+    """
+
+    durations = {}      # (camera name, cost name) -> list of durations [s]
+
+    for event in json.loads(Path(trace_filename).read_text())["traceEvents"]:
+        if event.get("cat") != "camera" or event.get("ph") != "X" or "camera" not in event.get("args", {}):
+            continue
+
+        name = event["name"]
+        if name == "set_config":
+            name = event["args"].get("setting") if event["args"].get("setting") in WIDGETS else "set_config"
+        if name in DEFAULT_COSTS:
+            durations.setdefault((event["args"]["camera"], name), []).append(event["dur"] / 1e6)
+
+    camera_costs = {}
+    for (camera_name, name), values in durations.items():
+        camera_costs.setdefault(camera_name, {})[name] = statistics.median(values)
+
+    return TransitionCostModel(camera_costs=camera_costs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Setup time of the camera commands in a script, and reordering of "
+                                                 "the shots in the blocks marked with '# reorder' ... '# end reorder'")
+    parser.add_argument("script", help="script to analyse")
+    parser.add_argument(
+        "-d",
+        "--date",
+        help="date of the solar eclipse (in YYYY-MM-DD format)",
+        required=True
+    )
+    parser.add_argument(
+        "-lon",
+        "--longitude",
+        help="longitude of the location where to watch the solar eclipse (W is negative)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "-lat",
+        "--latitude",
+        help="latitude of the location where to watch the solar eclipse (N is positive)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "-alt",
+        "--altitude",
+        help="altitude of the location where to watch the solar eclipse (in meters)",
+        required=True,
+        type=float
+    )
+    parser.add_argument(
+        "--costs",
+        help="JSON file with the costs per camera (see read_cost_model)",
+        default=None
+    )
+    parser.add_argument(
+        "--trace",
+        help="trace of a rehearsal (see --trace of sew.py), from which to measure the costs",
+        default=None
+    )
+    parser.add_argument(
+        "--reorder",
+        help="file in which to write the script with the shots in the reorderable blocks reordered",
+        default=None,
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "-a",
+        "--all",
+        help="list all camera commands (not only the ones that overrun)",
+        default=False,
+        action="store_true"
+    )
+
+    args = parser.parse_args()
+
+    from astropy.time import Time
+    from solareclipseworkbench.reference_moments import calculate_reference_moments
+
+    reference_moments, _, _ = calculate_reference_moments(args.longitude, args.latitude, args.altitude,
+                                                          Time(args.date))
+
+    if args.trace:
+        model = measure_cost_model(args.trace)
+    elif args.costs:
+        model = read_cost_model(args.costs)
+    else:
+        model = TransitionCostModel()
+
+    estimates = estimate_plan(compile_script(args.script, reference_moments), reference_moments, model)
+    for estimate in estimates:
+        if args.all or not estimate.is_feasible():
+            print(estimate)
+    for line in summarise_estimates(estimates):
+        print(line)
+
+    if args.reorder:
+        lines, saved = reorder_script(Path(args.script).read_text().splitlines(keepends=True), reference_moments,
+                                      model)
+        Path(args.reorder).write_text("".join(lines))
+        print(f"Reordered script saved in {args.reorder} ({saved} setting change(s) saved)")
+
+        estimates = estimate_plan(compile_script(args.reorder, reference_moments), reference_moments, model)
+        for line in summarise_estimates(estimates):
+            print(f"After reordering: {line}")
+
+    return 1 if any(not estimate.is_feasible() for estimate in estimates) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,68 @@
 import logging
 from datetime import datetime, timedelta
+from typing import Callable, TYPE_CHECKING, Union
 
 import astronomy
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 import pytz
-from solareclipseworkbench import voice_prompt, take_picture, take_burst, take_bracket, sync_cameras, scripts
-from solareclipseworkbench.camera import CameraSettings
-from solareclipseworkbench.gui import SolarEclipseController
+from solareclipseworkbench import startup
+from solareclipseworkbench.announcements import get_synthesizer
+from solareclipseworkbench.audio import get_audio_engine
+from solareclipseworkbench.battery import BatteryMonitor
+from solareclipseworkbench.camera import CameraSettings, take_picture, take_burst, take_bracket, sample_camera_status
+from solareclipseworkbench.camera_workers import CameraWorkerPool
+from solareclipseworkbench.dispatcher import Dispatcher, COMMAND_PRIORITIES, get_camera_lane, VOICE_LANE
+from solareclipseworkbench.forecast import StorageMonitor
+from solareclipseworkbench.notifications import Notifications, get_sound_name, voice_prompt
+from solareclipseworkbench.merge import get_plan_cache, get_script_sources, merge_scripts, describe_command
+from solareclipseworkbench.plan import parse_command, PlannedCommand
+from solareclipseworkbench.transitions import TransitionCostModel, estimate_plan
+from solareclipseworkbench.watchdog import CameraWatchdog
+
+if TYPE_CHECKING:
+    # The UI is not imported when the command line is used
+    from solareclipseworkbench.gui import SolarEclipseController
+
+# Voice prompts are fired this long (plus the lead-in of their sound file) before their execution time, so the audio
+# engine can start them at exactly the right time [s]
+
+VOICE_PREPARE_TIME = 0.25
+
+# Time to wait for the first reading of the status of the cameras, when the script has been scheduled [s]
+
+CAMERA_STATUS_TIMEOUT = 10.0
+
+
+def sync_cameras(controller: "SolarEclipseController", scheduler: Dispatcher = None, cameras: dict = None):
+    """ Read the battery level and free memory of the cameras, and publish them on the event bus.
+
+    With a controller, the cameras of its camera overview are read (and the overview shows the readings).  Without a
+    controller (e.g. in the daemon), the given cameras are read.  The time and the focus mode of the cameras are not
+    touched (the camera overview of the UI does that).
+
+    When there is a scheduler, the status is read by a job in the lane of each camera, in between its capture commands
+    (see Dispatcher.sample_camera_status), without waiting for the readings.  Inside the quiet windows of the scheduler,
+    nothing is read, as the cameras are reserved for the capture commands there.  Without a scheduler, the cameras are
+    read straight away.
+
+    Args:
+        - controller: Controller of the Solar Eclipse Workbench UI (None when running without UI, e.g. in the daemon)
+        - scheduler: Scheduler that executes the script (None for the scheduler of the controller)
+        - cameras: Dictionary of camera names and camera objects, when running without UI
+    """
+
+    scheduler = scheduler or (controller.scheduler if controller else None)
+    cameras = controller.model.camera_overview.get_cameras() if controller else cameras
+
+    if not cameras:
+        return
+
+    if scheduler is None:
+        sample_camera_status(cameras)
+    elif scheduler.is_quiet():
+        logging.info("Camera status polling is suspended inside the quiet window")
+    else:
+        scheduler.sample_camera_status(cameras)
+
 
 COMMANDS = {
     'voice_prompt': voice_prompt,
@@ -41,58 +96,107 @@ def calculate_next_solar_eclipses(count: int) -> list:
     return dates
 
 
-def observe_solar_eclipse(ref_moments: dict, commands_filename: str, cameras: dict,
-                          controller: SolarEclipseController, reference_moment: str,
-                          minutes_to_reference_moment: float) -> BackgroundScheduler:
+def observe_solar_eclipse(ref_moments: dict, commands_filename: Union[str, list], cameras: dict,
+                          controller: "SolarEclipseController", reference_moment: str,
+                          minutes_to_reference_moment: float, quiet_windows: list = None,
+                          use_camera_workers: bool = False, progress: Callable = None,
+                          storage_profiles: dict = None) -> Dispatcher:
     """ Observe (and photograph) the solar eclipse, as per given files.
 
     Args:
         - ref_moments: ReferenceMomentInfo that specifies the timing of the reference moments (C1,..., C4, and
                                 maximum eclipse)
         - commands_filename: Name of the configuration file that specifies which commands have to be executed at which
-                             moment during the solar eclipse
+                             moment during the solar eclipse, or list of such files (and/or ScriptSource objects),
+                             which are merged into a single plan
         - cameras: Dictionary of camera names and camera objects
         - controller: Controller of the Solar Eclipse Workbench UI
         - reference_moment: Reference moment to use for the simulation.  Possible values are C1, C2, C3, C4, sunrise,
                             sunset, and MAX.  None if no simulation should be used
         - minutes_to_reference_moment: Minutes to reference moment when simulating, None if no simulation should be used
+        - quiet_windows: List of QuietWindow objects in which no housekeeping is done (None for the default ones)
+        - use_camera_workers: Whether to execute the camera commands in a separate worker process per camera
+        - progress: Function that is called before each step, with the fraction that has been done and a description
+                    of the step.  When it raises an exception (e.g. because loading the script was cancelled), the
+                    scheduler is shut down
+        - storage_profiles: Dictionary with the camera names as keys and CameraProfile objects as values, for the
+                            forecast of the storage of the cameras (None for the default profiles, see forecast.py)
 
     Returns: Scheduler that is used to schedule the commands.
     """
 
-    scheduler = start_scheduler()
+    progress = progress or (lambda fraction, message: None)
 
-    # Calculate simulated time
-    if reference_moment:
-        simulated_start = datetime.now(pytz.utc) + timedelta(minutes=minutes_to_reference_moment)
-    else:
-        simulated_start = None
+    progress(0.0, "Starting the scheduler")
+    scheduler = start_scheduler(quiet_windows, cameras, use_camera_workers)
 
-    # Schedule commands
-    schedule_commands(commands_filename, scheduler, ref_moments, cameras, controller, reference_moment, simulated_start)
+    try:
+        # Decode the sound files before the first voice prompt
+        progress(0.1, "Loading the sound files")
+        get_audio_engine()
+
+        # Calculate simulated time
+        if reference_moment:
+            simulated_start = datetime.now(pytz.utc) + timedelta(minutes=minutes_to_reference_moment)
+            scheduler.set_reference_moments(
+                ref_moments, ref_moments[reference_moment.upper()].time_utc - simulated_start)
+        else:
+            simulated_start = None
+            scheduler.set_reference_moments(ref_moments)
+
+        # Schedule commands
+        plan = schedule_commands(commands_filename, scheduler, ref_moments, cameras, controller, reference_moment,
+                                 simulated_start, lambda fraction, message: progress(0.2 + 0.8 * fraction, message))
+        scheduler.report_deferred_jobs()
+
+        # Forecast the free space on the memory cards, the occupancy of the buffers, and the battery drain of the
+        # connected cameras, from their current status (and update it whenever their status is read)
+        if cameras:
+            plan = [command for command in plan if command.get_camera_name() in cameras]
+            estimates = estimate_plan(plan, ref_moments, TransitionCostModel())
+            samples = scheduler.sample_camera_status(cameras, CAMERA_STATUS_TIMEOUT)
+            scheduler.storage_monitor = StorageMonitor(estimates, storage_profiles, scheduler.time_shift, samples)
+            scheduler.battery_monitor = BatteryMonitor(estimates, cameras, scheduler, samples, storage_profiles)
+
+    except Exception:
+        scheduler.shutdown(wait=False)
+        raise
 
     return scheduler
 
 
-def start_scheduler():
+def start_scheduler(quiet_windows: list = None, cameras: dict = None, use_camera_workers: bool = False) -> Dispatcher:
     """ Start background scheduler and return it.
 
+    Args:
+        - quiet_windows: List of QuietWindow objects in which no housekeeping is done (None for the default ones)
+        - cameras: Dictionary of camera names and camera objects, supervised by the watchdog of the scheduler
+        - use_camera_workers: Whether to execute the camera commands in a separate worker process per camera
+
     Returns: Background scheduler that has been started.
     """
 
-    scheduler = BackgroundScheduler()
+    if cameras and use_camera_workers:
+        scheduler = Dispatcher(quiet_windows, worker_pool=CameraWorkerPool(cameras))
+    else:
+        scheduler = Dispatcher(quiet_windows, watchdog=CameraWatchdog(cameras) if cameras else None)
     scheduler.start()
 
     return scheduler
 
 
-def schedule_commands(filename: str, scheduler: BackgroundScheduler, reference_moments: dict,
-                      cameras: dict, controller: SolarEclipseController, reference_moment, simulated_start: datetime):
-    """ Schedule commands as specified in the given file.
+def schedule_commands(filename: Union[str, list], scheduler: Dispatcher, reference_moments: dict,
+                      cameras: dict, controller: "SolarEclipseController", reference_moment,
+                      simulated_start: datetime, progress: Callable = None) -> list:
+    """ Schedule commands as specified in the given file(s).
+
+    When multiple scripts are given, they are merged by execution time into a single plan (see merge.py).  The scripts
+    that have not changed since they were last loaded are not compiled again.
 
     Args:
         - filename: Name of the file in which the commands have been listed, scheduled relatively to the given
-                    reference moments
+                    reference moments, or list with the names of such files and/or ScriptSource objects (of which only
+                    the enabled ones are scheduled)
         - scheduler: Background scheduler to use to schedule the commands
         - reference_moments: Dictionary with the reference moments (1st - 4th contact and maximum eclipse), with
                              respect to which the commands are scheduled
@@ -102,20 +206,46 @@ def schedule_commands(filename: str, scheduler: BackgroundScheduler, reference_m
                             sunset, and MAX. None if no simulation should be used.
         - simulated_start: datetime with the time to simulate relative to the reference moment.
                             None if no simulation is to be used.
+        - progress: Function that is called before each command is scheduled, with the fraction of the commands that
+                    has been scheduled and a description of the step
 
-    Returns: Scheduler that is used to schedule the commands.
+    Returns: List of PlannedCommand objects of the merged plan, in order of execution time.
     """
-    script_file = scripts.convert_script(filename, reference_moments)
-    script_file.seek(0)
+    progress = progress or (lambda fraction, message: None)
+
+    progress(0.0, "Compiling the script(s)")
+    plan_cache = get_plan_cache()
+    compiled_scripts = [plan_cache.compile(source, reference_moments)
+                        for source in get_script_sources(filename) if source.enabled]
+
+    for compiled_script in compiled_scripts:
+        for line_number, message in compiled_script.problems:
+            logging.warning(f"Line {line_number} of {compiled_script.source}: {message}")
 
-    # Loop over all lines in script file
-    for cmd_str in script_file:
-        schedule_command(
-            scheduler, reference_moments, cmd_str, cameras, controller, reference_moment, simulated_start)
+    num_commands = sum(len(compiled_script.commands) for compiled_script in compiled_scripts)
+    duplicates = []
+    plan = []
 
+    # Loop over all commands in the merged plan
+    for index, command in enumerate(merge_scripts(compiled_scripts, duplicates)):
+        progress(index / num_commands, f"Scheduling command {index + 1} of {num_commands}")
+        schedule_planned_command(
+            scheduler, reference_moments, command, cameras, controller, reference_moment, simulated_start)
+        plan.append(command)
 
-def schedule_command(scheduler: BackgroundScheduler, reference_moments: dict, cmd_str: str, cameras: dict,
-                     controller: SolarEclipseController, reference_moment_for_simulation: str,
+        if len(scheduler.schedule) > 0:
+            startup.mark("first job scheduled")
+
+    for duplicate, original in duplicates:
+        logging.warning(f"{describe_command(duplicate)} is skipped, as it duplicates {describe_command(original)}")
+
+    startup.mark("all jobs scheduled")
+
+    return plan
+
+
+def schedule_command(scheduler: Dispatcher, reference_moments: dict, cmd_str: str, cameras: dict,
+                     controller: "SolarEclipseController", reference_moment_for_simulation: str,
                      simulated_start: datetime):
     """ Schedule the given command with the given scheduler and reference moments.
 
@@ -131,55 +261,78 @@ def schedule_command(scheduler: BackgroundScheduler, reference_moments: dict, cm
                             None if no simulation is to be used.
     """
 
-    cmd_str_split = cmd_str.split(",")
-    func_name = cmd_str_split[0].lstrip()
-    ref_moment = cmd_str_split[1].lstrip()
-    sign = cmd_str_split[2].lstrip()    # + or -
-    hours, minutes, seconds = cmd_str_split[3].lstrip().split(":")   # hh:mm:ss.ss
-    description = cmd_str_split[-1].lstrip()
+    schedule_planned_command(scheduler, reference_moments, parse_command(cmd_str), cameras, controller,
+                             reference_moment_for_simulation, simulated_start)
 
-    logging.info(f"Scheduling {func_name} at {ref_moment}{sign}{cmd_str_split[3].lstrip()}")
 
-    args = cmd_str_split[4:-1]
+def schedule_planned_command(scheduler: Dispatcher, reference_moments: dict, command: PlannedCommand, cameras: dict,
+                             controller: "SolarEclipseController", reference_moment_for_simulation: str,
+                             simulated_start: datetime):
+    """ Schedule the given planned command with the given scheduler and reference moments.
+
+    Args:
+        - scheduler: Background scheduler to use to schedule the command
+        - reference_moments: Dictionary with the reference moments of the solar eclipse, as ReferenceMomentInfo objects.
+        - command: Planned command (see plan.py)
+        - cameras: Dictionary of camera names and camera objects
+        - controller: Controller of the Solar Eclipse Workbench UI
+        - reference_moment_for_simulation: Reference moment to use for the simulation.  Possible values are C1, C2, C3,
+                            C4, sunrise, sunset, and MAX. None if no simulation should be used.
+        - simulated_start: datetime with the time to simulate relative to the reference moment.
+                            None if no simulation is to be used.
+    """
+
+    func_name = command.func_name
+    description = command.description
+
+    logging.info(f"Scheduling {command}")
+
+    args = command.args
+    kwargs = None
+    lane = VOICE_LANE
 
     if func_name != "voice_prompt":
         if cameras is not None:
             try:
                 if func_name == "take_picture":
-                    settings = CameraSettings(args[0].strip(), args[1].strip(), args[2].strip(), int(args[3].strip()))
-                    new_args = [cameras[args[0].strip()], settings]
-                    args = new_args
+                    settings = CameraSettings(args[0], args[1], args[2], int(args[3]))
+                    args = [cameras[args[0]], settings]
                 elif func_name == "take_burst":
-                    settings = CameraSettings(args[0].strip(), args[1].strip(), args[2].strip(), int(args[3].strip()))
-                    new_args = [cameras[args[0].strip()], settings, float(args[4].strip())]
-                    args = new_args
+                    settings = CameraSettings(args[0], args[1], args[2], int(args[3]))
+                    args = [cameras[args[0]], settings, float(args[4])]
                 elif func_name == "take_bracket":
-                    settings = CameraSettings(args[0].strip(), args[1].strip(), args[2].strip(), int(args[3].strip()))
-                    new_args = [cameras[args[0].strip()], settings, str(args[4].strip())]
-                    args = new_args
+                    settings = CameraSettings(args[0], args[1], args[2], int(args[3]))
+                    args = [cameras[args[0]], settings, str(args[4])]
                 elif func_name == "sync_cameras":
-                    args = [controller]
+                    args = [controller, scheduler, cameras]
             except KeyError:
                 return
         else:
             return
 
-    func = COMMANDS[func_name]
-
-    reference_moment = reference_moments[ref_moment].time_utc
-    delta = timedelta(hours=float(hours), minutes=float(minutes), seconds=float(seconds))
+        if func_name != "sync_cameras":
+            lane = get_camera_lane(command.get_camera_name())
 
-    if sign == "+":
-        execution_time = reference_moment + delta
-    else:
-        execution_time = reference_moment - delta
+    func = COMMANDS[func_name]
 
     if reference_moment_for_simulation:
         diff = reference_moments[reference_moment_for_simulation.upper()].time_utc - simulated_start
-        execution_time = execution_time - diff
+        execution_time = command.get_execution_time(reference_moments, diff)
+    else:
+        execution_time = command.get_execution_time(reference_moments)
+
+    if func_name == "voice_prompt":
+        if args[0] not in Notifications.__members__:
+            # Assemble the announcement now, so nothing has to be done when it is played
+            try:
+                get_synthesizer().render(args[0])
+            except ValueError as exc:
+                logging.error(f"Voice prompt {args[0]} is not scheduled: {exc}")
+                return
 
-    trigger = CronTrigger(year=execution_time.year, month=execution_time.month, day=execution_time.day,
-                          hour=execution_time.hour, minute=execution_time.minute,
-                          second=execution_time.second, timezone=pytz.utc)
+        kwargs = {"start_time": execution_time.timestamp()}
+        lead_in = get_audio_engine().get_lead_in(get_sound_name(args[0]))
+        execution_time -= timedelta(seconds=lead_in + VOICE_PREPARE_TIME)
 
-    scheduler.add_job(func, trigger=trigger, args=args, name=description)
+    scheduler.add_command(func, execution_time, args, description, COMMAND_PRIORITIES[func_name], lane, kwargs,
+                          command.source)
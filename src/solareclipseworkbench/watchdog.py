@@ -0,0 +1,295 @@
+""" Watchdog for the camera commands.
+
+A libgphoto2 call that hangs would block the lane of its camera indefinitely, and all following commands for that
+camera would pile up behind it.  The watchdog therefore:
+
+    - Runs each camera command with a timeout;
+    - Marks the camera as degraded when a command overruns its timeout, and tries to reconnect to it (a bounded number
+      of times), updating the camera dictionary that is shared with the rest of the application.  The reconnection runs
+      in the lane of the camera, so the waiting time between the attempts never runs into the next command for the
+      camera: the remaining attempts are made right before the next commands instead;
+    - Skips (fast-forwards past) commands whose execution time has already passed by more than a grace time, instead of
+      firing them late in a burst.
+
+Changes of the camera states and the actions that are taken are published on the event bus.
+"""
+import bisect
+import functools
+import logging
+import threading
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Union
+
+import pytz
+from gphoto2 import GPhoto2Error
+
+from solareclipseworkbench.camera import get_camera, CameraError, CameraSettings
+from solareclipseworkbench.events import get_event_bus, CameraStateChanged, RecoveryActionTaken
+
+# Timeout per command [s].  For bursts, the duration of the burst is added.
+
+DEFAULT_TIMEOUTS = {
+    'take_picture': 10.0,
+    'take_burst': 15.0,
+    'take_bracket': 30.0
+}
+
+DEFAULT_GRACE_TIME = 1.0
+DEFAULT_RECONNECT_ATTEMPTS = 3
+
+
+class CameraState(str, Enum):
+    """ Enumeration of the states of a camera, as seen by the watchdog. """
+
+    OK = "OK"
+    DEGRADED = "Degraded"
+    LOST = "Lost"
+
+
+class RecoveryAction:
+
+    def __init__(self, camera_name: str, action: str, detail: str):
+        """ Keep track of an action that was taken by the watchdog.
+
+        Args:
+            - camera_name: Name of the camera
+            - action: Action that was taken (e.g. "timeout", "reconnect", "skip")
+            - detail: Description of the action
+        """
+
+        self.time = datetime.now(pytz.utc)
+        self.camera_name = camera_name
+        self.action = action
+        self.detail = detail
+
+    def __str__(self):
+        return f"{self.time:%H:%M:%S} {self.camera_name}: {self.action} - {self.detail}"
+
+
+class CameraWatchdog:
+
+    def __init__(self, cameras: dict, timeouts: dict = None, grace_time: float = DEFAULT_GRACE_TIME,
+                 reconnect_attempts: int = DEFAULT_RECONNECT_ATTEMPTS):
+        """ Initialisation of the watchdog for the camera commands.
+
+        Each action that is taken is published on the event bus (as RecoveryActionTaken), and so is each change of
+        the state of a camera (as CameraStateChanged).
+
+        Args:
+            - cameras: Dictionary of camera names and camera objects.  This is updated in place when a camera is
+                       reconnected.
+            - timeouts: Timeout per command [s] (None for the default timeouts)
+            - grace_time: Maximum delay of a command w.r.t. its execution time before it is skipped [s]
+            - reconnect_attempts: Maximum number of attempts to reconnect to a camera after a timeout
+        """
+
+        self.cameras = cameras
+        self.timeouts = DEFAULT_TIMEOUTS if timeouts is None else timeouts
+        self.grace_time = grace_time
+        self.reconnect_attempts = reconnect_attempts
+
+        self.states: dict = {camera_name: CameraState.OK for camera_name in cameras}
+        self.actions: list = []
+
+        # Camera name -> execution times of the commands for the camera [s since epoch], sorted, and the number of
+        # attempts that are left to reconnect to the camera (while it is degraded)
+
+        self.command_times: dict = {}
+        self.attempts_left: dict = {}
+
+        self.lock = threading.Lock()
+
+    def watch(self, func, camera_name: str, execution_time: datetime):
+        """ Wrap the given camera command, such that it is executed under supervision of the watchdog.
+
+        The wrapped function has the same name and signature as the given one (camera, camera settings, ...).
+
+        Args:
+            - func: Camera command (take_picture, take_burst, take_bracket)
+            - camera_name: Name of the camera
+            - execution_time: Execution time of the command [UTC]
+
+        Returns: Wrapped camera command.
+        """
+
+        with self.lock:
+            bisect.insort(self.command_times.setdefault(camera_name, []), execution_time.timestamp())
+
+        @functools.wraps(func)
+        def watched(camera, camera_settings: CameraSettings, *args):
+            camera_name = camera_settings.camera_name
+
+            delay = (datetime.now(pytz.utc) - execution_time).total_seconds()
+            if delay > self.grace_time:
+                self.record(camera_name, "skip", f"{func.__name__} skipped, {delay:.1f}s too late")
+                return
+
+            if self.states.get(camera_name) == CameraState.LOST:
+                self.record(camera_name, "skip", f"{func.__name__} skipped, camera lost")
+                return
+
+            # One of the attempts to reconnect that have been postponed, so as not to run into this command
+
+            if self.states.get(camera_name) == CameraState.DEGRADED and not self.reconnect(camera_name, time.time()):
+                self.record(camera_name, "skip", f"{func.__name__} skipped, camera not reconnected")
+                return
+
+            # Use the latest camera object, in case the camera has been reconnected
+
+            camera = self.cameras.get(camera_name, camera)
+
+            timeout = self.timeouts.get(func.__name__, max(self.timeouts.values()))
+            if func.__name__ == "take_burst":
+                timeout += float(args[0])
+
+            self.run(camera_name, func.__name__, timeout, func, camera, camera_settings, *args)
+
+        return watched
+
+    def run(self, camera_name: str, command: str, timeout: float, func, *args):
+        """ Run the given function with the given timeout.
+
+        The function is executed in a separate (daemon) thread.  When it does not finish in time, the thread is
+        abandoned, the camera is released and marked as degraded, and a reconnection is attempted.
+
+        Args:
+            - camera_name: Name of the camera
+            - command: Name of the command
+            - timeout: Timeout [s]
+            - func: Function to execute
+            - args: Arguments for the function
+        """
+
+        outcome = {}
+
+        def target():
+            try:
+                outcome["result"] = func(*args)
+            except BaseException as exc:
+                outcome["exception"] = exc
+
+        thread = threading.Thread(target=target, name=f"{command} ({camera_name})", daemon=True)
+        thread.start()
+        thread.join(timeout)
+
+        if thread.is_alive():
+            self.set_state(camera_name, CameraState.DEGRADED)
+            self.record(camera_name, "timeout", f"{command} did not finish within {timeout:.1f}s")
+
+            old_camera = self.cameras.get(camera_name)
+            if old_camera is not None:
+                # Releasing the camera can hang as well
+                release = threading.Thread(target=old_camera.exit, daemon=True)
+                release.start()
+                release.join(2.0)
+
+            self.attempts_left[camera_name] = self.reconnect_attempts
+            self.reconnect(camera_name, self.get_next_command_time(camera_name))
+            return None
+
+        if "exception" in outcome:
+            raise outcome["exception"]
+
+        return outcome.get("result")
+
+    def reconnect(self, camera_name: str, deadline: float = None) -> bool:
+        """ Try to reconnect to the given camera, with the attempts that are left for it.
+
+        After a failed attempt, the watchdog waits a bit longer before the next one, but not past the given deadline
+        (the next command for the camera): the remaining attempts are then left for the next command.  When successful,
+        the new camera object is stored in the camera dictionary.  When no attempts are left, the camera is marked as
+        lost and no further commands are sent to it.
+
+        Args:
+            - camera_name: Name of the camera
+            - deadline: Time before which the attempts have to be finished [s since epoch] (None for no deadline)
+
+        Returns: True if the camera was reconnected, False otherwise.
+        """
+
+        while self.attempts_left.get(camera_name, 0) > 0:
+            self.attempts_left[camera_name] -= 1
+            attempt = self.reconnect_attempts - self.attempts_left[camera_name]
+
+            try:
+                self.cameras[camera_name] = get_camera(camera_name)
+                self.set_state(camera_name, CameraState.OK)
+                self.record(camera_name, "reconnect", f"Reconnected (attempt {attempt})")
+                return True
+            except (GPhoto2Error, CameraError) as exc:
+                self.record(camera_name, "reconnect", f"Attempt {attempt} failed: {exc}")
+
+            if self.attempts_left[camera_name] > 0 and deadline is not None and time.time() + attempt > deadline:
+                self.record(camera_name, "reconnect", "Next attempt postponed until the next command")
+                return False
+
+            if self.attempts_left[camera_name] > 0:
+                time.sleep(attempt)
+
+        self.set_state(camera_name, CameraState.LOST)
+        self.record(camera_name, "lost", f"Could not reconnect after {self.reconnect_attempts} attempts")
+
+        return False
+
+    def get_next_command_time(self, camera_name: str) -> Union[float, None]:
+        """ Returns the execution time of the next command for the given camera.
+
+        Args:
+            - camera_name: Name of the camera
+
+        Returns: Execution time of the first command for the camera after the current time [s since epoch], or None if
+                 there is no such command.
+        """
+
+        now = time.time()
+
+        with self.lock:
+            command_times = self.command_times.get(camera_name, [])
+            index = bisect.bisect_right(command_times, now)
+
+            return command_times[index] if index < len(command_times) else None
+
+    def set_state(self, camera_name: str, state: CameraState):
+        """ Set the state of the given camera.
+
+        Args:
+            - camera_name: Name of the camera
+            - state: New state of the camera
+        """
+
+        with self.lock:
+            changed = self.states.get(camera_name) != state
+            self.states[camera_name] = state
+
+        if changed:
+            get_event_bus().publish(CameraStateChanged(camera_name, state))
+
+    def get_state(self, camera_name: str) -> CameraState:
+        """ Returns the state of the given camera.
+
+        Args:
+            - camera_name: Name of the camera
+
+        Returns: State of the given camera.
+        """
+
+        return self.states.get(camera_name, CameraState.OK)
+
+    def record(self, camera_name: str, action: str, detail: str):
+        """ Record, log, and publish the given action.
+
+        Args:
+            - camera_name: Name of the camera
+            - action: Action that was taken
+            - detail: Description of the action
+        """
+
+        recovery_action = RecoveryAction(camera_name, action, detail)
+
+        with self.lock:
+            self.actions.append(recovery_action)
+
+        logging.warning(f"Watchdog: {recovery_action}")
+        get_event_bus().publish(RecoveryActionTaken(recovery_action))
@@ -0,0 +1,140 @@
+""" World map on which the observing location is shown (in the location pop-up).
+
+Reading and plotting the land shapefile takes a while, so the world map is rendered only once, as a raster image, which
+is kept in memory and stored on disk.  This module (and hence geopandas and matplotlib) is only imported when the
+location pop-up is opened.
+"""
+import logging
+from pathlib import Path
+
+import geopandas
+import numpy as np
+from geodatasets import get_path
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from matplotlib.image import imread, imsave
+
+# Extent of the world map (min/max longitude, min/max latitude) [degrees], its size [pixels], and the file in which it
+# is cached
+
+BASEMAP_EXTENT = (-180, 180, -90, 90)
+BASEMAP_SIZE = (1440, 720)
+BASEMAP_PATH = Path.home() / ".cache" / "solareclipseworkbench" / f"basemap-{BASEMAP_SIZE[0]}x{BASEMAP_SIZE[1]}.png"
+
+LOGGER = logging.getLogger("Solar Eclipse Workbench UI")
+
+
+def render_basemap(width: int = BASEMAP_SIZE[0], height: int = BASEMAP_SIZE[1]) -> np.ndarray:
+    """ Render the world map (land in white, with black coastlines) as a raster image.
+
+    Args:
+        - width: Width of the image [pixels]
+        - height: Height of the image [pixels]
+
+    Returns: RGBA image of the world map, covering BASEMAP_EXTENT.
+    """
+
+    figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_axes((0, 0, 1, 1))
+
+    # noinspection SpellCheckingInspection
+    world = geopandas.read_file(get_path("naturalearth.land"))
+    # Crop -> min longitude, min latitude, max longitude, max latitude
+    world.clip([-180, -90, 180, 90]).plot(color="white", edgecolor="black", ax=ax)
+
+    ax.set_aspect("auto")
+    ax.set_xlim(BASEMAP_EXTENT[0], BASEMAP_EXTENT[1])
+    ax.set_ylim(BASEMAP_EXTENT[2], BASEMAP_EXTENT[3])
+    ax.set_axis_off()
+
+    canvas.draw()
+
+    return np.array(canvas.buffer_rgba())
+
+
+__BASEMAP = None
+
+
+def get_basemap() -> np.ndarray:
+    """ Returns the raster image of the world map.
+
+    Reading and plotting the land shapefile is slow, so the image is rendered only once: it is kept in memory for the
+    rest of the session, and stored in BASEMAP_PATH for the next sessions.
+
+    Returns: RGBA image of the world map, covering BASEMAP_EXTENT.
+    """
+
+    global __BASEMAP
+
+    if __BASEMAP is None:
+        if BASEMAP_PATH.exists():
+            __BASEMAP = imread(BASEMAP_PATH)
+        else:
+            __BASEMAP = render_basemap()
+
+            try:
+                BASEMAP_PATH.parent.mkdir(parents=True, exist_ok=True)
+                imsave(BASEMAP_PATH, __BASEMAP)
+            except OSError as exc:
+                LOGGER.warning(f"The world map could not be stored in {BASEMAP_PATH}: {exc}")
+
+    return __BASEMAP
+
+
+class LocationPlot(FigureCanvas):
+    """ Display the world with the selected location marked with a red dot."""
+
+    def __init__(self, parent=None, dpi=100):
+        """ Plot a world map.
+
+        The world map is a pre-rendered image (see get_basemap).  The location is shown by a marker that is moved and
+        blitted on top of the (cached) background, so the map itself is never redrawn.
+        """
+
+        self.figure = Figure(dpi=dpi)
+        self.ax = self.figure.add_subplot(111, aspect='equal')
+
+        FigureCanvas.__init__(self, self.figure)
+        self.setParent(parent)
+
+        FigureCanvas.updateGeometry(self)
+
+        self.ax.imshow(get_basemap(), extent=BASEMAP_EXTENT, interpolation="antialiased")
+        self.ax.set_aspect("equal")
+
+        self.location, = self.ax.plot([], [], "o", color="red", animated=True)
+        self.background = None
+
+        # The background is (re-)captured after every full redraw (e.g. when the pop-up is resized)
+
+        self.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        """ Capture the background and draw the location marker on top of it, after a full redraw of the figure.
+
+        Args:
+            - event: Draw event
+        """
+
+        self.background = self.copy_from_bbox(self.figure.bbox)
+        self.ax.draw_artist(self.location)
+
+    def plot_location(self, longitude: float, latitude: float):
+        """ Indicate the given location on the world map with a red dot.
+
+        Args:
+            - longitude: Longitude of the location [degrees]
+            - latitude: Latitude of the location [degrees]
+        """
+
+        self.location.set_data([longitude], [latitude])
+
+        if self.background is None:
+            self.draw()
+            return
+
+        self.restore_region(self.background)
+        self.ax.draw_artist(self.location)
+        self.blit(self.figure.bbox)